@@ -0,0 +1,281 @@
+# Acquisition Daemon
+# Headless process that owns every instrument connection of the interlock (pressure gauge, turbo pump, Eurotherm)
+# and polls them with one AcquisitionEngine. Every reading and status change is published into a SharedFeed block;
+# the PyQt and Tk front ends only attach to that block as viewers. Any number of viewers can run (or crash, or be
+# restarted) without reopening a port or adding a single request on the buses, and acquisition and logging go on
+# while no GUI is open.
+#
+#   python AcquisitionDaemon.py                      # real hardware
+#   python AcquisitionDaemon.py --mock               # mock gauge, pump and Eurotherm (no hardware needed)
+#   python AcquisitionDaemon.py --log-dir logs       # also log every reading to disk
+#
+#   python PyQtPfeifferSystem.py                     # viewers, as many as needed
+#   python RealPfeifferSystem.py
+#
+# From Python (e.g. in tests):
+#   with MockAcquisitionDaemon(feed_name='test_feed') as daemon:
+#       reader = FeedReader('test_feed')
+
+import signal
+import logging
+import argparse
+import threading
+
+import serial
+
+import PfiefferVacuumProtocol as pvp
+import RealPfeifferTC110 as rpt
+from EurothermDriver import Eurotherm3500
+from AcquisitionEngine import AcquisitionEngine
+from DiskLogger import DiskLogger
+from SharedFeed import FeedWriter
+
+# Channel names (shared with the viewers)
+TEMPERATURE = 'Temperature'
+PRESSURE = 'Pressure'
+PUMP_SPEED = 'PumpSpeed'      # rpm
+PUMP_CURRENT = 'PumpCurrent'  # A
+
+# TC 110 parameters of the pump channels (ActualSpd would be in Hz)
+PUMP_SPEED_KEY = 'ActualSpd_rpm'
+PUMP_CURRENT_KEY = 'DrvCurrent'
+
+DEFAULT_FEED = 'yanglab_acquisition'
+HISTORY_SAMPLES = 3600 * 5  # Readings kept per channel in the feed (one hour at 5 Hz)
+
+# Instruments of the real system
+EUROTHERM_IP = '192.168.111.222'
+GAUGE_PORT = '/dev/tty.usbserial-BG000M9B'
+GAUGE_ADDRESS = 122
+
+
+# -------------------------------
+# Channel drivers (read_device_value() -> float, see AcquisitionEngine)
+# -------------------------------
+class GaugeDriver:
+    """Pressure of a Pfeiffer gauge on a persistent serial port."""
+
+    def __init__(self, port, address, baudrate=9600, timeout=1, serial_factory=serial.Serial):
+        self.port = port
+        self.address = address
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.serial_factory = serial_factory
+        self._ser = None
+
+    def open(self):
+        if self._ser is None:
+            self._ser = self.serial_factory(self.port, baudrate=self.baudrate, timeout=self.timeout)
+
+    def close(self):
+        if self._ser is not None:
+            self._ser.close()
+            self._ser = None
+
+    def read_device_value(self):
+        self.open()
+        return float(pvp.read_pressure(self._ser, self.address))
+
+
+class PumpDriver:
+    """One parameter (e.g. 'ActualSpd', 'DrvCurrent') of a TC 110. Several drivers can share one pump."""
+
+    def __init__(self, pump, key, device_id=1):
+        self.pump = pump
+        self.key = key
+        self.device_id = device_id
+
+    def open(self):
+        if getattr(self.pump, 'inst', None) is None:
+            self.pump.connect(self.device_id)
+
+    def close(self):
+        if getattr(self.pump, 'inst', None) is not None:
+            self.pump.close()
+            self.pump.inst = None
+
+    def read_device_value(self):
+        self.open()
+        with self.pump.lock:
+            value = self.pump.get_fromkey(self.key, device_id=self.device_id)
+        if value is None:
+            raise RuntimeError(f'{self.key} not received.')
+        return float(value)
+
+
+class EurothermChannel:
+    """One field of EurothermDriver.REGISTERS (e.g. 'pv_loop1') of a Eurotherm 3500."""
+
+    def __init__(self, controller, field='pv_loop1'):
+        self.controller = controller
+        self.field = field
+
+    def close(self):
+        self.controller.close()
+
+    def read_device_value(self):
+        return self.controller.read_field(self.field)
+
+
+def default_channels(interval_s=0.2, pump_port=None):
+    """(name, driver, interval_s, link) of the instruments of the real system."""
+    channels = [
+        (TEMPERATURE, EurothermChannel(Eurotherm3500.tcp(EUROTHERM_IP, cache=None)), interval_s, EUROTHERM_IP),
+        (PRESSURE, GaugeDriver(GAUGE_PORT, GAUGE_ADDRESS), interval_s, GAUGE_PORT),
+    ]
+    try:
+        pump = rpt.TC110(port=pump_port, autoconnect=False)
+    except Exception as e:
+        logging.warning(f'Acquisition daemon: no pump ({e}).')
+    else:
+        channels += [(PUMP_SPEED, PumpDriver(pump, PUMP_SPEED_KEY), interval_s, pump.port),
+                     (PUMP_CURRENT, PumpDriver(pump, PUMP_CURRENT_KEY), interval_s, pump.port)]
+    return channels
+
+
+# -------------------------------
+# Daemon
+# -------------------------------
+class AcquisitionDaemon:
+    """
+    :param channels: (name, driver, interval_s, link) of every channel (see default_channels()).
+    :param feed_name: Shared memory name the viewers attach to.
+    :param capacity: Readings kept per channel in the feed.
+    :param log_directory: If given, every reading is also saved there by a DiskLogger.
+    :param heartbeat_s: How often the feed is marked alive.
+    """
+
+    def __init__(self, channels, feed_name=DEFAULT_FEED, capacity=HISTORY_SAMPLES, log_directory=None,
+                 heartbeat_s=1.0):
+        channels = list(channels)
+        self.heartbeat_s = heartbeat_s
+        self.feed = FeedWriter(feed_name, [name for name, *_ in channels], capacity=capacity)
+        self.logger = DiskLogger(log_directory) if log_directory else None
+        self.engine = AcquisitionEngine(on_reading=self._on_reading, on_status=self._on_status,
+                                        on_error=self._on_error)
+        for name, driver, interval_s, link in channels:
+            self.engine.add_channel(name, driver, interval_s, link=link)
+        self._last_error = {}  # channel name -> last error message (repeats are not logged)
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    @property
+    def feed_name(self):
+        return self.feed.name
+
+    def start(self):
+        if self.logger is not None:
+            self.logger.start()
+        self._stop.clear()
+        self._heartbeat = threading.Thread(target=self._beat, name='FeedHeartbeat', daemon=True)
+        self._heartbeat.start()
+        self.engine.start()
+
+    def stop(self):
+        """Stops acquisition (drivers are closed, statuses become 'disconnected') and removes the feed."""
+        self.engine.stop()
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
+        if self.logger is not None:
+            self.logger.close()
+        self.feed.close()
+
+    def run_forever(self):
+        """Runs until SIGINT or SIGTERM."""
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: self._stop.set())
+        self.start()
+        logging.info(f'Acquisition daemon: publishing {", ".join(self.feed.channels)} to {self.feed_name}.')
+        while not self._stop.wait(1.0):
+            pass
+        self.stop()
+
+    def stats(self):
+        stats = {'channels': self.engine.stats()}
+        if self.logger is not None:
+            stats['logger'] = self.logger.stats()
+        return stats
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def _beat(self):
+        while not self._stop.wait(self.heartbeat_s):
+            self.feed.heartbeat()
+
+    # Engine callbacks (I/O threads)
+
+    def _on_reading(self, name, t, value):
+        self.feed.publish(name, t, value)
+        if self.logger is not None:
+            self.logger.log(name, t, value)
+
+    def _on_status(self, name, status):
+        self.feed.publish_status(name, status)
+        if self.logger is not None:
+            self.logger.log_status(name, status)
+        if status == 'connected':
+            self._last_error.pop(name, None)
+
+    def _on_error(self, message):
+        name = message.split(':', 1)[0]
+        if self._last_error.get(name) != message:
+            self._last_error[name] = message
+            logging.warning(f'Acquisition daemon: {message}')
+
+
+class MockAcquisitionDaemon(AcquisitionDaemon):
+    """
+    Stand-in daemon with the same channels, driven by the mock devices: a MockModbusTcpServer Eurotherm on
+    localhost, a mock PPT 200 gauge and a mock TC 110 pump (started, so its speed ramps up).
+    """
+
+    def __init__(self, feed_name=DEFAULT_FEED, interval_s=0.05, **kwargs):
+        from MockModbusSlave import MockModbusTcpServer
+        from MockPfiefferProtocol import Serial, PPT200, TC110 as MockTC110, VisaResource
+
+        self.server = MockModbusTcpServer()
+        self.server.start()
+        eurotherm = Eurotherm3500.tcp('127.0.0.1', port=self.server.tcp_port, cache=None)
+        gauge = GaugeDriver('COM1', 1, serial_factory=lambda port, **settings: Serial(PPT200(), port=port, **settings))
+        self.pump = rpt.TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+        self.pump.inst = VisaResource(MockTC110(address=1))
+        self.pump.start(device_id=1)
+        super().__init__([(TEMPERATURE, EurothermChannel(eurotherm), interval_s, self.server.port),
+                          (PRESSURE, gauge, interval_s, 'COM1'),
+                          (PUMP_SPEED, PumpDriver(self.pump, PUMP_SPEED_KEY), interval_s, self.pump.port),
+                          (PUMP_CURRENT, PumpDriver(self.pump, PUMP_CURRENT_KEY), interval_s, self.pump.port)],
+                         feed_name=feed_name, **kwargs)
+
+    def stop(self):
+        try:
+            super().stop()
+        finally:
+            self.server.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Polls the interlock instruments and publishes the readings to the '
+                                                 'GUIs through shared memory.')
+    parser.add_argument('--mock', action='store_true', help='use the mock devices instead of the hardware')
+    parser.add_argument('--feed', default=DEFAULT_FEED, help='shared memory name (default: %(default)s)')
+    parser.add_argument('--log-dir', help='also save every reading to this directory')
+    parser.add_argument('--interval', type=float, default=0.2, help='seconds between reads (default: %(default)s)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.mock:
+        daemon = MockAcquisitionDaemon(feed_name=args.feed, interval_s=args.interval, log_directory=args.log_dir)
+    else:
+        daemon = AcquisitionDaemon(default_channels(args.interval), feed_name=args.feed, log_directory=args.log_dir)
+    daemon.run_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+# Acquisition Engine
+# Polls every sensor channel of the interlock from a fixed set of threads instead of one thread per sensor. One
+# scheduler thread keeps a heap of the next due time of every channel and hands due channels to the I/O thread of
+# the physical link they are on (a serial port, a TCP device). Channels on the same link are read one after the other
+# by that link's thread, so they never race for the bus; separate links are read side by side. The achieved rate,
+# period jitter and lateness of every channel are tracked so slow devices and overloaded buses show up.
+#
+#   engine = AcquisitionEngine(on_reading=lambda name, t, value: print(name, value))
+#   engine.add_channel('Temperature', TempWorker(cfg), interval_s=0.2, link='192.168.111.222')
+#   engine.add_channel('Pressure', PressureWorker(cfg), interval_s=0.5, link='/dev/ttyUSB0')
+#   engine.start()
+#   engine.stats()['Pressure']   # {'rate_hz': 2.0, 'jitter_s': ..., ...}
+#
+# With history=N every channel also keeps its last N readings in a RingBuffer written by its link's thread, so a GUI
+# can collect all new readings once per frame (RingBuffer.since) instead of receiving one event per reading.
+#
+# A channel driver is any object with read_device_value() -> float; open() and close() are called on the link's
+# thread if the driver has them (the ReadingWorker classes of the GUIs fit as they are).
+
+import math
+import time
+import heapq
+import logging
+import itertools
+from queue import SimpleQueue
+from threading import Thread, Condition
+
+from RingBuffer import RingBuffer
+
+
+class Channel:
+    """One polled value: its driver, period and statistics."""
+
+    def __init__(self, name, driver, interval_s, link, history=None):
+        if interval_s <= 0:
+            raise ValueError(f'The interval of {name} should be positive. {interval_s} was given.')
+        self.name = name
+        self.driver = driver
+        self.interval_s = interval_s
+        self.link = link
+        self.status = 'idle'
+        self.value = math.nan
+        self.busy = False  # Queued on or being read by its link's thread
+        self.due = 0.0     # Due time of the read in progress
+        self.buffer = RingBuffer(history, 1) if history else None  # (time.time(), value) of the latest reads
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.reads = 0
+        self.errors = 0
+        self.overruns = 0  # Due times skipped because the previous read had not finished
+        self._first_start = None
+        self._last_start = None
+        # Running mean and variance (Welford) of the period between read starts
+        self._periods = 0
+        self._period_mean = 0.0
+        self._period_m2 = 0.0
+        self._lateness_sum = 0.0
+        self._lateness_max = 0.0
+
+    def _record_start(self, start):
+        lateness = max(start - self.due, 0.0)
+        self._lateness_sum += lateness
+        self._lateness_max = max(self._lateness_max, lateness)
+        if self._last_start is not None:
+            period = start - self._last_start
+            self._periods += 1
+            delta = period - self._period_mean
+            self._period_mean += delta / self._periods
+            self._period_m2 += delta * (period - self._period_mean)
+        else:
+            self._first_start = start
+        self._last_start = start
+
+    def stats(self):
+        started = self._periods + 1 if self._last_start is not None else 0
+        span = self._last_start - self._first_start if started > 1 else 0.0
+        return {'reads': self.reads,
+                'errors': self.errors,
+                'overruns': self.overruns,
+                'interval_s': self.interval_s,
+                'rate_hz': self._periods / span if span > 0 else 0.0,
+                'jitter_s': math.sqrt(self._period_m2 / self._periods) if self._periods > 1 else 0.0,
+                'lateness_mean_s': self._lateness_sum / started if started else 0.0,
+                'lateness_max_s': self._lateness_max,
+                'link': self.link,
+                'status': self.status}
+
+
+class _Link:
+    """The I/O thread of one physical link: reads the channels handed to it, one at a time."""
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+        self.channels = []
+        self.queue = SimpleQueue()
+        self.thread = None
+
+    def start(self):
+        self.thread = Thread(target=self._run, name=f'Acquisition-{self.name}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        for channel in self.channels:
+            self.engine._open(channel)
+        while True:
+            channel = self.queue.get()
+            if channel is None:
+                break
+            self.engine._read(channel)
+        for channel in self.channels:
+            self.engine._close(channel)
+
+
+class AcquisitionEngine:
+    """
+    :param on_reading: on_reading(channel name, time.time(), value), called from the link's I/O thread.
+    :param on_status: on_status(channel name, status) when a channel becomes 'connected', 'error' or 'disconnected'.
+    :param on_error: on_error(message) for every failed open or read.
+    :param history: Readings kept per channel in Channel.buffer (None keeps none).
+    """
+
+    def __init__(self, on_reading=None, on_status=None, on_error=None, history=None):
+        self.history = history
+        self.on_reading = on_reading
+        self.on_status = on_status
+        self.on_error = on_error
+        self.channels = {}  # name -> Channel
+        self._links = {}    # link name -> _Link
+        self._heap = []     # (due, sequence number, Channel)
+        self._sequence = itertools.count()
+        self._cond = Condition()
+        self._running = False
+        self._thread = None
+
+    def add_channel(self, name, driver, interval_s, link=None):
+        """Adds a channel. Channels with the same link share one I/O thread; link=None gives the channel its own."""
+        if name in self.channels:
+            raise ValueError(f'There is already a channel called {name}.')
+        if self._running:
+            raise RuntimeError('Channels can only be added while the engine is stopped.')
+        link = name if link is None else link
+        channel = self.channels[name] = Channel(name, driver, interval_s, link, self.history)
+        if channel.link not in self._links:
+            self._links[channel.link] = _Link(self, channel.link)
+        self._links[channel.link].channels.append(channel)
+        return channel
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        """Starts polling. Raises RuntimeError while a link is still busy with a read from before the last stop()."""
+        if self._running:
+            return
+        busy = [name for name, link in self._links.items() if link.thread is not None and link.thread.is_alive()]
+        if busy:
+            # A second thread on the same link would race the first one for the bus
+            raise RuntimeError(f'Still finishing the last read on {", ".join(map(str, busy))}; try again later.')
+        self._running = True
+        now = time.monotonic()
+        self._heap = []
+        for channel in self.channels.values():
+            channel.busy = False
+            channel.reset_stats()
+            self._schedule(channel, now)
+        for link in self._links.values():
+            link.start()
+        self._thread = Thread(target=self._run, name='AcquisitionScheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stops scheduling, lets every link finish the read in progress and closes the drivers."""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        for link in self._links.values():
+            link.queue.put(None)
+        for link in self._links.values():
+            link.thread.join(timeout)
+            if link.thread.is_alive():
+                logging.warning(f'Acquisition: {link.name} did not finish its read within {timeout} s.')
+
+    def stats(self):
+        return {name: channel.stats() for name, channel in self.channels.items()}
+
+    def since(self, name, cursor):
+        """(t, values, new cursor) of the readings of a channel after `cursor` (RingBuffer.since, values 1-D)."""
+        t, values, cursor = self.channels[name].buffer.since(cursor)
+        return t, values[:, 0], cursor
+
+    # ---- Scheduler thread ----
+
+    def _schedule(self, channel, due):
+        heapq.heappush(self._heap, (due, next(self._sequence), channel))
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                due, _, channel = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                if channel.busy:
+                    channel.overruns += 1
+                else:
+                    channel.busy = True
+                    channel.due = due
+                    self._links[channel.link].queue.put(channel)
+                # Keep the phase: the next read is due one interval later, skipping periods that are already over
+                now = time.monotonic()
+                skipped = max(math.ceil((now - due) / channel.interval_s), 1)
+                channel.overruns += skipped - 1
+                self._schedule(channel, due + skipped * channel.interval_s)
+
+    # ---- I/O threads ----
+
+    def _set_status(self, channel, status):
+        if channel.status != status:
+            channel.status = status
+            self._callback(self.on_status, channel.name, status)
+
+    def _callback(self, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.warning(f'Acquisition: callback {callback} failed ({e}).')
+
+    def _open(self, channel):
+        open_driver = getattr(channel.driver, 'open', None)
+        try:
+            if open_driver is not None:
+                open_driver()
+            self._set_status(channel, 'connected')
+        except Exception as e:
+            # Reads go on; drivers reconnect lazily in read_device_value()
+            self._set_status(channel, 'error')
+            self._callback(self.on_error, f'{channel.name}: {e}')
+
+    def _read(self, channel):
+        channel._record_start(time.monotonic())
+        try:
+            value = channel.driver.read_device_value()
+        except Exception as e:
+            channel.errors += 1
+            self._set_status(channel, 'error')
+            self._callback(self.on_error, f'{channel.name}: {e}')
+        else:
+            t = time.time()  # One timestamp for the history and the callback
+            channel.reads += 1
+            channel.value = value
+            if channel.buffer is not None:
+                channel.buffer.append(t, value)
+            self._set_status(channel, 'connected')
+            self._callback(self.on_reading, channel.name, t, value)
+        finally:
+            channel.busy = False
+
+    def _close(self, channel):
+        close_driver = getattr(channel.driver, 'close', None)
+        try:
+            if close_driver is not None:
+                close_driver()
+        except Exception as e:
+            self._callback(self.on_error, f'{channel.name}: {e}')
+        self._set_status(channel, 'disconnected')
@@ -0,0 +1,192 @@
+# Async Modbus
+# asyncio variant of minimalmodbus.Instrument for Modbus RTU. Requests and responses are built and parsed with
+# minimalmodbus' own helpers (_create_payload, _embed_payload, _predict_response_size, _extract_payload,
+# _parse_payload), so the results and exceptions are the same as for the blocking Instrument. The silent period is
+# waited with asyncio.sleep and the response is read from the event loop (add_reader on the port's file descriptor,
+# polling on Windows), finishing as soon as the predicted number of bytes has arrived. One event loop can drive
+# instruments on several ports at once; instruments on the same port take turns.
+#
+#   async def main():
+#       controller = AsyncInstrument('/dev/ttyUSB0', 1)
+#       pv1, pv2 = await asyncio.gather(controller.read_register(289, 1), controller.read_register(1313, 1))
+
+import time
+import asyncio
+
+import serial
+
+import minimalmodbus
+from minimalmodbus import MODE_RTU
+
+POLL_INTERVAL_S = 0.001  # Used where the event loop can not watch the serial port (Windows)
+
+_ports = {}  # port name -> _AsyncPort
+
+
+class _AsyncPort:
+    """A serial port opened for non-blocking use, shared by the AsyncInstruments on it."""
+
+    def __init__(self, port, baudrate):
+        self.serial = serial.Serial(port=port, baudrate=baudrate, parity=serial.PARITY_NONE, bytesize=8,
+                                    stopbits=1, timeout=0, write_timeout=2.0)
+        self.latest_read_time = 0.0
+        self._lock = None
+        self._loop = None
+
+    @property
+    def lock(self):
+        # One asyncio.Lock per event loop (tests and scripts may run several loops one after the other)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lock = loop, asyncio.Lock()
+        return self._lock
+
+    def fileno(self):
+        try:
+            return self.serial.fileno()
+        except (AttributeError, NotImplementedError):
+            return None
+
+    async def read(self, number_of_bytes, timeout):
+        """Reads until number_of_bytes have arrived or timeout has passed. Returns what was received."""
+        fd = self.fileno()
+        if fd is None:
+            return await self._poll(number_of_bytes, timeout)
+        loop = asyncio.get_running_loop()
+        received = bytearray()
+        complete = loop.create_future()
+
+        def on_readable():
+            received.extend(self.serial.read(max(self.serial.in_waiting, 1)))
+            if len(received) >= number_of_bytes and not complete.done():
+                complete.set_result(None)
+
+        loop.add_reader(fd, on_readable)
+        try:
+            await asyncio.wait_for(complete, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+        return bytes(received)
+
+    async def _poll(self, number_of_bytes, timeout):
+        received = bytearray()
+        deadline = time.monotonic() + timeout
+        while len(received) < number_of_bytes and time.monotonic() < deadline:
+            chunk = self.serial.read(self.serial.in_waiting)
+            if chunk:
+                received.extend(chunk)
+            else:
+                await asyncio.sleep(POLL_INTERVAL_S)
+        return bytes(received)
+
+    def close(self):
+        self.serial.close()
+
+
+def close_ports():
+    """Closes every port opened by AsyncInstruments."""
+    for port in list(_ports.values()):
+        port.close()
+    _ports.clear()
+
+
+class AsyncInstrument:
+    """
+    Modbus RTU instrument for asyncio.
+
+    :param port: Serial port name. Instruments with the same port name share it.
+    :param slaveaddress: Slave address (1-247).
+    :param baudrate: Used when this instrument opens the port.
+    :param timeout: Read timeout in seconds.
+    """
+
+    def __init__(self, port, slaveaddress, baudrate=19200, timeout=0.05):
+        minimalmodbus._check_slaveaddress(slaveaddress)
+        self.address = slaveaddress
+        self.mode = MODE_RTU
+        self.timeout = timeout
+        self.clear_buffers_before_each_transaction = True
+        if port not in _ports or not _ports[port].serial.is_open:
+            _ports[port] = _AsyncPort(port, baudrate)
+        self._port = _ports[port]
+        self.roundtrip_time = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}<address={self.address}, port={self._port.serial.port}>'
+
+    @property
+    def serial(self):
+        return self._port.serial
+
+    # ---- Register access ----
+
+    async def read_register(self, registeraddress, number_of_decimals=0, functioncode=3, signed=False):
+        minimalmodbus._check_functioncode(functioncode, [3, 4])
+        return await self._generic_command(functioncode, registeraddress, number_of_decimals=number_of_decimals,
+                                           number_of_registers=1, signed=signed)
+
+    async def read_registers(self, registeraddress, number_of_registers, functioncode=3):
+        minimalmodbus._check_functioncode(functioncode, [3, 4])
+        minimalmodbus._check_int(number_of_registers, minvalue=1,
+                                 maxvalue=minimalmodbus._MAX_NUMBER_OF_REGISTERS_TO_READ,
+                                 description='number of registers')
+        return await self._generic_command(functioncode, registeraddress, number_of_registers=number_of_registers,
+                                           payloadformat=minimalmodbus._Payloadformat.REGISTERS)
+
+    async def write_register(self, registeraddress, value, number_of_decimals=0, functioncode=16, signed=False):
+        minimalmodbus._check_functioncode(functioncode, [6, 16])
+        minimalmodbus._check_numerical(value, description='input value')
+        return await self._generic_command(functioncode, registeraddress, value,
+                                           number_of_decimals=number_of_decimals, number_of_registers=1,
+                                           signed=signed)
+
+    async def write_registers(self, registeraddress, values):
+        if not isinstance(values, list):
+            raise TypeError(f'The values parameter must be a list. Given: {values!r}')
+        minimalmodbus._check_int(len(values), minvalue=1, maxvalue=minimalmodbus._MAX_NUMBER_OF_REGISTERS_TO_WRITE,
+                                 description='length of input list')
+        return await self._generic_command(16, registeraddress, values, number_of_registers=len(values),
+                                           payloadformat=minimalmodbus._Payloadformat.REGISTERS)
+
+    async def _generic_command(self, functioncode, registeraddress, value=None, number_of_decimals=0,
+                               number_of_registers=0, signed=False,
+                               payloadformat=minimalmodbus._Payloadformat.REGISTER):
+        minimalmodbus._check_registeraddress(registeraddress)
+        minimalmodbus._check_int(number_of_decimals, minvalue=0, maxvalue=minimalmodbus._MAX_NUMBER_OF_DECIMALS,
+                                 description='number of decimals')
+        payload_to_slave = minimalmodbus._create_payload(functioncode, registeraddress, value, number_of_decimals,
+                                                         number_of_registers, 0, signed,
+                                                         minimalmodbus.BYTEORDER_BIG, payloadformat)
+        payload_from_slave = await self._perform_command(functioncode, payload_to_slave)
+        return minimalmodbus._parse_payload(payload_from_slave, functioncode, registeraddress, value,
+                                            number_of_decimals, number_of_registers, 0, signed,
+                                            minimalmodbus.BYTEORDER_BIG, payloadformat)
+
+    async def _perform_command(self, functioncode, payload_to_slave):
+        request = minimalmodbus._embed_payload(self.address, self.mode, functioncode, payload_to_slave)
+        number_of_bytes_to_read = minimalmodbus._predict_response_size(self.mode, functioncode, payload_to_slave)
+        response = await self._communicate(request, number_of_bytes_to_read)
+        return minimalmodbus._extract_payload(response, self.address, self.mode, functioncode)
+
+    async def _communicate(self, request, number_of_bytes_to_read):
+        port = self._port
+        async with port.lock:
+            if not port.serial.is_open:
+                port.serial.open()
+            if self.clear_buffers_before_each_transaction:
+                port.serial.reset_input_buffer()
+            # Wait out the 3.5 character silent period without blocking the event loop
+            silent_period = minimalmodbus._calculate_minimum_silent_period(port.serial.baudrate)
+            remaining = port.latest_read_time + silent_period - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            write_time = time.monotonic()
+            port.serial.write(request)
+            answer = await port.read(number_of_bytes_to_read, self.timeout)
+            port.latest_read_time = time.monotonic()
+            self.roundtrip_time = port.latest_read_time - write_time
+        if not answer:
+            raise minimalmodbus.NoResponseError('No communication with the instrument (no answer)')
+        return answer
@@ -0,0 +1,60 @@
+# Bus Scheduler Benchmark
+# Polls the loop 1 PV of several Eurotherms on one simulated RS-485 line (MockModbusSlave at 19200 baud), first with
+# each Instrument reading on its own, then through the port's BusScheduler, and prints the time per read next to the
+# wire floor (request + response characters plus the 3.5 character silent period).
+#
+#   python BusSchedulerBenchmark.py [n_controllers] [n_rounds]
+
+import sys
+import time
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+from ModbusBusScheduler import get_scheduler, character_bits
+
+BAUDRATE = 19200
+REGISTER = 289  # Process value loop 1
+
+
+def main(n_controllers=4, n_rounds=200):
+    addresses = range(1, n_controllers + 1)
+    with MockModbusSlave(slaves={address: dict(EUROTHERM_REGISTERS) for address in addresses},
+                         baudrate=BAUDRATE) as slave:
+        instruments = [minimalmodbus.Instrument(slave.port, address) for address in addresses]
+        for instrument in instruments:
+            instrument.serial.baudrate = BAUDRATE
+        reads = [instrument.prepare_read(REGISTER, number_of_decimals=1) for instrument in instruments]
+        reads[0]()  # Warm up (opens the port)
+
+        start = time.perf_counter()
+        for _ in range(n_rounds):
+            for instrument in instruments:
+                instrument.read_register(REGISTER, 1)
+        independent = (time.perf_counter() - start) / (n_rounds * n_controllers)
+
+        scheduler = get_scheduler(instruments[0])
+        scheduler.reset_stats()
+        start = time.perf_counter()
+        futures = [scheduler.submit(read) for _ in range(n_rounds) for read in reads]
+        for future in futures:
+            future.result()
+        scheduled = (time.perf_counter() - start) / (n_rounds * n_controllers)
+        stats = scheduler.stats()
+        scheduler.close()
+
+        frame_bytes = len(reads[0].request) + reads[0].response_size
+        floor = (frame_bytes * character_bits(instruments[0].serial) / BAUDRATE
+                 + minimalmodbus._calculate_minimum_silent_period(BAUDRATE))
+        instruments[0].serial.close()
+
+    print(f'independent reads  {independent * 1e3:6.2f} ms/read')
+    print(f'bus scheduler      {scheduled * 1e3:6.2f} ms/read   ({floor / scheduled:.0%} of wire speed)')
+    print(f'wire floor         {floor * 1e3:6.2f} ms/read')
+    print(f"utilization {stats['utilization']:.0%}, wire utilization {stats['wire_utilization']:.0%}, "
+          f"gap between back-to-back requests {stats['backlog_gap_mean_s'] * 1e3:.2f} ms "
+          f"(silent period {stats['silent_period_s'] * 1e3:.2f} ms)")
+    return stats
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
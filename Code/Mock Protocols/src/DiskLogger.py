@@ -0,0 +1,265 @@
+# Disk Logger
+# Saves every reading of the acquisition engine to disk from a background thread. Readings are handed over through a
+# bounded queue (put_nowait: a full queue drops the reading and counts it, so the I/O threads and the GUI never wait
+# for the disk). The writer collects them into chunks and appends each chunk to the current file column by column
+# (timestamps, channel IDs, values, status codes), through a large write buffer with an fsync every few seconds.
+# Files are rotated by size and age, and every file is readable on its own.
+#
+#   logger = DiskLogger('logs')
+#   logger.start()
+#   engine = AcquisitionEngine(on_reading=logger.log)      # log(channel, t, value, status=OK)
+#   ...
+#   logger.close()
+#   data = read_log('logs/acquisition_20250101_120000.ylog')   # {'t': ..., 'channel': ..., 'value': ..., ...}
+#
+# File layout: MAGIC, then chunks of (kind: 1 byte, payload length: uint32 LE, payload).
+#   kind b'N': channel ID (uint16 LE) + channel name (UTF-8)
+#   kind b'D': row count n (uint32 LE) + t (n float64) + channel (n uint16) + value (n float64) + status (n uint8)
+
+import os
+import time
+import queue
+import struct
+import logging
+from threading import Thread, Lock
+
+import numpy as np
+
+MAGIC = b'YLLOG001'
+EXTENSION = '.ylog'
+
+# Status codes
+OK = 0
+ERROR = 1
+DISCONNECTED = 2
+STATUS_CODES = {'connected': OK, 'error': ERROR, 'disconnected': DISCONNECTED}
+
+# Columns of a data chunk, in file order
+COLUMNS = (('t', '<f8'), ('channel', '<u2'), ('value', '<f8'), ('status', 'u1'))
+
+_STOP = object()
+
+
+class DiskLogger:
+    """
+    :param directory: Where the log files go (created if needed).
+    :param prefix: File names are <prefix>_<YYYYmmdd_HHMMSS>.ylog.
+    :param max_bytes: A file that reaches this size is closed and a new one started.
+    :param max_age_s: A file older than this is closed and a new one started.
+    :param queue_size: Readings that can wait for the writer before new ones are dropped.
+    :param chunk_s: The writer appends a chunk at least this often (and when chunk_rows readings are waiting).
+    :param fsync_s: Time between fsyncs (at most this much is lost on a power cut).
+    """
+
+    def __init__(self, directory, prefix='acquisition', max_bytes=64 * 2 ** 20, max_age_s=24 * 3600,
+                 queue_size=100_000, chunk_s=1.0, chunk_rows=10_000, fsync_s=5.0, buffer_bytes=2 ** 20):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.chunk_s = chunk_s
+        self.chunk_rows = chunk_rows
+        self.fsync_s = fsync_s
+        self.buffer_bytes = buffer_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0     # Readings lost because the queue was full (or their chunk could not be written)
+        self.written = 0     # Readings written to disk
+        self.files = []      # Paths of every file written
+        self.channel_ids = {}  # channel name -> ID (stable for the logger's lifetime)
+        self._file = None
+        self._file_bytes = 0
+        self._file_opened = 0.0
+        self._last_fsync = 0.0
+        self._thread = None
+        self._dropped_lock = Lock()  # log() is called from many threads
+
+    # ---- Producer side (any thread, never blocks) ----
+
+    def log(self, channel, t, value, status=OK):
+        """Queues one reading. Returns False (and counts it as dropped) if the queue is full."""
+        try:
+            self.queue.put_nowait((t, channel, value, status))
+            return True
+        except queue.Full:
+            self._count_dropped(1)
+            return False
+
+    def _count_dropped(self, n):
+        with self._dropped_lock:
+            self.dropped += n
+
+    def log_status(self, channel, status):
+        """Queues a status change (e.g. an AcquisitionEngine on_status callback) as a NaN reading."""
+        return self.log(channel, time.time(), float('nan'), STATUS_CODES.get(status, ERROR))
+
+    def stats(self):
+        return {'queue_depth': self.queue.qsize(),
+                'queue_size': self.queue.maxsize,
+                'dropped': self.dropped,
+                'written': self.written,
+                'files': len(self.files),
+                'file': self.files[-1] if self.files else None,
+                'file_bytes': self._file_bytes}
+
+    # ---- Writer thread ----
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = Thread(target=self._run, name='DiskLogger', daemon=True)
+        self._thread.start()
+
+    def close(self, timeout=10.0):
+        """Writes what is queued, fsyncs and closes the file."""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None
+        if not thread.is_alive():
+            logging.warning(f'Disk logger: the writer had stopped, {self.queue.qsize()} readings were not written.')
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self.queue.put(_STOP, timeout=timeout)  # Waits only while the queue is full and the writer empties it
+        except queue.Full:
+            logging.warning(f'Disk logger: the writer did not empty the queue within {timeout} s.')
+            return
+        thread.join(max(deadline - time.monotonic(), 0.0))
+
+    def _run(self):
+        rows = []
+        next_chunk = time.monotonic() + self.chunk_s
+        stopping = False
+        while not stopping:
+            try:
+                item = self.queue.get(timeout=max(next_chunk - time.monotonic(), 0.0))
+                if item is _STOP:
+                    stopping = True
+                else:
+                    rows.append(item)
+                    # Take whatever else is waiting without going back to sleep
+                    while len(rows) < self.chunk_rows:
+                        item = self.queue.get_nowait()
+                        if item is _STOP:
+                            stopping = True
+                            break
+                        rows.append(item)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            # A failed chunk or fsync costs that chunk and the file it went to, never the writer
+            if rows and (stopping or len(rows) >= self.chunk_rows or now >= next_chunk):
+                try:
+                    self._write_rows(rows)
+                except Exception as e:
+                    logging.warning(f'Disk logger: could not write {len(rows)} readings ({e}).')
+                    self._count_dropped(len(rows))
+                    self._abandon_file()
+                rows = []
+            if now >= next_chunk:
+                next_chunk = now + self.chunk_s
+            if self._file is not None and (stopping or now - self._last_fsync >= self.fsync_s):
+                try:
+                    self._sync()
+                except Exception as e:
+                    logging.warning(f'Disk logger: could not sync {self.files[-1]} ({e}).')
+                    self._abandon_file()
+        try:
+            self._close_file()
+        except Exception as e:
+            logging.warning(f'Disk logger: could not close {self.files[-1]} ({e}).')
+
+    def _open_file(self):
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.directory, f'{self.prefix}_{stamp}{EXTENSION}')
+        number = 1
+        while os.path.exists(path):
+            number += 1
+            path = os.path.join(self.directory, f'{self.prefix}_{stamp}_{number}{EXTENSION}')
+        self._file = open(path, 'ab', buffering=self.buffer_bytes)
+        self._file.write(MAGIC)
+        self._file_bytes = len(MAGIC)
+        self._file_opened = time.monotonic()
+        self._last_fsync = self._file_opened
+        self.files.append(path)
+        # Every file names all channels known so far, so it can be read without the others
+        for name, channel_id in self.channel_ids.items():
+            self._write_name(name, channel_id)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _abandon_file(self):
+        # The next chunk starts a new file rather than appending after a write that may have been cut short
+        file, self._file = self._file, None
+        if file is not None:
+            try:
+                file.close()
+            except Exception:
+                pass
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+
+    def _write_chunk(self, kind, payload):
+        self._file.write(kind + struct.pack('<I', len(payload)) + payload)
+        self._file_bytes += 5 + len(payload)
+
+    def _write_name(self, name, channel_id):
+        self._write_chunk(b'N', struct.pack('<H', channel_id) + str(name).encode())
+
+    def _write_rows(self, rows):
+        if self._file is not None and (self._file_bytes >= self.max_bytes
+                                       or time.monotonic() - self._file_opened >= self.max_age_s):
+            self._close_file()
+        if self._file is None:
+            self._open_file()
+        t, names, values, status = zip(*rows)
+        ids = []
+        for name in names:
+            channel_id = self.channel_ids.get(name)
+            if channel_id is None:
+                channel_id = self.channel_ids[name] = len(self.channel_ids)
+                self._write_name(name, channel_id)
+            ids.append(channel_id)
+        payload = struct.pack('<I', len(rows)) + b''.join(
+            np.asarray(column, dtype=dtype).tobytes() for column, (_, dtype) in zip((t, ids, values, status), COLUMNS))
+        self._write_chunk(b'D', payload)
+        self.written += len(rows)
+
+
+def read_log(path):
+    """
+    Reads one log file. Returns {'t', 'channel', 'value', 'status'} arrays and 'names' (channel ID -> name).
+    A chunk cut short by a crash at the end of the file is ignored.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f'{path} is not a log file.')
+    names = {}
+    columns = {key: [] for key, _ in COLUMNS}
+    position = len(MAGIC)
+    while position + 5 <= len(data):
+        kind = data[position:position + 1]
+        length, = struct.unpack_from('<I', data, position + 1)
+        payload = data[position + 5:position + 5 + length]
+        if len(payload) < length:
+            break
+        position += 5 + length
+        if kind == b'N':
+            channel_id, = struct.unpack_from('<H', payload)
+            names[channel_id] = payload[2:].decode()
+        elif kind == b'D':
+            n, = struct.unpack_from('<I', payload)
+            offset = 4
+            for key, dtype in COLUMNS:
+                column = np.frombuffer(payload, dtype=dtype, count=n, offset=offset)
+                columns[key].append(column)
+                offset += column.nbytes
+    result = {key: np.concatenate(columns[key]) if columns[key] else np.empty(0, dtype) for key, dtype in COLUMNS}
+    result['names'] = names
+    return result
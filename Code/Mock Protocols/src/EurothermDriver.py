@@ -1,76 +1,410 @@
 #!/usr/bin/env python
+import math
 import time
+import logging
+import functools
+import threading
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+
+import numpy as np
+
 import minimalmodbus
+from ModbusTransport import RtuTransport, TcpTransport, MODBUS_TCP_PORT
 
 __author__  = "Jonas Berg"
 __email__   = "pyhys@users.sourceforge.net"
 __license__ = "Apache License, Version 2.0"
 
-class Eurotherm3500(minimalmodbus.Instrument):
-    def __init__(self, portname, subordinateaddress):
-        minimalmodbus.Instrument.__init__(self, portname, subordinateaddress)
+
+class Register(NamedTuple):
+    """Where a field lives and how its raw 16-bit value converts to engineering units."""
+    address: int
+    decimals: int = 0
+    signed: bool = False
+    units: str = ''
+
+
+# Register map: field -> Register. Temperatures and outputs are two's complement (a furnace cooled below 0 °C or a
+# heat/cool output reads negative); flags and rates are unsigned.
+REGISTERS = {
+    'sptarget_loop1': Register(2, 1, True, '°C'),
+    'sp_loop1': Register(5, 1, True, '°C'),
+    'sprate_loop1': Register(35, 1, False, '°C/min'),
+    'sprate_disabled_loop1': Register(78, 1),
+    'op_loop1': Register(85, 1, True, '%'),
+    'inhibited_loop1': Register(268, 1),
+    'manual_loop1': Register(273, 1),
+    'pv_loop1': Register(289, 1, True, '°C'),
+    'pv_module3': Register(370, 1, True, '°C'),
+    'pv_module4': Register(373, 1, True, '°C'),
+    'pv_module6': Register(379, 1, True, '°C'),
+    'sp_loop2': Register(1029, 1, True, '°C'),
+    'op_loop2': Register(1109, 1, True, '%'),
+    'pv_loop2': Register(1313, 1, True, '°C'),
+    'alarmsummary': Register(10213, 1),
+    'threshold_alarm1': Register(10241, 1, True, '°C'),
+}
+FIELDS_BY_ADDRESS = {register.address: field for field, register in REGISTERS.items()}
+BOOL_FIELDS = {'sprate_disabled_loop1', 'inhibited_loop1', 'manual_loop1', 'alarmsummary'}
+
+# How long a register value read from the controller is reused. Process values and outputs are live (always read);
+# operating state that is changed from the front panel now and then is slow; configuration is static.
+LIVE = 'live'
+SLOW = 'slow'
+STATIC = 'static'
+TTL_S = {LIVE: 0.0, SLOW: 5.0, STATIC: 300.0}
+# TTL class of the registers that are not live
+REGISTER_TTL = {
+    2: SLOW,        # Target setpoint loop 1
+    268: SLOW,      # Loop 1 inhibited
+    273: SLOW,      # Loop 1 in manual
+    35: STATIC,     # Setpoint rate loop 1
+    78: STATIC,     # Setpoint rate disabled loop 1
+    10241: STATIC,  # Alarm 1 threshold
+}
+
+# Longest run of unwanted registers read to avoid starting a new transaction. A new transaction costs about as much
+# line time as ~10 extra registers (request, response header/CRC and two silent periods) plus the adapter latency,
+# which on USB-serial adapters is usually the larger part, so by default blocks are only limited by the Modbus
+# maximum of 125 registers per read.
+DEFAULT_MAX_GAP = 125
+MAX_BLOCK = 125
+
+
+@dataclass
+class EurothermSnapshot:
+    """Readout of a Eurotherm 3500. Fields that were not requested are None."""
+    time: float
+    transactions: int
+    sptarget_loop1: Optional[float] = None
+    sp_loop1: Optional[float] = None
+    sprate_loop1: Optional[float] = None
+    sprate_disabled_loop1: Optional[bool] = None
+    op_loop1: Optional[float] = None
+    inhibited_loop1: Optional[bool] = None
+    manual_loop1: Optional[bool] = None
+    pv_loop1: Optional[float] = None
+    pv_module3: Optional[float] = None
+    pv_module4: Optional[float] = None
+    pv_module6: Optional[float] = None
+    sp_loop2: Optional[float] = None
+    op_loop2: Optional[float] = None
+    pv_loop2: Optional[float] = None
+    alarmsummary: Optional[bool] = None
+    threshold_alarm1: Optional[float] = None
+
+
+class RegisterCache:
+    """
+    Raw register values with a time-to-live per register (from its TTL class). Writes through the driver invalidate
+    the register when they complete, and a read that started before the last write of its register is not cached
+    (it may hold the old value). hits counts reads served from the cache, misses the reads that went to the controller.
+    """
+
+    def __init__(self, ttl_s=None, register_ttl=None, clock=time.monotonic):
+        self.ttl_s = dict(TTL_S if ttl_s is None else ttl_s)
+        self.register_ttl = dict(REGISTER_TTL if register_ttl is None else register_ttl)
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._values = {}  # register address -> (raw value, time read)
+        self._written = {}  # register address -> time its last write completed
+        self._lock = threading.Lock()
+
+    def ttl(self, register):
+        return self.ttl_s[self.register_ttl.get(register, LIVE)]
+
+    def get(self, register):
+        """Cached raw value of the register, or None if it has to be read."""
+        ttl = self.ttl(register)
+        with self._lock:
+            entry = self._values.get(register) if ttl > 0 else None
+            if entry is not None and self.clock() - entry[1] < ttl:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, register, raw_value, read_started=None):
+        """Caches a value read from the controller; read_started is the clock() time the read was sent."""
+        if self.ttl(register) > 0:
+            with self._lock:
+                if read_started is not None and read_started < self._written.get(register, -math.inf):
+                    return  # Overlapped a write: may be the value from before it
+                self._values[register] = (raw_value, self.clock())
+
+    def invalidate(self, register=None, written=False):
+        """Forgets one register (or all of them). written=True: a write of the register has just completed."""
+        with self._lock:
+            if register is None:
+                self._values.clear()
+            else:
+                self._values.pop(register, None)
+                if written:
+                    self._written[register] = self.clock()
+
+    def stats(self):
+        reads = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / reads if reads else 0.0,
+                'entries': len(self._values)}
+
+
+def plan_blocks(addresses, max_gap=DEFAULT_MAX_GAP, max_block=MAX_BLOCK):
+    """Groups register addresses into the fewest contiguous (start, count) blocks.
+
+    Two registers share a block when at most max_gap unwanted registers lie between them and the block stays
+    within max_block registers.
+    """
+    blocks = []
+    for address in sorted(set(addresses)):
+        if blocks:
+            start, count = blocks[-1]
+            last = start + count - 1
+            if address - last - 1 <= max_gap and address - start + 1 <= max_block:
+                blocks[-1] = (start, address - start + 1)
+                continue
+        blocks.append((address, 1))
+    return blocks
+
+
+
+@functools.lru_cache(maxsize=None)
+def _conversion(fields):
+    registers = [REGISTERS[field] for field in fields]
+    return (np.array([register.signed for register in registers]),
+            10.0 ** np.array([register.decimals for register in registers]))
+
+
+def decode(fields, raw):
+    """Engineering values of raw register values: raw[..., j] is the raw value of fields[j].
+
+    Any leading shape (one readout, a row per controller, a log of many readouts) is converted in one step.
+    """
+    raw = np.asarray(raw, dtype=np.int64) & 0xFFFF
+    signed, scale = _conversion(tuple(fields))
+    return np.where(signed & (raw >= 0x8000), raw - 0x10000, raw) / scale
+
+
+def decode_block(start, raw, fields=None):
+    """Engineering values of the fields inside a block read from `start`: raw[..., i] is register start + i.
+
+    Returns field -> value (an array of the leading shape of raw). fields defaults to every mapped field in the block.
+    """
+    raw = np.asarray(raw)
+    end = start + raw.shape[-1]
+    if fields is None:
+        fields = [field for field, register in REGISTERS.items() if start <= register.address < end]
+    outside = [field for field in fields if not start <= REGISTERS[field].address < end]
+    if outside:
+        raise ValueError(f'Fields {outside} are not in registers {start}-{end - 1}.')
+    values = decode(fields, raw[..., [REGISTERS[field].address - start for field in fields]])
+    return {field: values[..., j] for j, field in enumerate(fields)}
+
+
+def encode(field, value):
+    """Raw register value (0-65535) to write for an engineering value."""
+    register = REGISTERS[field]
+    raw = int(round(value * 10 ** register.decimals))
+    low, high = (-0x8000, 0x7FFF) if register.signed else (0, 0xFFFF)
+    if not low <= raw <= high:
+        raise ValueError(f'{value} {register.units} is out of range for {field}.')
+    return raw & 0xFFFF
+
+
+class Eurotherm3500:
+    """
+    Eurotherm 3500 over Modbus RTU (serial) or Modbus TCP. The register map, decoding and snapshot() are the same
+    for both links.
+
+    controller = Eurotherm3500('/dev/ttyUSB0', 1)                 # RTU
+    controller = Eurotherm3500.tcp('192.168.111.222', device_id=1)  # TCP, one persistent connection
+
+    Register reads go through a RegisterCache (see REGISTER_TTL); pass cache=None to always read from the controller.
+    """
+
+    def __init__(self, portname=None, subordinateaddress=1, transport=None, cache=True):
+        if transport is None:
+            transport = RtuTransport(portname, subordinateaddress)
+        self.transport = transport
+        self.cache = RegisterCache() if cache is True else cache or None
+        self.max_gap = DEFAULT_MAX_GAP
+        self._plans = {}  # (fields, max_gap) -> list of (start, count) blocks
+
+    @classmethod
+    def tcp(cls, host, device_id=1, port=MODBUS_TCP_PORT, timeout=1.0, cache=True):
+        return cls(transport=TcpTransport(host, device_id, port=port, timeout=timeout), cache=cache)
+
+    @property
+    def serial(self):
+        """The serial port (RTU only), e.g. to change the baud rate or timeout."""
+        return self.transport.serial
+
+    def close(self):
+        self.transport.close()
+
+    def read_register(self, registeraddress, number_of_decimals=0):
+        raw = self.cache.get(registeraddress) if self.cache else None
+        if raw is None:
+            started = self.cache.clock() if self.cache else None
+            values, = self.transport.read_blocks([(registeraddress, 1)])
+            if isinstance(values, Exception):
+                raise values
+            raw = values[0]
+            if self.cache:
+                self.cache.put(registeraddress, raw, read_started=started)
+        return raw / 10 ** number_of_decimals if number_of_decimals else raw
+
+    def write_register(self, registeraddress, value, number_of_decimals=0):
+        if self.cache:
+            # Guard: if the write fails halfway the register is read again either way
+            self.cache.invalidate(registeraddress)
+        try:
+            self.transport.write_register(registeraddress, int(round(value * 10 ** number_of_decimals)))
+        finally:
+            if self.cache:
+                # Again once the write is done: another thread may have cached the old value in the meantime
+                self.cache.invalidate(registeraddress, written=True)
+
+    def read_field(self, field):
+        """One field of REGISTERS in engineering units."""
+        return decode((field,), self.read_register(REGISTERS[field].address)).item()
+
+    def write_field(self, field, value):
+        self.write_register(REGISTERS[field].address, encode(field, value))
+
+    # ---- Block readout ----
+
+    def _plan(self, fields, max_gap):
+        key = (fields, max_gap)
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._plans[key] = plan_blocks([REGISTERS[field].address for field in fields], max_gap)
+        return plan
+
+    def _read_plan(self, plan, wanted):
+        """Reads every block of the plan. Returns (address -> raw value, transactions used)."""
+        raw = {}
+        refused = []
+        for (start, count), values in zip(plan, self.transport.read_blocks(plan)):
+            if isinstance(values, minimalmodbus.IllegalRequestError) and count > 1:
+                refused.append((start, count))
+            elif isinstance(values, Exception):
+                raise values
+            else:
+                raw.update(zip(range(start, start + count), values))
+        transactions = len(plan)
+        for start, count in refused:
+            # The controller refused the block (it spans undefined registers): read the wanted ones on their own
+            # from now on
+            logging.warning(f'Eurotherm {self.transport} refused registers {start}-{start + count - 1}, '
+                            f'reading them one by one.')
+            singles = [(address, 1) for address in sorted(wanted) if start <= address < start + count]
+            index = plan.index((start, count))
+            plan[index:index + 1] = singles
+            values, used = self._read_plan(singles, wanted)
+            raw.update(values)
+            transactions += used
+        return raw, transactions
+
+    def snapshot(self, fields=None, max_gap=None):
+        """Reads the given fields of REGISTERS (default: all) in as few transactions as possible.
+
+        Returns an EurothermSnapshot with scaled values (booleans for the status fields). Fields with a fresh cached
+        value are not read. Over TCP all blocks are sent in one pipelined batch.
+        """
+        fields = tuple(REGISTERS) if fields is None else tuple(fields)
+        unknown = [field for field in fields if field not in REGISTERS]
+        if unknown:
+            raise ValueError(f'Unknown Eurotherm fields: {unknown}.')
+        max_gap = self.max_gap if max_gap is None else max_gap
+        raw = {}
+        to_read = []
+        for field in fields:
+            address = REGISTERS[field].address
+            value = self.cache.get(address) if self.cache else None
+            if value is None:
+                to_read.append(field)
+            else:
+                raw[address] = value
+        transactions = 0
+        if to_read:
+            started = self.cache.clock() if self.cache else None
+            wanted = {REGISTERS[field].address for field in to_read}
+            values, transactions = self._read_plan(self._plan(tuple(to_read), max_gap), wanted)
+            for address in wanted:
+                raw[address] = values[address]
+                if self.cache:
+                    self.cache.put(address, values[address], read_started=started)
+        values = decode(fields, [raw[REGISTERS[field].address] for field in fields]).tolist()
+        decoded = {field: value > 0 if field in BOOL_FIELDS else value for field, value in zip(fields, values)}
+        return EurothermSnapshot(time=time.time(), transactions=transactions, **decoded)
 
     # ---- Read-only functions ----
 
     def get_pv_loop1(self):
-        return self.read_register(289, 1)
+        return self.read_field('pv_loop1')
 
     def get_pv_loop2(self):
-        return self.read_register(1313, 1)
+        return self.read_field('pv_loop2')
 
     def get_pv_module3(self):
-        return self.read_register(370, 1)
+        return self.read_field('pv_module3')
 
     def get_pv_module4(self):
-        return self.read_register(373, 1)
+        return self.read_field('pv_module4')
 
     def get_pv_module6(self):
-        return self.read_register(379, 1)
+        return self.read_field('pv_module6')
 
     def is_manual_loop1(self):
-        return self.read_register(273, 1) > 0
+        return self.read_field('manual_loop1') > 0
 
     def get_sptarget_loop1(self):
-        return self.read_register(2, 1)
+        return self.read_field('sptarget_loop1')
+
+    def set_sptarget_loop1(self, value):
+        self.write_field('sptarget_loop1', value)
 
     def get_sp_loop1(self):
-        return self.read_register(5, 1)
+        return self.read_field('sp_loop1')
 
-    # def set_sp_loop1(self, value):
-    #     self.write_register(24, value, 1)
+    def set_sp_loop1(self, value):
+        # SP1 (24) is not read back by itself; it is scaled like the working setpoint
+        self.write_register(24, encode('sp_loop1', value))
 
     def get_sp_loop2(self):
-        return self.read_register(1029, 1)
+        return self.read_field('sp_loop2')
 
     def get_sprate_loop1(self):
-        return self.read_register(35, 1)
+        return self.read_field('sprate_loop1')
 
-    # def set_sprate_loop1(self, value):
-    #     self.write_register(35, value, 1)
+    def set_sprate_loop1(self, value):
+        self.write_field('sprate_loop1', value)
 
     def is_sprate_disabled_loop1(self):
-        return self.read_register(78, 1) > 0
+        return self.read_field('sprate_disabled_loop1') > 0
 
-    # def disable_sprate_loop1(self):
-    #     self.write_register(78, 1, 0)
+    def disable_sprate_loop1(self):
+        self.write_register(78, 1, 0)
 
-    # def enable_sprate_loop1(self):
-    #     self.write_register(78, 0, 0)
+    def enable_sprate_loop1(self):
+        self.write_register(78, 0, 0)
 
     def get_op_loop1(self):
-        return self.read_register(85, 1)
+        return self.read_field('op_loop1')
 
     def is_inhibited_loop1(self):
-        return self.read_register(268, 1) > 0
+        return self.read_field('inhibited_loop1') > 0
 
     def get_op_loop2(self):
-        return self.read_register(1109, 1)
+        return self.read_field('op_loop2')
 
     def get_threshold_alarm1(self):
-        return self.read_register(10241, 1)
+        return self.read_field('threshold_alarm1')
 
     def is_set_alarmsummary(self):
-        return self.read_register(10213, 1) > 0
+        return self.read_field('alarmsummary') > 0
 
 
 ########################
@@ -82,7 +416,6 @@ if __name__ == '__main__':
 
     a = Eurotherm3500('/dev/tty.usbserial-B0049PNY', 1)
     time.sleep(2)
-    a.debug = True
 
     print('SP1:                    {0}'.format(a.get_sp_loop1()))
     print('SP1 target:             {0}'.format(a.get_sptarget_loop1()))
@@ -0,0 +1,133 @@
+# Eurotherm Pool
+# Polls several Eurotherm 3500 controllers (furnaces) at once and returns one timestamped array with the loop 1 and
+# loop 2 PV, working setpoint and output of all of them. Every controller keeps its persistent link. Controllers on
+# different links are read in parallel: each TCP controller on a thread of the pool, RTU controllers through the bus
+# scheduler of their serial port (one port is half-duplex, so controllers sharing it take turns, but separate ports
+# run side by side). A cycle therefore takes about as long as the slowest link, not the sum of all controllers.
+#
+#   pool = EurothermPool.from_addresses(tcp=[('192.168.111.222', 1), ('192.168.111.223', 1)],
+#                                       rtu=[('/dev/ttyUSB0', 1), ('/dev/ttyUSB0', 2)])
+#   t, values = pool.snapshot()   # values[i] = [pv_loop1, sp_loop1, op_loop1, pv_loop2, sp_loop2, op_loop2]
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from EurothermDriver import Eurotherm3500, REGISTERS
+from ModbusTransport import RtuTransport, MODBUS_TCP_PORT
+from ModbusBusScheduler import get_scheduler
+
+# Columns of the snapshot array
+POOL_FIELDS = ('pv_loop1', 'sp_loop1', 'op_loop1', 'pv_loop2', 'sp_loop2', 'op_loop2')
+
+
+class EurothermPool:
+    """
+    N Eurotherm 3500 controllers read concurrently.
+
+    :param controllers: EurothermDriver.Eurotherm3500 objects (TCP and/or RTU).
+    :param names: One name per controller (default: the transport, e.g. "TcpTransport('192.168.111.222', 1, ...)").
+    :param fields: Fields of EurothermDriver.REGISTERS in the columns of the snapshot array.
+    :param latency_smoothing: Weight of the newest read in the smoothed latency.
+    :param max_workers: Threads for the TCP controllers (default: one per TCP controller).
+    """
+
+    def __init__(self, controllers, names=None, fields=POOL_FIELDS, latency_smoothing=0.2, max_workers=None):
+        if len(controllers) == 0:
+            raise ValueError('At least one controller is needed.')
+        self.controllers = list(controllers)
+        self.names = list(names) if names is not None else [str(c.transport) for c in self.controllers]
+        if len(self.names) != len(self.controllers):
+            raise ValueError('One name per controller is needed.')
+        self.fields = tuple(fields)
+        self.units = [REGISTERS[field].units for field in self.fields]
+        self.latency_smoothing = latency_smoothing
+        n = len(self.controllers)
+        self.latency = np.full(n, np.nan)  # Smoothed time to read one controller (s)
+        self.last_latency = np.full(n, np.nan)
+        self.misses = np.zeros(n, dtype=int)  # Consecutive failed reads per controller
+        self.cycle_time = np.nan
+        # RTU controllers run on their port's scheduler, the others on the thread pool
+        self._schedulers = [get_scheduler(c.transport.instrument) if isinstance(c.transport, RtuTransport) else None
+                            for c in self.controllers]
+        threads = sum(scheduler is None for scheduler in self._schedulers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max(threads, 1),
+                                            thread_name_prefix='EurothermPool')
+
+    @classmethod
+    def from_addresses(cls, tcp=(), rtu=(), **kwargs):
+        """
+        tcp: (host, device_id) or (host, device_id, port) per controller; rtu: (serial port, slave address).
+        """
+        controllers, names = [], []
+        for address in tcp:
+            host, device_id = address[:2]
+            port = address[2] if len(address) > 2 else MODBUS_TCP_PORT
+            controllers.append(Eurotherm3500.tcp(host, device_id, port=port))
+            names.append(f'{host}:{port}/{device_id}')
+        for port, slave in rtu:
+            controllers.append(Eurotherm3500(port, slave))
+            names.append(f'{port}/{slave}')
+        return cls(controllers, names=names, **kwargs)
+
+    def __len__(self):
+        return len(self.controllers)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for controller in self.controllers:
+            controller.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _read(self, index):
+        """Reads one controller. Returns (row of values, seconds taken)."""
+        start = time.perf_counter()
+        readout = self.controllers[index].snapshot(self.fields)
+        return [getattr(readout, field) for field in self.fields], time.perf_counter() - start
+
+    def snapshot(self):
+        """
+        Reads every controller. Returns (time, values) with values[i, j] = field j of controller i, NaN for
+        controllers that did not answer.
+        """
+        start = time.perf_counter()
+        t = time.time()
+        futures = [self._executor.submit(self._read, i) if scheduler is None else scheduler.submit(self._read, i)
+                   for i, scheduler in enumerate(self._schedulers)]
+        values = np.full((len(self), len(self.fields)), np.nan)
+        for i, future in enumerate(futures):
+            try:
+                row, elapsed = future.result()
+            except Exception as e:
+                if self.misses[i] == 0:
+                    logging.warning(f'Eurotherm {self.names[i]}: read failed ({e}).')
+                self.misses[i] += 1
+                continue
+            if self.misses[i]:
+                logging.warning(f'Eurotherm {self.names[i]}: answering again after {self.misses[i]} failed reads.')
+            self.misses[i] = 0
+            values[i] = row
+            self.last_latency[i] = elapsed
+            if np.isnan(self.latency[i]):
+                self.latency[i] = elapsed
+            else:
+                self.latency[i] += self.latency_smoothing * (elapsed - self.latency[i])
+        self.cycle_time = time.perf_counter() - start
+        return t, values
+
+    def status(self):
+        return {
+            'controllers': len(self),
+            'online': int(np.sum(self.misses == 0)),
+            'cycle_time_s': self.cycle_time,
+            'latency_s': dict(zip(self.names, self.latency.tolist())),
+            'slowest': self.names[int(np.nanargmax(self.latency))] if not np.all(np.isnan(self.latency)) else None,
+        }
@@ -0,0 +1,241 @@
+# Eurotherm Program
+# Setpoint programs for a Eurotherm 3500 loop 1: a list of (target, ramp rate, dwell) segments run by a background
+# thread. The ramp itself is done by the controller (setpoint rate limit); the engine writes the target and the rate,
+# follows the working setpoint until it reaches the target and then holds it for the dwell time.
+# Every tick is one job on the port's bus scheduler: pending writes followed by the PV/setpoint readout that
+# verifies them, so telemetry on the same line is only ever delayed by one short batch.
+#
+#   program = SetpointProgram(controller, [Segment(150, 5.0, 600), Segment(25, 10.0, 0)])
+#   program.start()
+#   program.pause(); program.resume()
+#   program.abort()          # e.g. from the interlock: holds the setpoint where it is
+
+import time
+import logging
+from dataclasses import dataclass
+from threading import Thread, Event, Lock
+from typing import Optional
+
+from ModbusTransport import RtuTransport
+from ModbusBusScheduler import get_scheduler
+
+IDLE = 'idle'
+RUNNING = 'running'
+PAUSED = 'paused'
+FINISHED = 'finished'
+ABORTED = 'aborted'
+FAILED = 'failed'
+
+RAMP = 'ramp'
+DWELL = 'dwell'
+
+READ_FIELDS = ('pv_loop1', 'sp_loop1', 'sptarget_loop1', 'sprate_loop1', 'sprate_disabled_loop1')
+
+# Setters that write the same controller setting (a newer one replaces an older one of its group)
+SETTINGS = {'enable_sprate_loop1': 'sprate_disabled_loop1', 'disable_sprate_loop1': 'sprate_disabled_loop1'}
+
+
+def _setting(setter):
+    return SETTINGS.get(setter, setter)
+
+
+@dataclass
+class Segment:
+    """Ramp to target at rate (units per minute; None steps straight to it), then hold it for dwell_s seconds."""
+    target: float
+    rate: Optional[float] = None
+    dwell_s: float = 0.0
+
+
+class SetpointProgram:
+    """
+    :param controller: EurothermDriver.Eurotherm3500.
+    :param segments: Segments run in order.
+    :param tick_s: Time between batches (writes + readout).
+    :param tolerance: How close the working setpoint has to be to the target for the ramp to count as done.
+    :param max_write_retries: Consecutive batches whose writes could not be verified before the program fails.
+    :param scheduler: Bus scheduler to run the batches on. Defaults to the scheduler of the controller's serial port
+                      (none for TCP, where batches run directly).
+    :param on_event: on_event(event dict) is called from the engine thread on every state or segment change.
+    """
+
+    def __init__(self, controller, segments, tick_s=1.0, tolerance=0.1, max_write_retries=3, scheduler=None,
+                 on_event=None):
+        if not segments:
+            raise ValueError('A setpoint program needs at least one segment.')
+        self.controller = controller
+        self.segments = list(segments)
+        self.tick_s = tick_s
+        self.tolerance = tolerance
+        self.max_write_retries = max_write_retries
+        if scheduler is None and isinstance(controller.transport, RtuTransport):
+            scheduler = get_scheduler(controller.transport.instrument)
+        self.scheduler = scheduler
+        self.on_event = on_event
+        self.state = IDLE
+        self.segment_index = 0
+        self.phase = RAMP
+        self.readout = None  # Last EurothermSnapshot
+        self.events = []
+        self._dwell_left_s = 0.0
+        self._dwell_started = None
+        self._pending = {}  # setter name -> value, written in the next batch
+        self._write_failures = 0
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = None
+
+    # ---- Control (any thread) ----
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError('The program is already running.')
+        self.segment_index = 0
+        self._enter_segment()
+        self._set_state(RUNNING)
+        self._thread = Thread(target=self._run, name='EurothermProgram', daemon=True)
+        self._thread.start()
+
+    def pause(self):
+        """Holds the setpoint where it is and stops the dwell timer."""
+        with self._lock:
+            if self.state != RUNNING:
+                return
+            if self._dwell_started is not None:
+                self._dwell_left_s -= time.monotonic() - self._dwell_started
+                self._dwell_started = None
+            self._hold()
+            self._set_state(PAUSED)
+        self._wake.set()
+
+    def resume(self):
+        with self._lock:
+            if self.state != PAUSED:
+                return
+            self._write_segment()
+            if self.phase == DWELL:
+                self._dwell_started = time.monotonic()
+            self._set_state(RUNNING)
+        self._wake.set()
+
+    def abort(self, setpoint=None):
+        """Ends the program. The setpoint is held where it is, or set to `setpoint` (e.g. a safe value)."""
+        with self._lock:
+            if self.state not in (RUNNING, PAUSED):
+                return
+            if setpoint is None:
+                self._hold()
+            else:
+                self._pending = {'disable_sprate_loop1': None, 'set_sptarget_loop1': setpoint}
+            self._set_state(ABORTED)
+        self._wake.set()
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ---- Engine ----
+
+    def _set_state(self, state, **info):
+        self.state = state
+        self._event(state, **info)
+
+    def _event(self, kind, **info):
+        event = {'time': time.time(), 'event': kind, 'segment': self.segment_index, **info}
+        self.events.append(event)
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logging.warning(f'Setpoint program: event callback failed ({e}).')
+
+    def _hold(self):
+        # Freeze the ramp by making the current working setpoint the target
+        working = self.readout.sp_loop1 if self.readout is not None else None
+        self._pending = {} if working is None else {'set_sptarget_loop1': working}
+
+    def _write_segment(self):
+        segment = self.segments[self.segment_index]
+        if segment.rate:
+            self._pending = {'set_sprate_loop1': segment.rate, 'enable_sprate_loop1': None,
+                             'set_sptarget_loop1': segment.target}
+        else:
+            self._pending = {'disable_sprate_loop1': None, 'set_sptarget_loop1': segment.target}
+
+    def _enter_segment(self):
+        self.phase = RAMP
+        self._dwell_left_s = self.segments[self.segment_index].dwell_s
+        self._dwell_started = None
+        self._write_segment()
+        self._event('segment', target=self.segments[self.segment_index].target)
+
+    def _batch(self, writes):
+        """One bus job: the writes, then the readout that verifies them."""
+        for setter, value in writes.items():
+            method = getattr(self.controller, setter)
+            if value is None:
+                method()
+            else:
+                method(value)
+        return self.controller.snapshot(READ_FIELDS)
+
+    def _verified(self, writes, readout):
+        for setter, value in writes.items():
+            if setter == 'set_sptarget_loop1' and abs(readout.sptarget_loop1 - value) > 0.05:
+                return False
+            if setter == 'set_sprate_loop1' and abs(readout.sprate_loop1 - value) > 0.05:
+                return False
+            if setter == 'enable_sprate_loop1' and readout.sprate_disabled_loop1:
+                return False
+            if setter == 'disable_sprate_loop1' and not readout.sprate_disabled_loop1:
+                return False
+        return True
+
+    def _tick(self):
+        with self._lock:
+            writes, self._pending = self._pending, {}
+        try:
+            if self.scheduler is not None:
+                readout = self.scheduler.submit(self._batch, writes).result()
+            else:
+                readout = self._batch(writes)
+        except Exception as e:
+            logging.warning(f'Setpoint program: batch failed ({e}).')
+            readout = None
+        with self._lock:
+            if readout is None or not self._verified(writes, readout):
+                # Send the writes again with the next batch, except settings that newer writes (pause, abort, ...)
+                # already change: mixing the two could ask for contradictory values that never verify
+                self._write_failures += 1
+                newer = {_setting(setter) for setter in self._pending}
+                retry = {setter: value for setter, value in writes.items() if _setting(setter) not in newer}
+                self._pending = {**retry, **self._pending}
+                if self._write_failures > self.max_write_retries:
+                    self._set_state(FAILED, writes=writes)
+                return
+            self._write_failures = 0
+            self.readout = readout
+            if self.state == RUNNING:
+                self._advance(readout)
+
+    def _advance(self, readout):
+        segment = self.segments[self.segment_index]
+        if self.phase == RAMP and abs(readout.sp_loop1 - segment.target) <= self.tolerance:
+            self.phase = DWELL
+            self._dwell_started = time.monotonic()
+            self._event('dwell', pv=readout.pv_loop1)
+        if self.phase == DWELL and time.monotonic() - self._dwell_started >= self._dwell_left_s:
+            if self.segment_index + 1 < len(self.segments):
+                self.segment_index += 1
+                self._enter_segment()
+            else:
+                self._set_state(FINISHED)
+
+    def _run(self):
+        while True:
+            self._tick()
+            with self._lock:
+                if self.state in (FINISHED, FAILED) or (self.state == ABORTED and not self._pending):
+                    return
+            self._wake.wait(self.tick_s)
+            self._wake.clear()
@@ -2,6 +2,7 @@
 
 #Import the Pfeiffer gauge protocol
 import PfiefferVacuumProtocol as pvp
+from EurothermDriver import REGISTERS, FIELDS_BY_ADDRESS, decode
 
 # other imports
 import datetime
@@ -134,6 +135,16 @@ def get_pump_data():
     # Schedule this function to run again after X milliseconds
     root.after(1000, get_pump_data)
 
+def decode_temperature(address, registers):
+    """
+    (value, units) of a register read by get_temperature_data. Addresses of the Eurotherm register map are scaled and
+    signed with it; any other register is returned raw, without units.
+    """
+    field = FIELDS_BY_ADDRESS.get(address)
+    if field is None:
+        return float(registers[0]), ''
+    return decode((field,), registers).item(), REGISTERS[field].units
+
 # Read the temperature every X seconds
 def get_temperature_data(client, root, modbus_temperature_parameter_address, device_id):
     global temperature_read_counter # Make the read_counter variable callable across the whole program
@@ -145,8 +156,11 @@ def get_temperature_data(client, root, modbus_temperature_parameter_address, dev
         :param 1: The address of the gauge.
         """
         # Read the temp
-        result = client.read_holding_registers(2, device_id) # The first input of this function is the MODBUS address of the parameters you're trying to read
-        temperature = result.registers[0]
+        result = client.read_holding_registers(modbus_temperature_parameter_address, count=1, device_id=device_id) # The first input of this function is the MODBUS address of the parameters you're trying to read
+        if result.isError():
+            raise RuntimeError(f"Modbus error: {result}")
+        # Convert the raw register to degrees with the Eurotherm register map (scale and sign)
+        temperature, units = decode_temperature(modbus_temperature_parameter_address, result.registers)
         
         # Save the current time to a variable
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
@@ -155,7 +169,7 @@ def get_temperature_data(client, root, modbus_temperature_parameter_address, dev
         # temperature_data.append((timestamp, p1))
 
         # Configure the temperature label to display the temperature
-        temperature_label1.config(text=f"temperature 1: {p1:.3f} millibar")
+        temperature_label1.config(text=f"temperature 1: {temperature:.1f} {units}".rstrip())
         
         # Update the figure every second
         update_figure()
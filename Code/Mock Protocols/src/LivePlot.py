@@ -0,0 +1,148 @@
+# Live Plot
+# Strip-chart widget for the PyQt monitor, drawn with QPainter only (no matplotlib, no OpenGL). Readings are kept in a
+# preallocated RingBuffer; every paint takes only the visible time window, reduces it to one min/max pair per pixel
+# column and draws that as one QPainterPath, so the cost of a frame depends on the widget width and not on how many
+# readings are stored. The widget repaints only when a new batch arrives. Pressure can be shown on a log scale.
+#
+#   plot = LivePlot("Pressure", "mTorr", log_scale=True, window_s=600)
+#   plot.append_batch(t, values)     # e.g. from AcquisitionBridge.batch
+
+import math
+
+import numpy as np
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QColor, QPainter, QPainterPath, QPen
+from PySide6.QtWidgets import QSizePolicy, QWidget
+
+from RingBuffer import RingBuffer
+
+MARGINS = (64, 18, 12, 24)  # left, top, right, bottom (px) around the plot area
+
+
+def minmax_decimate(t, values, t0, t1, width):
+    """
+    Reduces the samples with t0 <= t <= t1 to at most two points per pixel column.
+
+    Returns (x, y): x in pixels from the left edge (0..width-1), y the minimum and the maximum of the samples of each
+    column (in that order), so a polyline through them covers the full range of the data in every column. t must be
+    sorted; NaN values are skipped.
+    """
+    lo, hi = np.searchsorted(t, t0, side='left'), np.searchsorted(t, t1, side='right')
+    t, values = t[lo:hi], values[lo:hi]
+    keep = ~np.isnan(values)
+    t, values = t[keep], values[keep]
+    if len(t) == 0 or width < 1:
+        return np.empty(0), np.empty(0)
+    span = t1 - t0 if t1 > t0 else 1.0
+    columns = np.minimum(((t - t0) * (width / span)).astype(np.int64), width - 1)
+    # t is sorted, so every column is one contiguous run of samples
+    starts = np.flatnonzero(np.r_[True, columns[1:] != columns[:-1]])
+    low = np.minimum.reduceat(values, starts)
+    high = np.maximum.reduceat(values, starts)
+    x = np.repeat(columns[starts].astype(np.float64), 2)
+    y = np.empty(2 * len(starts))
+    y[0::2], y[1::2] = low, high
+    return x, y
+
+
+class LivePlot(QWidget):
+    """
+    :param title: Shown in the top left corner.
+    :param units: Units of the values (y axis label).
+    :param log_scale: Logarithmic y axis (values <= 0 are not drawn).
+    :param window_s: Time span shown, ending at the newest reading.
+    :param capacity: Readings kept (default: one hour at 5 Hz).
+    """
+
+    def __init__(self, title: str, units: str, log_scale=False, window_s=600.0, capacity=3600 * 5, parent=None,
+                 color="#1f77b4"):
+        super().__init__(parent)
+        self.title = title
+        self.units = units
+        self.log_scale = log_scale
+        self.window_s = window_s
+        self.buffer = RingBuffer(capacity, 1)
+        self._pen = QPen(QColor(color), 1.5)
+        self.setMinimumHeight(140)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+    def append_batch(self, t, values):
+        """Adds a batch of readings (timestamps and values arrays) and schedules one repaint."""
+        if len(t):
+            self.buffer.extend(t, values)
+            self.update()
+
+    def clear(self):
+        self.buffer.clear()
+        self.update()
+
+    def set_window(self, window_s: float):
+        self.window_s = window_s
+        self.update()
+
+    def _plot_rect(self):
+        left, top, right, bottom = MARGINS
+        return QRectF(left, top, max(self.width() - left - right, 1), max(self.height() - top - bottom, 1))
+
+    def visible_points(self, width):
+        """Decimated (x, y) of the visible window for a plot area `width` pixels wide (y log10'd on a log scale)."""
+        t1, _ = self.buffer.latest()
+        if t1 is None:
+            return np.empty(0), np.empty(0)
+        # Copy (and log) only the window, not the whole buffer
+        t, values = self.buffer.after(t1 - self.window_s)
+        values = values[:, 0]
+        if self.log_scale:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                values = np.where(values > 0, np.log10(values), np.nan)
+        return minmax_decimate(t, values, t1 - self.window_s, t1, int(width))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.fillRect(self.rect(), Qt.white)
+        rect = self._plot_rect()
+        painter.setPen(QColor("#ddd"))
+        painter.drawRect(rect)
+        painter.setPen(QColor("#666"))
+        painter.drawText(QRectF(rect.left(), 0, rect.width(), MARGINS[1]), Qt.AlignLeft | Qt.AlignVCenter, self.title)
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 4, rect.width(), MARGINS[3]), Qt.AlignLeft,
+                         f"-{self.window_s:g} s")
+        painter.drawText(QRectF(rect.left(), rect.bottom() + 4, rect.width(), MARGINS[3]), Qt.AlignRight, "now")
+
+        x, y = self.visible_points(rect.width())
+        if len(x) == 0:
+            painter.end()
+            return
+        y_min, y_max = float(np.min(y)), float(np.max(y))
+        if self.log_scale:
+            # Whole decades, so the labels are powers of ten
+            y_min, y_max = math.floor(y_min), max(math.ceil(y_max), math.floor(y_min) + 1)
+        else:
+            pad = (y_max - y_min) * 0.05 or max(abs(y_max) * 0.05, 1e-9)
+            y_min, y_max = y_min - pad, y_max + pad
+        self._draw_labels(painter, rect, y_min, y_max)
+
+        # Map to pixels in one step and build one path
+        px = rect.left() + x
+        py = rect.bottom() - (y - y_min) * (rect.height() / (y_max - y_min))
+        path = QPainterPath(QPointF(px[0], py[0]))
+        for xi, yi in zip(px[1:].tolist(), py[1:].tolist()):
+            path.lineTo(xi, yi)
+        painter.setClipRect(rect)
+        painter.setPen(self._pen)
+        painter.drawPath(path)
+        painter.end()
+
+    def _draw_labels(self, painter, rect, y_min, y_max):
+        painter.setPen(QColor("#666"))
+        if self.log_scale:
+            decades = range(int(y_min), int(y_max) + 1)
+            ticks = [(d, f"1e{d}") for d in decades][:: max(len(decades) // 6, 1)]
+        else:
+            ticks = [(y_min, f"{y_min:.4g}"), ((y_min + y_max) / 2, f"{(y_min + y_max) / 2:.4g}"),
+                     (y_max, f"{y_max:.4g}")]
+        for value, text in ticks:
+            y = rect.bottom() - (value - y_min) * (rect.height() / (y_max - y_min))
+            painter.drawText(QRectF(0, y - 8, MARGINS[0] - 6, 16), Qt.AlignRight | Qt.AlignVCenter, text)
+        painter.drawText(QRectF(0, rect.bottom() + 4, MARGINS[0] - 6, MARGINS[3]), Qt.AlignRight, self.units)
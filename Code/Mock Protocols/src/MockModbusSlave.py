@@ -0,0 +1,235 @@
+# Mock Modbus Slave
+# Modbus RTU slaves (by default Eurotherm 3500 controllers) answering on a pseudo-terminal, so that minimalmodbus
+# can talk to them through a real serial.Serial object without any hardware. Linux/macOS only (uses os.openpty).
+# MockModbusTcpServer serves the same slaves over Modbus TCP on localhost.
+#
+#   with MockModbusSlave() as slave:
+#       controller = EurothermDriver.Eurotherm3500(slave.port, 1)
+#       print(controller.get_pv_loop1())
+
+import os
+import time
+import tty
+import select
+import socket
+import struct
+import threading
+
+import minimalmodbus
+
+# Register values (raw, as stored in the controller) of a Eurotherm 3500 sitting at 25.0 °C
+EUROTHERM_REGISTERS = {
+    2: 300,       # Target setpoint loop 1 (30.0)
+    5: 300,       # Working setpoint loop 1
+    35: 50,       # Setpoint rate loop 1 (5.0)
+    78: 0,        # Setpoint rate disabled loop 1
+    85: 125,      # Output loop 1 (12.5 %)
+    268: 0,       # Loop 1 inhibited
+    273: 0,       # Loop 1 in manual
+    289: 250,     # Process value loop 1 (25.0)
+    370: 251,     # PV module 3
+    373: 252,     # PV module 4
+    379: 253,     # PV module 6
+    1029: 200,    # Working setpoint loop 2
+    1109: 0,      # Output loop 2
+    1313: 240,    # Process value loop 2
+    10213: 0,     # Alarm summary
+    10241: 1000,  # Alarm 1 threshold (100.0)
+}
+
+
+class MockModbusSlave:
+    """
+    One or more Modbus RTU slaves behind a pseudo-terminal.
+
+    :param slaves: dict of slave address -> dict of register address -> raw value.
+                   Defaults to one Eurotherm at address 1.
+    :param response_delay_s: Time each slave takes before answering.
+    :param baudrate: If given, every answer is delayed by the time the request and the response would take on a
+                     line at this baud rate (8N1, 10 bits per character), so timing behaves like a real RS-485 bus.
+    :param undefined_value: Value read from registers that are not in the map. None refuses such reads with
+                            exception code 2 (illegal data address), like a strict instrument.
+    """
+
+    def __init__(self, slaves=None, response_delay_s=0.0, baudrate=None, undefined_value=None):
+        if slaves is None:
+            slaves = {1: dict(EUROTHERM_REGISTERS)}
+        self.slaves = slaves
+        self.response_delay_s = response_delay_s
+        self.baudrate = baudrate
+        self.undefined_value = undefined_value
+        self.requests = 0  # Requests answered (or refused) by any slave
+        self.writes = []   # (slave address, register address, raw value) of every register write
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='MockModbusSlave', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _request_length(buffer):
+        """Length of the request at the start of buffer, or None if more bytes are needed."""
+        if len(buffer) < 2:
+            return None
+        functioncode = buffer[1]
+        if functioncode == 16:
+            return 9 + buffer[6] if len(buffer) >= 7 else None
+        return 8
+
+    def _run(self):
+        buffer = b''
+        while self._running:
+            ready, _, _ = select.select([self._master], [], [], 0.05)
+            if not ready:
+                buffer = b''  # A gap on the line ends any partial frame
+                continue
+            try:
+                buffer += os.read(self._master, 512)
+            except OSError:
+                return
+            while True:
+                length = self._request_length(buffer)
+                if length is None or len(buffer) < length:
+                    break
+                frame, buffer = buffer[:length], buffer[length:]
+                response = self.respond(frame)
+                if response:
+                    delay = self.response_delay_s
+                    if self.baudrate:
+                        delay += (len(frame) + len(response)) * 10 / self.baudrate
+                    if delay:
+                        time.sleep(delay)
+                    os.write(self._master, response)
+
+    def respond(self, frame):
+        """Response bytes for one request frame (b'' if no slave answers)."""
+        if minimalmodbus._calculate_crc(frame[:-2]) != frame[-2:]:
+            return b''
+        pdu = self.respond_pdu(frame[0], frame[1:-2])
+        if pdu is None:
+            return b''
+        body = bytes([frame[0]]) + pdu
+        return body + minimalmodbus._calculate_crc(body)
+
+    def respond_pdu(self, address, pdu):
+        """Response PDU (function code and data) of one slave to a request PDU, or None if no slave answers."""
+        registers = self.slaves.get(address)
+        if registers is None:
+            return None
+        self.requests += 1
+        functioncode = pdu[0]
+        start, count = struct.unpack('>HH', pdu[1:5])
+        if functioncode in (3, 4):
+            values = [registers.get(start + i, self.undefined_value) for i in range(count)]
+            if None in values:
+                return bytes([functioncode | 0x80, 2])  # Illegal data address
+            data = struct.pack(f'>{count}H', *[value & 0xFFFF for value in values])
+            return bytes([functioncode, len(data)]) + data
+        if functioncode == 6:
+            registers[start] = count  # For function code 6 the second word is the value
+            self.writes.append((address, start, count))
+            return pdu[:5]
+        if functioncode == 16:
+            values = struct.unpack(f'>{count}H', pdu[6:6 + 2 * count])
+            for i, value in enumerate(values):
+                registers[start + i] = value
+                self.writes.append((address, start + i, value))
+            return pdu[:5]
+        return bytes([functioncode | 0x80, 1])  # Illegal function
+
+
+class MockModbusTcpServer(MockModbusSlave):
+    """
+    The same slaves behind a Modbus TCP server on localhost (the unit identifier selects the slave).
+
+    with MockModbusTcpServer() as server:
+        controller = EurothermDriver.Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+
+    Requests are answered in the order they arrive, also when a client sends several before reading.
+    response_delay_s acts as network latency: each response leaves that long after its request arrived.
+    """
+
+    def __init__(self, slaves=None, response_delay_s=0.0, undefined_value=None):
+        self.slaves = slaves if slaves is not None else {1: dict(EUROTHERM_REGISTERS)}
+        self.response_delay_s = response_delay_s
+        self.baudrate = None
+        self.undefined_value = undefined_value
+        self.requests = 0
+        self.writes = []
+        self.connections = 0  # TCP connections accepted
+        self._server = socket.create_server(('127.0.0.1', 0))
+        self._server.settimeout(0.05)
+        self.tcp_port = self._server.getsockname()[1]
+        self.port = f'127.0.0.1:{self.tcp_port}'
+        self._running = False
+        self._thread = None
+        self._clients = []
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+        for sock in [self._server] + self._clients:
+            sock.close()
+
+    def _run(self):
+        while self._running:
+            try:
+                client, _ = self._server.accept()
+            except (socket.timeout, OSError):
+                continue
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections += 1
+            self._clients.append(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        buffer = b''
+        while self._running:
+            try:
+                data = client.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            arrived = time.monotonic()
+            buffer += data
+            while len(buffer) >= 7:
+                transaction_id, _, length = struct.unpack('>HHH', buffer[:6])
+                if len(buffer) < 6 + length:
+                    break
+                unit, pdu = buffer[6], buffer[7:6 + length]
+                buffer = buffer[6 + length:]
+                response = self.respond_pdu(unit, pdu)
+                if response is None:
+                    continue
+                delay = arrived + self.response_delay_s - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    client.sendall(struct.pack('>HHHB', transaction_id, 0, len(response) + 1, unit) + response)
+                except OSError:
+                    return
@@ -1,6 +1,7 @@
 #Mock testing environment
 
 import io
+import time
 from PfiefferVacuumProtocol import ErrorCode
 
 # Pulled from pySerial
@@ -365,4 +366,151 @@ class PPT100:
     
     
     
-    
\ No newline at end of file
+    
+
+class TC110:
+    """\
+    Mockup of the Pfeiffer TC 110 turbo pump drive unit.
+
+    The rotor speed follows a linear run-up / spin-down ramp after the pumping
+    station (parameter 010) is switched, so that the drive current, acceleration
+    and "pump accelerates" flags look like a real start.
+    """
+
+    def __init__(self, address=1, nominal_speed=1500, spinup_s=8.0, error_code="000000"):
+        self.address = address
+        self.nominal_speed = nominal_speed
+        self.spinup_s = spinup_s
+        self.error_code = error_code
+        self.error_history = ["000000"] * 10
+        self.running = False
+        self._ramp_start = 0.0
+        self._ramp_from = 0.0
+        # Parameters that are written to and read back verbatim (number: payload)
+        self.stored = {1: "000000", 2: "000000", 4: "111111", 10: "000000", 12: "000000",
+                       23: "111111", 700: "000008", 707: "005000", 720: "050", 797: "{:06d}".format(address)}
+        self.requests = 0  # Counts the telegrams addressed to this pump
+
+    def speed(self):
+        """Current rotation speed in Hz."""
+        target = self.nominal_speed if self.running else 0.0
+        elapsed = time.monotonic() - self._ramp_start
+        fraction = min(1.0, elapsed / self.spinup_s) if self.spinup_s > 0 else 1.0
+        return self._ramp_from + (target - self._ramp_from) * fraction
+
+    def accelerating(self):
+        return self.running and self.speed() < self.nominal_speed
+
+    def _switch(self, running):
+        if running != self.running:
+            self._ramp_from = self.speed()
+            self._ramp_start = time.monotonic()
+            self.running = running
+
+    def _value(self, param_num):
+        """Payload for a read request, or None if the parameter is not simulated."""
+        speed = self.speed()
+        accelerating = self.accelerating()
+        if param_num in self.stored:
+            return self.stored[param_num]
+        if param_num == 303:
+            return self.error_code
+        if 360 <= param_num <= 369:
+            return self.error_history[param_num - 360]
+        values = {
+            306: "111111" if self.running and not accelerating else "000000",
+            307: "111111" if accelerating else "000000",
+            308: "{:06d}".format(self.nominal_speed if self.running else 0),
+            309: "{:06d}".format(int(speed)),
+            310: "{:06d}".format(150 if accelerating else 40 if self.running else 0),
+            311: "{:06d}".format(1234),
+            312: "010203",
+            313: "{:06d}".format(2400),
+            314: "{:06d}".format(1250),
+            315: "{:06d}".format(self.nominal_speed),
+            316: "{:06d}".format(60 if accelerating else 12 if self.running else 0),
+            319: "{:06d}".format(42),
+            326: "{:06d}".format(35),
+            330: "{:06d}".format(30),
+            336: "{:06d}".format(int(self.nominal_speed * 60 / self.spinup_s) if accelerating else 0),
+            340: "000",
+            342: "{:06d}".format(32),
+            346: "{:06d}".format(38),
+            349: "TC 110",
+            350: "DCU002",
+            354: "000100",
+            398: "{:06d}".format(int(speed * 60)),
+        }
+        return values.get(param_num)
+
+    def _reply(self, param_num, payload):
+        resp = "{:03d}10{:03d}{:02d}{:s}".format(self.address, param_num, len(payload), payload)
+        resp += "{:03d}".format(sum([ord(x) for x in resp]) % 256)
+        return resp
+
+    def get_response(self, in_str):
+        """
+        Answer one telegram (without the trailing carriage return).
+        Returns None when the telegram is not for this pump or is corrupt.
+        """
+        in_str = in_str.rstrip("\r")
+        if len(in_str) < 13 or int(in_str[:3]) != self.address:
+            return None
+        if int(in_str[-3:]) != (sum([ord(x) for x in in_str[:-3]]) % 256):
+            return None
+        self.requests += 1
+        action = in_str[3:5]
+        param_num = int(in_str[5:8])
+        data = in_str[10:-3]
+        if action == "00":
+            payload = self._value(param_num)
+            if payload is None:
+                return self._reply(param_num, "NO_DEF")
+            return self._reply(param_num, payload)
+        # Write request
+        if param_num == 10:
+            self._switch(data == "111111")
+        elif param_num == 9:
+            self.error_code = "000000"
+            return self._reply(param_num, data)
+        elif param_num not in self.stored:
+            return self._reply(param_num, "NO_DEF")
+        self.stored[param_num] = data
+        return self._reply(param_num, data)
+
+
+class VisaResource:
+    """\
+    Mockup of a pyvisa serial resource with one or more TC 110 pumps on the RS-485 line.
+
+    Mirrors the parts of the pyvisa API that RealPfeifferTC110 uses: write(),
+    read(termination=...), write_termination, timeout and close().
+    """
+
+    def __init__(self, *connected_devices, latency_s=0.0):
+        self.devices = list(connected_devices)
+        self.latency_s = latency_s
+        self.write_termination = "\r"
+        self.timeout = 2000  # ms, like pyvisa
+        self.closed = False
+        self._pending = None
+
+    def write(self, message):
+        self._pending = None
+        for dev in self.devices:
+            resp = dev.get_response(message)
+            if resp is not None:
+                self._pending = resp
+                break
+        return len(message) + len(self.write_termination)
+
+    def read(self, termination=None):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        resp, self._pending = self._pending, None
+        if resp is None:
+            raise TimeoutError("VI_ERROR_TMO (-1073807339): Timeout expired before operation completed.")
+        return resp
+
+    def close(self):
+        self.closed = True
@@ -0,0 +1,184 @@
+# Modbus Bus Scheduler
+# One scheduler per serial port runs the Modbus transactions of every Instrument on that port from a single thread.
+# Requests are queued with an optional due time and executed earliest-due first. Requests that are already waiting
+# go back-to-back: the scheduler waits out the 3.5 character silent period itself (sleeping for most of it and
+# spinning for the last part) so each request is written right at the boundary instead of whenever a time.sleep()
+# in some Instrument happens to return. Busy time and the estimated wire time are tracked to report bus utilization.
+#
+#   scheduler = get_scheduler(controllers[0])
+#   futures = [scheduler.submit(controller.snapshot) for controller in controllers]
+#   snapshots = [future.result() for future in futures]
+
+import time
+import heapq
+import logging
+import itertools
+from threading import Thread, Condition
+from concurrent.futures import Future
+
+import minimalmodbus
+
+SPIN_S = 0.001  # Last part of the silent period that is busy-waited instead of slept
+
+_schedulers = {}  # port name -> BusScheduler
+
+
+def get_scheduler(instrument, slack_s=0.0):
+    """The (shared) scheduler of the port the instrument is on."""
+    port = instrument.serial.port
+    scheduler = _schedulers.get(port)
+    if scheduler is None or scheduler.closed:
+        scheduler = _schedulers[port] = BusScheduler(instrument.serial, slack_s=slack_s)
+    return scheduler
+
+
+def character_bits(serial_port):
+    """Bits on the line per character: start bit, data bits, parity bit and stop bits."""
+    parity = 0 if serial_port.parity == 'N' else 1
+    return 1 + serial_port.bytesize + parity + serial_port.stopbits
+
+
+class BusScheduler:
+    """
+    Runs the transactions of all Instruments on one serial port.
+
+    :param serial_port: The serial.Serial shared by the Instruments (instrument.serial).
+    :param slack_s: A request due within this time is run early if the bus would otherwise sit idle.
+    """
+
+    def __init__(self, serial_port, slack_s=0.0):
+        self.serial = serial_port
+        self.port = serial_port.port
+        self.slack_s = slack_s
+        self.closed = False
+        self._queue = []  # (due, sequence number, submitted, future, function, args, wire bytes)
+        self._sequence = itertools.count()
+        self._cond = Condition()
+        self._reset_stats()
+        self._thread = Thread(target=self._run, name=f'BusScheduler-{self.port}', daemon=True)
+        self._thread.start()
+
+    def _reset_stats(self):
+        self.requests = 0
+        self.errors = 0
+        self._busy_s = 0.0
+        self._wire_bytes = 0
+        self._backlog_gap_s = 0.0  # Time between transactions while requests were waiting
+        self._backlog_gaps = 0
+        self._started_at = time.monotonic()
+
+    def submit(self, function, *args, due=None):
+        """Queues function(*args) and returns a Future with its result.
+
+        function should perform Modbus transactions on this port only (e.g. a PreparedRead, instrument.read_register
+        or Eurotherm3500.snapshot). `due` is a time.monotonic() time before which it is not run.
+        """
+        future = Future()
+        wire_bytes = 0
+        if isinstance(function, minimalmodbus.PreparedRead):
+            wire_bytes = len(function.request) + function.response_size
+        with self._cond:
+            if self.closed:
+                raise RuntimeError(f'The scheduler of {self.port} is closed.')
+            entry = (due or 0.0, next(self._sequence), time.monotonic(), future, function, args, wire_bytes)
+            heapq.heappush(self._queue, entry)
+            self._cond.notify()
+        return future
+
+    def gather(self, functions, timeout=None):
+        """Runs every function (without arguments) back-to-back and returns their results in order."""
+        futures = [self.submit(function) for function in functions]
+        return [future.result(timeout) for future in futures]
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def stats(self):
+        """Bus utilization since the scheduler started (or since reset_stats()).
+
+        utilization is the fraction of time spent inside requests. wire_utilization is the fraction of time
+        characters were on the line, estimated from the frame sizes of PreparedRead requests (other requests are
+        not counted). backlog_gap_mean_s is the mean gap between back-to-back requests, including the silent period.
+        """
+        elapsed = time.monotonic() - self._started_at
+        bit_time = character_bits(self.serial) / self.serial.baudrate
+        wire_s = self._wire_bytes * bit_time
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'utilization': self._busy_s / elapsed if elapsed > 0 else 0.0,
+                'wire_utilization': wire_s / elapsed if elapsed > 0 else 0.0,
+                'backlog_gap_mean_s': self._backlog_gap_s / self._backlog_gaps if self._backlog_gaps else 0.0,
+                'silent_period_s': minimalmodbus._calculate_minimum_silent_period(self.serial.baudrate),
+                'queue_depth': self.pending()}
+
+    def reset_stats(self):
+        self._reset_stats()
+
+    def close(self, timeout=2.0):
+        """Stops the scheduler after the requests that are due have run. Requests not yet due are cancelled."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if _schedulers.get(self.port) is self:
+            del _schedulers[self.port]
+
+    def _next(self):
+        # Earliest-due request, or None once closed with nothing left that is due
+        with self._cond:
+            while True:
+                if self._queue:
+                    wait = self._queue[0][0] - self.slack_s - time.monotonic()
+                    if wait <= 0:
+                        return heapq.heappop(self._queue)
+                    if self.closed:
+                        for entry in self._queue:
+                            entry[3].cancel()
+                        self._queue.clear()
+                        return None
+                    self._cond.wait(wait)
+                elif self.closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _wait_silent_period(self):
+        boundary = (minimalmodbus._latest_read_times.get(self.port, 0.0)
+                    + minimalmodbus._calculate_minimum_silent_period(self.serial.baudrate))
+        remaining = boundary - time.monotonic()
+        if remaining > SPIN_S:
+            time.sleep(remaining - SPIN_S)
+        while time.monotonic() < boundary:
+            pass
+
+    def _run(self):
+        finished_at = None
+        while True:
+            entry = self._next()
+            if entry is None:
+                return
+            due, _, submitted, future, function, args, wire_bytes = entry
+            if not future.set_running_or_notify_cancel():
+                continue
+            # Holding the port lock runs the transactions directly in this thread and keeps other threads off the
+            # line between the end of the silent period and the request
+            with minimalmodbus._get_port_worker(self.port).hold():
+                self._wait_silent_period()
+                started_at = time.monotonic()
+                if finished_at is not None and max(due, submitted) <= finished_at:
+                    # The request was waiting when the previous one finished: the gap is the silent period + overhead
+                    self._backlog_gap_s += started_at - finished_at
+                    self._backlog_gaps += 1
+                try:
+                    result = function(*args)
+                except Exception as e:
+                    self.errors += 1
+                    future.set_exception(e)
+                    logging.debug(f'Bus scheduler {self.port}: request failed ({e}).')
+                else:
+                    future.set_result(result)
+                finished_at = time.monotonic()
+            self.requests += 1
+            self._busy_s += finished_at - started_at
+            self._wire_bytes += wire_bytes
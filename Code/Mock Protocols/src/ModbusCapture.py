@@ -0,0 +1,182 @@
+# Modbus Capture
+# Bulk verification and decoding of recorded Modbus RTU traffic. A capture is one uint8 buffer of concatenated
+# frames plus an array with the length of every frame. The CRC of all frames is computed together with NumPy table
+# lookups (one vectorized step per two byte positions instead of one Python step per byte), so days of recorded
+# Eurotherm traffic can be checked in minutes. Frames are processed CHUNK_FRAMES at a time: the index arrays of a
+# vectorized step are several times larger than the bytes they address, so a whole GB-scale capture at once would
+# not fit in memory.
+#
+#   buffer, lengths = np.fromfile('capture.bin', np.uint8), np.load('capture_lengths.npy')
+#   valid = verify_frames(buffer, lengths)
+#   reads = decode_read_responses(buffer, lengths, valid)
+#   pv = reads.register(289)       # Loop 1 PV from every response that contains it (NaN elsewhere)
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import minimalmodbus
+
+# The CRC table of minimalmodbus, as an array for fancy indexing
+CRC16_TABLE = np.array(minimalmodbus._CRC16TABLE, dtype=np.uint16)
+
+CHUNK_FRAMES = 1 << 16  # Frames per vectorized step
+
+
+def frame_offsets(lengths):
+    """Start offset of every frame in the concatenated buffer."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.zeros(len(lengths), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    return offsets
+
+
+def _two_byte_table():
+    # After XOR-ing two data bytes into the register (low byte first), the next two byte steps depend only on the
+    # 16-bit register value, so they can be looked up in one table of 65536 entries
+    y = np.arange(0x10000, dtype=np.uint32)
+    low = CRC16_TABLE[y & 0xFF].astype(np.uint32)
+    return ((low >> 8) ^ CRC16_TABLE[((y >> 8) ^ low) & 0xFF]).astype(np.uint16)
+
+
+CRC16_TABLE2 = _two_byte_table()
+
+
+def crc16(buffer, offsets, sizes, chunk_frames=CHUNK_FRAMES):
+    """Modbus CRC of buffer[offset:offset + size] for every frame, as uint16 (low byte is sent first).
+
+    Frames of equal size (a capture has only a few distinct sizes) are gathered into one (size, chunk_frames) array
+    and processed two bytes per step for all of them at once.
+    """
+    buffer = np.asarray(buffer, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    result = np.empty(len(sizes), dtype=np.uint16)
+    for size in np.unique(sizes):
+        for which in _chunks(np.nonzero(sizes == size)[0], chunk_frames):
+            columns = np.ascontiguousarray(buffer[offsets[which, None] + np.arange(size)].T)
+            crc = np.full(len(which), 0xFFFF, dtype=np.uint16)
+            for j in range(0, size - 1, 2):
+                crc = CRC16_TABLE2[crc ^ (columns[j] | (columns[j + 1].astype(np.uint16) << 8))]
+            if size % 2:
+                crc = (crc >> 8) ^ CRC16_TABLE[(crc ^ columns[size - 1]) & 0xFF]
+            result[which] = crc
+    return result
+
+
+def _chunks(array, size):
+    return (array[i:i + size] for i in range(0, len(array), size))
+
+
+def verify_frames(buffer, lengths, chunk_frames=CHUNK_FRAMES):
+    """Boolean mask of the frames whose CRC is correct (frames shorter than 4 bytes are invalid)."""
+    buffer = np.asarray(buffer, dtype=np.uint8)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = frame_offsets(lengths)
+    if len(lengths) and offsets[-1] + lengths[-1] > len(buffer):
+        raise ValueError(f'The length index covers {offsets[-1] + lengths[-1]} bytes, '
+                         f'but the buffer has {len(buffer)}.')
+    valid = np.zeros(len(lengths), dtype=bool)
+    for i in range(0, len(lengths), chunk_frames):
+        valid[i:i + chunk_frames] = _verify(buffer, offsets[i:i + chunk_frames], lengths[i:i + chunk_frames])
+    return valid
+
+
+def _verify(buffer, offsets, lengths):
+    long_enough = lengths >= 4
+    ends = offsets + lengths
+    sent = np.zeros(len(lengths), dtype=np.uint16)
+    sent[long_enough] = (buffer[ends[long_enough] - 2].astype(np.uint16)
+                         | (buffer[ends[long_enough] - 1].astype(np.uint16) << 8))
+    computed = np.zeros(len(lengths), dtype=np.uint16)
+    computed[long_enough] = crc16(buffer, offsets[long_enough], lengths[long_enough] - 2)
+    return long_enough & (computed == sent)
+
+
+@dataclass
+class ReadResponses:
+    """Register read responses (function code 3 or 4) found in a capture.
+
+    index: frame number of every response; address, functioncode: per response; start: register address taken from
+    the preceding request (-1 if it was not captured); registers: (n_responses, max registers) uint16, padded with
+    zeros beyond count.
+    """
+    index: np.ndarray
+    address: np.ndarray
+    functioncode: np.ndarray
+    start: np.ndarray
+    count: np.ndarray
+    registers: np.ndarray
+
+    def __len__(self):
+        return len(self.index)
+
+    def register(self, register, slave=None, decimals=0, signed=False):
+        """Value of one register in every response (NaN where it is not included)."""
+        column = register - self.start
+        present = (self.start >= 0) & (column >= 0) & (column < self.count)
+        if slave is not None:
+            present &= self.address == slave
+        raw = self.registers[np.nonzero(present)[0], column[present]]
+        if signed:
+            raw = raw.view(np.int16)
+        values = np.full(len(self), np.nan)
+        values[present] = raw / 10 ** decimals
+        return values
+
+
+def decode_read_responses(buffer, lengths, valid=None, chunk_frames=CHUNK_FRAMES):
+    """Finds the valid read responses in a capture and decodes their register payloads, chunk_frames at a time."""
+    buffer = np.asarray(buffer, dtype=np.uint8)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = frame_offsets(lengths)
+    if valid is None:
+        valid = verify_frames(buffer, lengths, chunk_frames)
+    valid = np.asarray(valid, dtype=bool)
+    parts = []
+    for i in range(0, max(len(lengths), 1), chunk_frames):
+        # Each chunk also gets the frame before it, the request answered by its first response
+        before = min(i, 1)
+        chunk = slice(i - before, i + chunk_frames)
+        part = _decode(buffer, offsets[chunk], lengths[chunk], valid[chunk])
+        keep = part.index >= before
+        parts.append((part.index[keep] + i - before, part.address[keep], part.functioncode[keep], part.start[keep],
+                      part.count[keep], part.registers[keep]))
+    index, address, functioncode, start, count, registers = zip(*parts)
+    width = max(part.shape[1] for part in registers)
+    registers = [np.pad(part, ((0, 0), (0, width - part.shape[1]))) for part in registers]
+    return ReadResponses(index=np.concatenate(index), address=np.concatenate(address),
+                         functioncode=np.concatenate(functioncode), start=np.concatenate(start),
+                         count=np.concatenate(count), registers=np.concatenate(registers))
+
+
+def _decode(buffer, offsets, lengths, valid):
+    safe = lengths >= 5
+
+    def first(k):
+        # Byte k of every frame (0 for frames too short to hold it)
+        return np.where(safe, buffer[np.minimum(offsets + k, len(buffer) - 1)], 0)
+
+    address, functioncode, byte_count = first(0), first(1), first(2)
+    is_read = (functioncode == 3) | (functioncode == 4)
+    responses = valid & safe & is_read & (byte_count == lengths - 5) & (byte_count % 2 == 0)
+    # A read request is 8 bytes long; a response right after the request it answers gets its start address
+    requests = valid & is_read & (lengths == 8)
+    previous = np.roll(np.arange(len(lengths)), 1)
+    request_count = (first(4).astype(np.int64) << 8) | first(5)
+    paired = (responses & np.roll(requests, 1) & (address == address[previous])
+              & (functioncode == functioncode[previous]) & (request_count[previous] == byte_count // 2))
+    paired[:1] = False
+    start_all = (first(2).astype(np.int64) << 8) | first(3)
+    index = np.nonzero(responses)[0]
+    counts = byte_count[index].astype(np.int64) // 2
+    width = int(counts.max()) if len(index) else 0
+    # Gather the register bytes of all responses with the same count at once and read them as big-endian words
+    registers = np.zeros((len(index), width), dtype=np.uint16)
+    for count in np.unique(counts):
+        rows = np.nonzero(counts == count)[0]
+        data = buffer[offsets[index[rows], None] + 3 + np.arange(2 * count)]
+        registers[rows, :count] = data.view('>u2')
+    start = np.where(paired[index], start_all[previous[index]], -1)
+    return ReadResponses(index=index, address=address[index], functioncode=functioncode[index], start=start,
+                         count=counts, registers=registers)
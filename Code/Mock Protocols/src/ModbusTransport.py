@@ -0,0 +1,170 @@
+# Modbus Transport
+# The link a Modbus device driver talks through, so the same driver (register map, decoding, block reads) works over
+# serial RTU and over TCP. Both transports read lists of (start, count) register blocks and return the raw unsigned
+# register values; a block the slave refuses comes back as the exception instead of failing the others.
+#
+#   RtuTransport('/dev/ttyUSB0', 1)      minimalmodbus Instrument (shares the port, its lock and I/O worker)
+#   TcpTransport('192.168.111.222', 1)   one persistent socket; all blocks of a call are sent back-to-back and the
+#                                        responses matched by MBAP transaction ID (pipelined)
+
+import socket
+import struct
+import logging
+import threading
+
+import minimalmodbus
+
+MODBUS_TCP_PORT = 502
+
+# Both transports write a register with "write multiple registers" (the minimalmodbus default), so a device sees the
+# same request whichever link it is on
+WRITE_FUNCTIONCODE = 16
+
+
+class RtuTransport:
+    """Modbus RTU over a serial port, through minimalmodbus."""
+
+    def __init__(self, port, address, **instrument_kwargs):
+        self.instrument = minimalmodbus.Instrument(port, address, **instrument_kwargs)
+        self._reads = {}  # (start, count, functioncode, slave address, mode) -> PreparedRead
+
+    def __repr__(self):
+        return f'RtuTransport({self.instrument.serial.port!r}, {self.instrument.address})'
+
+    @property
+    def serial(self):
+        return self.instrument.serial
+
+    def _prepared(self, start, count, functioncode):
+        key = (start, count, functioncode, self.instrument.address, self.instrument.mode)
+        read = self._reads.get(key)
+        if read is None:
+            read = self._reads[key] = self.instrument.prepare_read(start, count, functioncode=functioncode)
+        return read
+
+    def read_blocks(self, blocks, functioncode=3):
+        """Raw register values of every (start, count) block, or the slave's exception for a refused block."""
+        results = []
+        for start, count in blocks:
+            try:
+                values = self._prepared(start, count, functioncode)()
+            except minimalmodbus.SlaveReportedException as e:
+                results.append(e)
+                continue
+            results.append(values if isinstance(values, list) else [values])
+        return results
+
+    def write_register(self, register, raw_value):
+        self.instrument.write_register(register, raw_value, 0, functioncode=WRITE_FUNCTIONCODE)
+
+    def close(self):
+        self.instrument.serial.close()
+
+
+class TcpTransport:
+    """
+    Modbus TCP over one persistent connection.
+
+    pymodbus' synchronous client waits for each response before sending the next request, so the MBAP framing is
+    done here on a plain socket: all requests of a read_blocks() call are written at once and the responses are
+    matched by transaction ID, which costs one network round trip per call instead of one per block.
+    """
+
+    def __init__(self, host, device_id=1, port=MODBUS_TCP_PORT, timeout=1.0, max_in_flight=16):
+        self.host = host
+        self.device_id = device_id
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight  # Many devices only queue a few requests per connection
+        self.lock = threading.Lock()
+        self.reconnects = 0
+        self._sock = None
+        self._transaction_id = 0
+
+    def __repr__(self):
+        return f'TcpTransport({self.host!r}, {self.device_id}, port={self.port})'
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def connect(self):
+        if self._sock is None:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.reconnects += 1
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+    def _frame(self, pdu):
+        self._transaction_id = (self._transaction_id + 1) % 0x10000
+        header = struct.pack('>HHHB', self._transaction_id, 0, len(pdu) + 1, self.device_id)
+        return self._transaction_id, header + pdu
+
+    def _receive_exactly(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self._sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError(f'{self.host}:{self.port} closed the connection.')
+            data += chunk
+        return data
+
+    def _receive(self):
+        transaction_id, _, length = struct.unpack('>HHH', self._receive_exactly(6))
+        body = self._receive_exactly(length)
+        return transaction_id, body  # body: unit identifier + PDU
+
+    def transact(self, pdus):
+        """Sends every request PDU back-to-back and returns the response PDUs in the same order."""
+        with self.lock:
+            try:
+                self.connect()
+                responses = []
+                for i in range(0, len(pdus), self.max_in_flight):
+                    responses.extend(self._pipeline(pdus[i:i + self.max_in_flight]))
+                return responses
+            except (OSError, ConnectionError) as e:
+                # Drop the connection so the next call starts clean (late responses would carry stale IDs)
+                self.close()
+                raise minimalmodbus.NoResponseError(f'Modbus TCP {self.host}:{self.port}: {e}') from e
+
+    def _pipeline(self, pdus):
+        frames = [self._frame(pdu) for pdu in pdus]
+        self._sock.sendall(b''.join(frame for _, frame in frames))
+        pending = {transaction_id: i for i, (transaction_id, _) in enumerate(frames)}
+        responses = [None] * len(pdus)
+        while pending:
+            transaction_id, body = self._receive()
+            index = pending.pop(transaction_id, None)
+            if index is None:
+                logging.warning(f'Modbus TCP {self.host}: unexpected transaction ID {transaction_id}.')
+                continue
+            responses[index] = body[1:]
+        return responses
+
+    def read_blocks(self, blocks, functioncode=3):
+        """Raw register values of every (start, count) block, or the slave's exception for a refused block."""
+        pdus = [struct.pack('>BHH', functioncode, start, count) for start, count in blocks]
+        results = []
+        for (start, count), pdu in zip(blocks, self.transact(pdus)):
+            try:
+                # Same checks and exceptions as for RTU (the check expects the slave address in front)
+                minimalmodbus._check_response_slaveerrorcode(bytes([self.device_id]) + pdu)
+                if pdu[0] != functioncode or pdu[1] != 2 * count or len(pdu) != 2 + 2 * count:
+                    raise minimalmodbus.InvalidResponseError(f'Invalid response to reading {count} registers '
+                                                             f'at {start}: {pdu!r}')
+            except minimalmodbus.SlaveReportedException as e:
+                results.append(e)
+                continue
+            results.append(list(struct.unpack(f'>{count}H', pdu[2:])))
+        return results
+
+    def write_register(self, register, raw_value):
+        pdu, = self.transact([struct.pack('>BHHBH', WRITE_FUNCTIONCODE, register, 1, 2, raw_value & 0xFFFF)])
+        minimalmodbus._check_response_slaveerrorcode(bytes([self.device_id]) + pdu)
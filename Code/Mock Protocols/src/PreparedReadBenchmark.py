@@ -0,0 +1,57 @@
+# Prepared Read Benchmark
+# Compares Instrument.read_register with a prepared read (Instrument.prepare_read) against the pty Modbus slave.
+# The wall time per read is dominated by the serial round trip and the 3.5 character silent period, so the host
+# overhead (wall time minus the time spent inside _communicate) is reported separately.
+#
+#   python PreparedReadBenchmark.py [n_reads]
+
+import sys
+import time
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave
+
+REGISTER = 289  # Process value loop 1 of a Eurotherm 3500
+
+
+def timed_communicate(instrument):
+    """Wraps instrument._communicate so the time spent in it is accumulated in the returned list."""
+    spent = [0.0]
+    communicate = instrument._communicate
+
+    def wrapper(request, number_of_bytes_to_read):
+        start = time.perf_counter()
+        try:
+            return communicate(request, number_of_bytes_to_read)
+        finally:
+            spent[0] += time.perf_counter() - start
+
+    instrument._communicate = wrapper
+    return spent
+
+
+def benchmark(read, spent, n_reads):
+    read()  # Warm up (opens the port)
+    spent[0] = 0.0
+    start = time.perf_counter()
+    for _ in range(n_reads):
+        read()
+    wall = time.perf_counter() - start
+    return wall / n_reads, (wall - spent[0]) / n_reads
+
+
+def main(n_reads=500):
+    with MockModbusSlave() as slave:
+        instrument = minimalmodbus.Instrument(slave.port, 1)
+        spent = timed_communicate(instrument)
+        prepared = instrument.prepare_read(REGISTER, number_of_decimals=1)
+        results = {'read_register': benchmark(lambda: instrument.read_register(REGISTER, 1), spent, n_reads),
+                   'prepare_read': benchmark(prepared, spent, n_reads)}
+        instrument.serial.close()
+    for name, (wall, overhead) in results.items():
+        print(f'{name:14s} {wall * 1e3:7.3f} ms/read   host overhead {overhead * 1e6:7.1f} us/read')
+    return results
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
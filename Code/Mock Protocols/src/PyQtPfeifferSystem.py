@@ -3,16 +3,24 @@
 # Imports for communication with Pfeiffer gauge and Eurotherm temperature controller
 import RealPfeifferTC110 as rpt
 import PfiefferVacuumProtocol as pvp
+from EurothermDriver import REGISTERS, decode
+from AcquisitionEngine import AcquisitionEngine
+from LivePlot import LivePlot
+from DiskLogger import DiskLogger
+from SharedFeed import FeedReader, STALE_S
+from AcquisitionDaemon import DEFAULT_FEED, TEMPERATURE, PRESSURE
 from pymodbus.client import ModbusTcpClient
 
 # Other imports
+import os
 import sys
+import argparse
 import serial
 import time
 import random
 from dataclasses import dataclass
 from PySide6.QtCore import (
-    Qt, QObject, QThread, QTimer, Signal, Slot, QTime, QMetaObject
+    Qt, QObject, QTimer, Signal, Slot
 )
 from PySide6.QtWidgets import (
     QApplication,
@@ -27,6 +35,76 @@ from PySide6.QtWidgets import (
     QSizePolicy,
 )
 
+# Readings kept per channel for the GUI (one hour at 5 Hz)
+HISTORY_SAMPLES = 3600 * 5
+
+
+# How often (at most) the cards redraw their values
+DISPLAY_RATE_HZ = 10
+
+
+# -------------------------------
+# Card refresh coalescing
+# -------------------------------
+class CardRefresher(QObject):
+    """
+    One GUI timer shared by all SensorCards. set_value() only stores the latest value and marks the card; on each
+    tick every marked card draws its latest value once, however many readings arrived in between. The timer only
+    runs while some card has something new.
+    """
+    def __init__(self, rate_hz: float = DISPLAY_RATE_HZ, parent=None):
+        super().__init__(parent)
+        self._dirty: set = set()
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._on_tick)
+        self.set_rate(rate_hz)
+
+    def set_rate(self, rate_hz: float):
+        if rate_hz <= 0:
+            raise ValueError(f"Display rate should be positive. {rate_hz} was given.")
+        self.rate_hz = rate_hz
+        self._timer.setInterval(max(int(1000 / rate_hz), 1))
+
+    def mark(self, card: "SensorCard"):
+        self._dirty.add(card)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    @Slot()
+    def _on_tick(self):
+        dirty, self._dirty = self._dirty, set()
+        for card in dirty:
+            try:
+                card.refresh()
+            except RuntimeError:
+                pass  # card was deleted
+        if not self._dirty:
+            self._timer.stop()
+
+
+_refresher: CardRefresher | None = None
+
+
+def card_refresher() -> CardRefresher:
+    global _refresher
+    if _refresher is None:
+        _refresher = CardRefresher()
+    return _refresher
+
+
+_clock_second = None
+_clock_text = "--:--:--"
+
+
+def clock_text(t: float) -> str:
+    """HH:MM:SS of a time.time() value, formatted at most once per second for all cards."""
+    global _clock_second, _clock_text
+    second = int(t)
+    if second != _clock_second:
+        _clock_second, _clock_text = second, time.strftime("%H:%M:%S", time.localtime(second))
+    return _clock_text
+
+
 # -------------------------------
 # Small reusable "card" widget
 # -------------------------------
@@ -38,10 +116,16 @@ class SensorCard(QWidget):
       - Units (e.g., °C, mTorr)
       - Status dot (green/amber/red)
       - Last update time
+    Values are drawn by the shared CardRefresher at most DISPLAY_RATE_HZ times per second (see
+    SensorCard.set_display_rate), and a label is only touched when its text changes.
     """
     def __init__(self, title: str, units: str, parent=None, scientific=False):
         super().__init__(parent)
 
+        self._latest: tuple | None = None   # (value, decimals, time) not drawn yet
+        self._value_text = "--"
+        self._update_text = ""
+
         self._title = QLabel(title)
         self._title.setStyleSheet("font-weight: 600; font-size: 16px;")
         self._title.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
@@ -96,18 +180,42 @@ class SensorCard(QWidget):
 
         outer.addWidget(frame)
 
-    @Slot(float)
-    def set_value(self, val: float, decimals: int = 2):
+    @staticmethod
+    def set_display_rate(rate_hz: float):
+        """How often (at most) all cards redraw their values."""
+        card_refresher().set_rate(rate_hz)
+
+    def set_value(self, val: float, decimals: int = 2, t: float | None = None):
+        """Stores the reading; it is drawn on the next display tick."""
+        self._latest = (val, decimals, time.time() if t is None else t)
+        card_refresher().mark(self)
+
+    def set_batch(self, t, values, decimals: int = 2):
+        """Shows the newest reading of a batch (timestamps and values arrays)."""
+        if len(values):
+            self.set_value(float(values[-1]), decimals, float(t[-1]))
+
+    def refresh(self):
+        """Draws the latest value (called by the CardRefresher)."""
+        if self._latest is None:
+            return
+        val, decimals, t = self._latest
+        self._latest = None
         try:
             if self._scientific:
-                self._value.setText(f"{val:.{decimals}e}")
+                text = f"{val:.{decimals}e}"
             else:
-                self._value.setText(f"{val:.{decimals}f}")
+                text = f"{val:.{decimals}f}"
         except Exception:
-            self._value.setText(str(val))
+            text = str(val)
+        if text != self._value_text:
+            self._value_text = text
+            self._value.setText(text)
 
-        t = QTime.currentTime().toString("HH:mm:ss")
-        self._last_update.setText(f"Last update: {t}")
+        update_text = f"Last update: {clock_text(t)}"
+        if update_text != self._update_text:
+            self._update_text = update_text
+            self._last_update.setText(update_text)
 
     def set_status(self, status: str):
         status = status.lower()
@@ -139,55 +247,20 @@ class WorkerConfig:
     name: str
     poll_interval_ms: int = 200
 
-class ReadingWorker(QObject):
+class ReadingWorker:
     """
-    Generic data-polling worker that emits a float value periodically.
-    QTimer is created in start() (worker's thread), not in __init__.
+    Generic device driver for the AcquisitionEngine, which calls open(), read_device_value() and close() from the
+    I/O thread of the worker's link; readings reach the cards and plots in batches (AcquisitionBridge).
     """
-    reading = Signal(float)
-    status = Signal(str)
-    error = Signal(str)
-    started = Signal()
-    stopped = Signal()
-
-    def __init__(self, cfg: WorkerConfig, parent=None):
-        super().__init__(parent)
+    def __init__(self, cfg: WorkerConfig):
         self.cfg = cfg
-        self._timer: QTimer | None = None
-        self._running = False
+        self.link = cfg.name  # Physical link (port/host) the device is on; workers on one link are read in turn
 
-    @Slot()
-    def start(self):
-        if self._timer is None:
-            self._timer = QTimer(self)
-            self._timer.setInterval(self.cfg.poll_interval_ms)
-            self._timer.timeout.connect(self._on_poll)
-        self._running = True
-        self._timer.start()
-        self.status.emit("connected")
-        self.started.emit()
-
-    @Slot()
-    def stop(self):
-        self._running = False
-        if self._timer is not None:
-            self._timer.stop()
-            self._timer.deleteLater()
-            self._timer = None
-        self.status.emit("disconnected")
-        self.stopped.emit()
+    def open(self):
+        """Connects to the device. Subclasses override this."""
 
-    @Slot()
-    def _on_poll(self):
-        if not self._running:
-            return
-        try:
-            value = self.read_device_value()
-            self.reading.emit(value)
-        except Exception as exc:
-            # surface error; keep polling (will attempt lazy reconnect in read_device_value)
-            self.status.emit("error")
-            self.error.emit(f"{self.cfg.name}: {exc}")
+    def close(self):
+        """Disconnects from the device. Subclasses override this."""
 
     def read_device_value(self) -> float:
         raise NotImplementedError
@@ -198,16 +271,19 @@ class ReadingWorker(QObject):
 # -------------------------------
 class TempWorker(ReadingWorker):
     """
-    Opens ONE persistent Modbus TCP connection in start(), reuses it every poll.
+    Opens ONE persistent Modbus TCP connection in open(), reuses it every poll.
     Attempts lazy reconnect if disconnected.
     """
-    def __init__(self, cfg: WorkerConfig, parent=None):
-        super().__init__(cfg, parent)
+    def __init__(self, cfg: WorkerConfig):
+        super().__init__(cfg)
         self._client: ModbusTcpClient | None = None
         self._ip = "192.168.111.222"   # Eurotherm IP
-        self._address = 1            # Holding register address to read
+        # Field of the Eurotherm register map to read: loop 1 PV, register 289 (until the map was added this worker
+        # read register 1 and showed it unscaled)
+        self._field = "pv_loop1"
         self._reconnect_cooldown_s = 1.5
         self._next_reconnect_ts = 0.0
+        self.link = self._ip
 
     def _ensure_connected(self):
         now = time.monotonic()
@@ -220,17 +296,11 @@ class TempWorker(ReadingWorker):
                 self._next_reconnect_ts = now + self._reconnect_cooldown_s
                 raise RuntimeError("Could not connect to Modbus TCP server")
 
-    def start(self):
+    def open(self):
         # Establish initial connection (will throw if fails)
-        try:
-            self._ensure_connected()
-        except Exception as e:
-            # We'll still start the timer to attempt reconnects later
-            self.error.emit(f"{self.cfg.name}: {e}")
-        super().start()
-
-    def stop(self):
-        super().stop()
+        self._ensure_connected()
+
+    def close(self):
         try:
             if self._client is not None:
                 self._client.close()
@@ -242,15 +312,13 @@ class TempWorker(ReadingWorker):
         self._ensure_connected()
 
         # Read one holding register; use correct signature with unit=
-        rr = self._client.read_holding_registers(self._address, count=1)
-        print(rr)
+        rr = self._client.read_holding_registers(REGISTERS[self._field].address, count=1)
         if rr.isError():
             # communication level ok but device returned a Modbus exception
             raise RuntimeError(f"Modbus error: {rr}")
 
-        raw = rr.registers[0]
-        # Apply scaling if needed. For now, return raw (or convert to °C if you know the scale).
-        return float(raw)
+        # Scale (and sign) the raw register with the register map, e.g. 250 -> 25.0 °C
+        return decode((self._field,), rr.registers).item()
 
 
 # -------------------------------
@@ -258,11 +326,11 @@ class TempWorker(ReadingWorker):
 # -------------------------------
 class PressureWorker(ReadingWorker):
     """
-    Opens ONE persistent serial port in start(), reuses it every poll.
+    Opens ONE persistent serial port in open(), reuses it every poll.
     Attempts lazy reopen on failure.
     """
-    def __init__(self, cfg: WorkerConfig, parent=None):
-        super().__init__(cfg, parent)
+    def __init__(self, cfg: WorkerConfig):
+        super().__init__(cfg)
         self._ser: serial.Serial | None = None
         self._port = "/dev/tty.usbserial-BG000M9B"
         self._baud = 9600
@@ -270,6 +338,7 @@ class PressureWorker(ReadingWorker):
         self._address = 122
         self._reconnect_cooldown_s = 1.5
         self._next_reconnect_ts = 0.0
+        self.link = self._port
 
     def _ensure_open(self):
         now = time.monotonic()
@@ -282,15 +351,10 @@ class PressureWorker(ReadingWorker):
                 self._next_reconnect_ts = now + self._reconnect_cooldown_s
                 raise RuntimeError(f"Serial open failed: {e}")
 
-    def start(self):
-        try:
-            self._ensure_open()
-        except Exception as e:
-            self.error.emit(f"{self.cfg.name}: {e}")
-        super().start()
+    def open(self):
+        self._ensure_open()
 
-    def stop(self):
-        super().stop()
+    def close(self):
         try:
             if self._ser and self._ser.is_open:
                 self._ser.close()
@@ -304,15 +368,82 @@ class PressureWorker(ReadingWorker):
         return float(p)
 
 
+# -------------------------------
+# Acquisition -> GUI bridge
+# -------------------------------
+class AcquisitionBridge(QObject):
+    """
+    Delivers readings to the GUI thread in batches.
+
+    The source is an AcquisitionEngine of this process or a SharedFeed.FeedReader of the acquisition daemon; both
+    keep every channel's readings in a ring (since(name, cursor)). A GUI-thread timer collects everything new once
+    per frame and emits one batch signal, so the number of events scales with the frame rate instead of the sample
+    rate. Status changes and errors of an engine are rare and are re-emitted from the I/O threads as queued signals;
+    the statuses of a feed are compared once per frame.
+    """
+    batch = Signal(dict)      # channel name -> (timestamps, values) NumPy arrays of the readings since the last frame
+    status = Signal(str, str)
+    error = Signal(str)
+
+    def __init__(self, parent=None, frame_ms: int = 50):
+        super().__init__(parent)
+        self._source = None
+        self._cursors: dict[str, int] = {}
+        self._statuses: dict[str, str] = {}
+        self._timer = QTimer(self)
+        self._timer.setInterval(frame_ms)
+        self._timer.timeout.connect(self._on_frame)
+
+    def attach(self, source):
+        self._source = source
+        self._cursors = {name: 0 for name in source.channels}
+        self._statuses = {}
+        self._timer.start()
+
+    def detach(self):
+        self._on_frame()  # deliver what is left
+        self._timer.stop()
+        self._source = None
+
+    @Slot()
+    def _on_frame(self):
+        if self._source is None:
+            return
+        batch = {}
+        for name in self._cursors:
+            t, values, self._cursors[name] = self._source.since(name, self._cursors[name])
+            if len(t):
+                batch[name] = (t, values)
+        if batch:
+            self.batch.emit(batch)
+        statuses = getattr(self._source, "statuses", None)
+        if statuses is not None:
+            for name, status in statuses().items():
+                if self._statuses.get(name) != status:
+                    self._statuses[name] = status
+                    self.status.emit(name, status)
+
+    def on_status(self, name: str, status: str):
+        self.status.emit(name, status)
+
+    def on_error(self, msg: str):
+        self.error.emit(msg)
+
+
 # -------------------------------
 # Main window
 # -------------------------------
 class MainWindow(QMainWindow):
-    def __init__(self, parent=None):
+    """
+    Viewer of the acquisition daemon's shared-memory feed (feed=name), or with feed=None a standalone monitor that
+    opens the devices itself.
+    """
+    def __init__(self, parent=None, feed: str | None = None, display_rate_hz: float = DISPLAY_RATE_HZ):
         super().__init__(parent)
+        SensorCard.set_display_rate(display_rate_hz)
 
         self.setWindowTitle("Temperature & Pressure Monitor")
-        self.resize(640, 420)
+        self.resize(800, 760)
         self.setStatusBar(QStatusBar(self))
 
         central = QWidget()
@@ -322,6 +453,8 @@ class MainWindow(QMainWindow):
 
         self.temp_card = SensorCard("Temperature", "°C", scientific=False)
         self.pres_card = SensorCard("Pressure", "mTorr", scientific=True)
+        self.temp_plot = LivePlot("Temperature", "°C", capacity=HISTORY_SAMPLES)
+        self.pres_plot = LivePlot("Pressure", "mTorr", log_scale=True, capacity=HISTORY_SAMPLES, color="#d62728")
 
         controls = QHBoxLayout()
         self.start_btn = QPushButton("Start")
@@ -333,12 +466,41 @@ class MainWindow(QMainWindow):
 
         root.addLayout(controls)
         root.addWidget(self.temp_card)
+        root.addWidget(self.temp_plot)
         root.addWidget(self.pres_card)
+        root.addWidget(self.pres_plot)
 
         self.setCentralWidget(central)
 
-        self._threads: list[QThread] = []
+        # One acquisition engine polls every worker (one I/O thread per link) instead of one QThread per worker
+        self._engine: AcquisitionEngine | None = None
         self._workers: list[ReadingWorker] = []
+        self._cards: dict[str, SensorCard] = {}
+        self._plots: dict[str, LivePlot] = {}
+        self._bridge = AcquisitionBridge(self)
+        self._bridge.batch.connect(self._on_batch)
+        self._bridge.status.connect(self._on_channel_status)
+        self._bridge.error.connect(self._on_error)
+        self._logger: DiskLogger | None = None
+
+        # Viewer: the daemon owns the devices and the log; readings come from its feed
+        self._feed_name = feed
+        self._reader: FeedReader | None = None
+        if feed is not None:
+            self.start_btn.hide()
+            self.stop_btn.hide()
+            self._cards = {TEMPERATURE: self.temp_card, PRESSURE: self.pres_card}
+            self._plots = {TEMPERATURE: self.temp_plot, PRESSURE: self.pres_plot}
+            self._feed_timer = QTimer(self)
+            self._feed_timer.setInterval(1000)
+            self._feed_timer.timeout.connect(self._check_feed)
+            self._feed_timer.start()
+            self._check_feed()
+            return
+
+        # Every reading also goes to disk; the logger's queue never blocks the I/O threads
+        self._logger = DiskLogger(LOG_DIRECTORY)
+        self._logger.start()
 
         self._setup_workers()
 
@@ -346,47 +508,43 @@ class MainWindow(QMainWindow):
         self.stop_btn.clicked.connect(self._stop_workers)
 
     def _setup_workers(self):
+        self._engine = AcquisitionEngine(on_reading=self._logger.log,
+                                         on_status=self._on_engine_status,
+                                         on_error=self._bridge.on_error,
+                                         history=HISTORY_SAMPLES)
         temp_cfg = WorkerConfig(name="TempWorker", poll_interval_ms=200)
         pres_cfg = WorkerConfig(name="PressureWorker", poll_interval_ms=200)
-        self._add_worker(temp_cfg, self.temp_card, worker_cls=TempWorker)
-        self._add_worker(pres_cfg, self.pres_card, worker_cls=PressureWorker)
+        self._add_worker(temp_cfg, self.temp_card, worker_cls=TempWorker, plot=self.temp_plot)
+        self._add_worker(pres_cfg, self.pres_card, worker_cls=PressureWorker, plot=self.pres_plot)
 
-    def _add_worker(self, cfg: WorkerConfig, card: SensorCard, worker_cls=ReadingWorker):
-        thread = QThread(self)
+    def _add_worker(self, cfg: WorkerConfig, card: SensorCard, worker_cls=ReadingWorker, plot: LivePlot | None = None):
         worker = worker_cls(cfg)
-        worker.moveToThread(thread)
-
-        thread.started.connect(worker.start)
-        thread.finished.connect(worker.deleteLater)
+        self._engine.add_channel(cfg.name, worker, cfg.poll_interval_ms / 1000, link=worker.link)
+        self._cards[cfg.name] = card
+        if plot is not None:
+            self._plots[cfg.name] = plot
+        self._workers.append(worker)
 
-        worker.reading.connect(lambda v, c=card: c.set_value(v))
-        worker.status.connect(lambda s, c=card, name=cfg.name: self._on_status(c, name, s))
-        worker.error.connect(self._on_error)
+    def _on_engine_status(self, name: str, status: str):
+        # Called from the I/O threads
+        self._logger.log_status(name, status)
+        self._bridge.on_status(name, status)
 
-        self._threads.append(thread)
-        self._workers.append(worker)
-    
     def _teardown_workers(self):
-        # ask workers to stop in their own threads
-        for w in self._workers:
-            QMetaObject.invokeMethod(w, "stop", Qt.QueuedConnection)
-        # stop threads
-        for t in self._threads:
-            if t.isRunning():
-                t.quit()
-                t.wait(1500)
-            t.deleteLater()
-        # workers were deleteLater()’d by thread.finished, so just clear lists
-        self._threads.clear()
+        # stops scheduling, finishes the reads in progress and closes the devices on their own threads
+        if self._engine is not None:
+            self._engine.stop()
+            self._bridge.detach()
+        self._engine = None
         self._workers.clear()
 
     def _start_workers(self):
-        if any(t.isRunning() for t in self._threads):
+        if self._engine is not None and self._engine.running:
             return
-        if not self._threads:          # nothing exists -> (re)create
+        if self._engine is None:          # nothing exists -> (re)create
             self._setup_workers()
-        for t in self._threads:
-            t.start()
+        self._engine.start()
+        self._bridge.attach(self._engine)
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.statusBar().showMessage("Polling started")
@@ -395,7 +553,55 @@ class MainWindow(QMainWindow):
         self._teardown_workers()
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.statusBar().showMessage("Polling stopped")
+        dropped = self._logger.stats()["dropped"]
+        self.statusBar().showMessage(f"Polling stopped ({dropped} readings not logged)" if dropped
+                                     else "Polling stopped")
+
+    @Slot()
+    def _check_feed(self):
+        """Attaches to the daemon's feed once it is up, and lets go of it when the daemon stops answering."""
+        if self._reader is not None:
+            if self._reader.heartbeat_age() < STALE_S:
+                return
+            self._detach_feed()
+            for card in self._cards.values():
+                card.set_status("disconnected")
+            self.statusBar().showMessage(f"Acquisition daemon stopped ({self._feed_name})")
+        try:
+            reader = FeedReader(self._feed_name)
+        except FileNotFoundError:
+            self.statusBar().showMessage(f"Waiting for the acquisition daemon ({self._feed_name})")
+            return
+        if reader.heartbeat_age() >= STALE_S:  # Left behind by a daemon that crashed
+            reader.close()
+            return
+        self._reader = reader
+        for plot in self._plots.values():
+            plot.clear()
+        self._bridge.attach(reader)
+        self.statusBar().showMessage(f"Connected to the acquisition daemon ({self._feed_name})")
+
+    def _detach_feed(self):
+        if self._reader is not None:
+            self._bridge.detach()
+            self._reader.close()
+            self._reader = None
+
+    @Slot(dict)
+    def _on_batch(self, batch: dict):
+        for name, (t, values) in batch.items():
+            card = self._cards.get(name)
+            if card is not None:
+                card.set_batch(t, values)
+            plot = self._plots.get(name)
+            if plot is not None:
+                plot.append_batch(t, values)
+
+    @Slot(str, str)
+    def _on_channel_status(self, name: str, status: str):
+        card = self._cards.get(name)
+        if card is not None:
+            self._on_status(card, name, status)
 
     def _on_status(self, card: SensorCard, name: str, status: str):
         card.set_status(status)
@@ -406,18 +612,31 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         try:
-            self._stop_workers()
+            if self._feed_name is not None:
+                self._feed_timer.stop()
+                self._detach_feed()
+            else:
+                self._stop_workers()
+                self._logger.close()
         finally:
             super().closeEvent(event)
 
 
 # File-saving directories
+LOG_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
 
 # -------------------------------
 # Harness (run this file directly)
 # -------------------------------
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    w = MainWindow()
+    parser = argparse.ArgumentParser(description="Temperature & pressure monitor (viewer of AcquisitionDaemon.py).")
+    parser.add_argument("--feed", default=DEFAULT_FEED, help="shared memory name of the daemon (default: %(default)s)")
+    parser.add_argument("--standalone", action="store_true", help="open the devices directly instead of viewing the "
+                                                                  "daemon's feed")
+    parser.add_argument("--display-rate", type=float, default=DISPLAY_RATE_HZ,
+                        help="how often (at most) the values are redrawn, in Hz (default: %(default)s)")
+    args, qt_args = parser.parse_known_args()
+    app = QApplication(sys.argv[:1] + qt_args)
+    w = MainWindow(feed=None if args.standalone else args.feed, display_rate_hz=args.display_rate)
     w.show()
     sys.exit(app.exec())
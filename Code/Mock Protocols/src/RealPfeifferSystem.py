@@ -1,20 +1,21 @@
 # Real Pfeiffer System
 
-# This program reads the pressure from a "mock" gauge, the RPM and Drive Current from a "mock" Vacuum Pump, the temperature from a Eurotherm controller, and displays them through a Tkinter GUI
+# This program displays the pressure of the gauge, the RPM and Drive Current of the Vacuum Pump and the temperature of the Eurotherm controller through a Tkinter GUI
+# The instruments are read by the acquisition daemon (python AcquisitionDaemon.py, or --mock without hardware); this window only views its shared-memory feed,
+# so several windows can be open at once without any extra traffic on the instruments
 import csv
 import os
-import serial
+import time
 import datetime
 import numpy as np
 import tkinter as tk
 from collections import deque
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # FigureCanvasTkAgg is a class that allows a Matplotlib plot to be embedded in a Tkinker GUI window
-import pymodbus
-from pymodbus.client import ModbusTcpClient
 
-#Import the Pfeiffer gauge protocol
-import PfiefferVacuumProtocol as pvp
+# Import the viewer side of the acquisition daemon's feed
+from SharedFeed import FeedReader, STALE_S
+from AcquisitionDaemon import DEFAULT_FEED, PRESSURE, PUMP_SPEED, PUMP_CURRENT, TEMPERATURE
 
 #Import the mock Pfeiffer TC110 (vacuum pump) protocol
 import RealPfeifferTC110 as rpt
@@ -23,28 +24,9 @@ import RealPfeifferTC110 as rpt
 import InterlockSystemLibrary as isl
 
 
-# Open the serial port with a 1 second timeout (timeout time is the amount of time it will wait before moving onto the next line of code)
-# If "COM1" doesn’t work, you need to find which COM port is assigned to your USB-to-RS485 adapter.
-serial_port = serial.Serial("/dev/tty.usbserial-BG000M9B", baudrate=9600, timeout=1)
-
-# Eurotherm controller configuration
-eurotherm_IP = "192.168.111.222"   # IP address of the controller
-modbus_temperature_parameter_address = 2
-eurotherm_device_id = 1
-client = ModbusTcpClient(eurotherm_IP)
-if not client.connect():
-    raise RuntimeError("Could not connect to Modbus TCP server")
-
-
-        
-# Address for querying the two gauges
-GAUGE_ADDRESS1 = 122  # Use the number for the correct gauge
-# GAUGE_ADDRESS2 = 132  # Use the number for the correct gauge
-
-# Read gauge type
-gauge_type1 = pvp.read_gauge_type(serial_port, GAUGE_ADDRESS1)
-# gauge_type2 = pvp.read_gauge_type(s, GAUGE_ADDRESS2)
-# print(f"Gauge Type: {gauge_type}")
+# Feed of the acquisition daemon (attached once the daemon is running, see update_from_feed)
+feed_reader = None
+feed_cursors = {}
 
 
 # Create the pump
@@ -198,8 +180,48 @@ temperature_graph_button = tk.Button(
 )
 temperature_graph_button.grid(row=2, column=3, padx=20, pady=20, sticky="nsew")
 
-# Open the root window after X ms when the program starts running 
-root.after(100, isl.get_pressure_data(serial_port, root, pressure_data, pressure_label1, ax, fig, plot_canvas, pressure_read_counter, csv_manual_destination_folder,
+# Show the readings of the acquisition daemon: every 200 ms, take what it published since the last update
+def attach_feed():
+    global feed_reader, feed_cursors
+    try:
+        reader = FeedReader(DEFAULT_FEED)
+    except FileNotFoundError:
+        return False
+    if reader.heartbeat_age() >= STALE_S: # Left behind by a daemon that crashed
+        reader.close()
+        return False
+    feed_reader = reader
+    feed_cursors = {channel: 0 for channel in reader.channels}
+    return True
+
+def new_readings(channel):
+    # Readings of a channel since the last update, as (timestamp string, value) pairs
+    if channel not in feed_cursors:
+        return []
+    t, values, feed_cursors[channel] = feed_reader.since(channel, feed_cursors[channel])
+    return [(time.strftime("%H:%M:%S", time.localtime(ti)), value) for ti, value in zip(t.tolist(), values.tolist())]
+
+def update_from_feed():
+    global feed_reader, pressure_read_counter, temperature_read_counter
+    if feed_reader is not None and feed_reader.heartbeat_age() >= STALE_S:
+        feed_reader.close()
+        feed_reader = None
+        root.title("Live Pressure Reader (acquisition daemon stopped)")
+        root.after(1000, update_from_feed)
+        return
+    if feed_reader is None and not attach_feed():
+        root.title("Live Pressure Reader (waiting for the acquisition daemon)")
+        root.after(1000, update_from_feed)
+        return
+    root.title("Live Pressure Reader")
+
+    pressures = new_readings(PRESSURE)
+    for timestamp, p in pressures:
+        pressure_data.append((timestamp, p * 1000, p * 1000)) # bar -> millibar (one gauge, shown on both traces)
+        pressure_read_counter += 1
+    if pressures:
+        pressure_label1.config(text=f"Pressure 1: {pressure_data[-1][1]:.3f} millibar")
+        isl.update_figure(ax, pressure_data, fig, csv_manual_destination_folder,
 csv_auto_destination_folder,
 pressure_auto_destination_folder,
 pressure_manual_destination_folder,
@@ -207,9 +229,28 @@ rpm_auto_destination_folder,
 rpm_manual_destination_folder,
 drvcurrent_auto_destination_folder,
 drvcurrent_manual_destination_folder
-))
-# root.after(100, get_pump_data)
-root.after(100, isl.get_temperature_data(client, root, modbus_temperature_parameter_address, eurotherm_device_id))
+)
+        if plot_canvas is not None:
+            plot_canvas.draw()
+
+    speeds = new_readings(PUMP_SPEED)
+    if speeds:
+        rpm_label.config(text=f"Pump Speed: {speeds[-1][1]:.3f} rpm")
+    currents = new_readings(PUMP_CURRENT)
+    if currents:
+        drv_current_label.config(text=f"Pump Drive Current: {currents[-1][1]:.3f} A")
+
+    temperatures = new_readings(TEMPERATURE)
+    for timestamp, temperature in temperatures:
+        temperature_data.append((timestamp, temperature))
+        temperature_read_counter += 1
+    if temperatures:
+        temperature_label.config(text=f"Temperature: {temperature_data[-1][1]:.1f} C")
+
+    root.after(200, update_from_feed)
+
+# Start showing the readings X ms after the program starts running
+root.after(100, update_from_feed)
 root.mainloop() # keeps the GUI running continuously
 
 
@@ -1,22 +1,40 @@
 # Real PfeifferTC110 (difference with program found online at the Github is that this one is not time-dependent, but can be called from another time-dependent program)
 
 # %%
-import pyvisa as visa
-from pyvisa.constants import StopBits, Parity
 import logging
 logging.basicConfig(filename='TC110.log', encoding='utf-8', level=logging.WARNING)
-from time import sleep
+from threading import RLock
+
+# pyvisa is only imported (and the resource manager only created) the first time a port is opened or listed.
+# Both are shared by every TC110 in the process, so enumerating the serial/USB devices happens at most once.
+_resource_manager = None
+_resources = None
+
+def get_resource_manager():
+    global _resource_manager
+    if _resource_manager is None:
+        import pyvisa as visa
+        _resource_manager = visa.ResourceManager('@py') # Creates a VISA resource manager (@py tells it to use the PyVISA-py backend).
+    return _resource_manager
+
+def list_resources(refresh=False):
+    # Lists all VISA-compatible devices connected to your machine (serial, GPIB, USB, etc). Cached unless refresh=True.
+    global _resources
+    if _resources is None or refresh:
+        _resources = get_resource_manager().list_resources()
+    return _resources
 
 class TC110:
     def __init__(self, device_id=1, port=None, autoconnect=True):
         self.device_id = self._format_id(device_id)
+        self.lock = RLock() # Held by background samplers/pollers for each exchange, so threads don't interleave telegrams
+        self.write_layer = None # Set by use_write_layer(); start/stop/toggle then go through it
+        # Parity and stop bits are names of pyvisa.constants members, looked up when the port is opened
         self.communication = {'BAUDRATE' : 9600,
                               'DATA_BITS' : 8,
-                              'PARITY' : Parity.none,
+                              'PARITY' : 'none',
                               'START_BITS' : 1,
-                              'STOP_BITS' : StopBits.one}
-        self.rm = visa.ResourceManager('@py') # Creates a VISA resource manager (@py tells it to use the PyVISA-py backend).
-        self.devices = self.rm.list_resources() # Lists all VISA-compatible devices connected to your machine (serial, GPIB, USB, etc).
+                              'STOP_BITS' : 'one'}
 
         # If you don't designate a specific port, this uses the first port it finds
         if port == None:
@@ -114,24 +132,31 @@ class TC110:
         if autoconnect:
             self.connect(self.device_id, self.port)
 
+    @property
+    def rm(self):
+        return get_resource_manager()
+
+    @property
+    def devices(self):
+        return list_resources()
+
     def connect(self, device_id=1, port=None):
         if port is not None:
             self.port = port        
         self.device_id = self._format_id(device_id)
-        if self.port in self.devices:
-            self.inst = self.rm.open_resource(self.port, baud_rate=self.communication["BAUDRATE"], data_bits=self.communication["DATA_BITS"], parity=self.communication["PARITY"], stop_bits=self.communication["STOP_BITS"])
-            self.inst.write_termination = '\r'
-            # try communicating and try other ports in self.devices if unsuccessful. If all fails, raise Exception('No Pfeiffer device found.').
-        else:
-            raise Exception('No Pfeiffer device found.')
+        # The port is opened directly; the devices are only enumerated when no port was given
+        from pyvisa.constants import StopBits, Parity
+        try:
+            self.inst = self.rm.open_resource(self.port, baud_rate=self.communication["BAUDRATE"], data_bits=self.communication["DATA_BITS"], parity=getattr(Parity, self.communication["PARITY"]), stop_bits=getattr(StopBits, self.communication["STOP_BITS"]))
+        except Exception as e:
+            raise Exception(f'No Pfeiffer device found at {self.port}.') from e
+        self.inst.write_termination = '\r'
+        # try communicating and try other ports in self.devices if unsuccessful. If all fails, raise Exception('No Pfeiffer device found.').
     
     @classmethod
     def _pad_payload(cls, payload, length):
-        payload = str(payload)
-        if len(payload) >= length:
-            return payload
-        else:
-            return cls._pad_payload('0'+payload, length)
+        # Left-pads with zeros up to length (longer payloads are returned unchanged)
+        return str(payload).rjust(length, '0')
     @classmethod
     def _format_id(cls, id):
         if type(id) not in [str,int]:
@@ -186,7 +211,7 @@ class TC110:
                 message = {'device_id':device_id, 'action' : action, 'param_number' : param_number, 'payload_length' : payload_length, 'payload' : payload}
                 return message
 
-    def send_message(self, command, device_id=None, query_only=True, payload='=?'):
+    def build_message(self, command, device_id=None, query_only=True, payload='=?'):
         if device_id == None:
             device_id = self.device_id
         else:
@@ -196,7 +221,10 @@ class TC110:
         payload_length = '02' if query_only else self.data_types[command["data type"]]["length"]
         message_string = device_id+action+param_number+payload_length+payload
         checksum = self._calculate_checksum(message_string)
-        full_message = message_string+checksum
+        return message_string+checksum
+
+    def send_message(self, command, device_id=None, query_only=True, payload='=?'):
+        full_message = self.build_message(command, device_id=device_id, query_only=query_only, payload=payload)
         logging.debug(f'Sending: {full_message}')
         self.inst.write(full_message)
         return full_message
@@ -209,17 +237,45 @@ class TC110:
         elif command["data type"] == 1:
             out = int(payload)
         elif command["data type"] == 2:
-            out = float(payload)
+            out = int(payload)/100 # fixed comma: 001571 is 15,71
         elif command["data type"] == 4:
-            out = str(payload)
+            out = str(payload).rstrip()
         elif command["data type"] == 7:
             out = int(payload)
         elif command["data type"] == 11:
-            out = str(payload)
+            out = str(payload).rstrip()
         else:
             raise Exception('Unknwon data type.')
         return out
 
+    def format_payload(self, value, command):
+        # Inverse of cast: turns a value into the payload of a write telegram
+        data_type = command["data type"]
+        length = int(self.data_types[data_type]["length"])
+        if data_type == 0:
+            return '111111' if value else '000000'
+        elif data_type in (1, 7):
+            return self._pad_payload(int(value), length)
+        elif data_type == 2:
+            return self._pad_payload(int(round(float(value)*100)), length) # fixed comma: 001571 is 15,71
+        elif data_type in (4, 11):
+            return str(value)[:length].ljust(length)
+        else:
+            raise Exception('Unknwon data type.')
+
+    def set_fromkey(self, command_key, value, device_id=None):
+        command = self.commands[command_key]
+        if 'W' not in command["access"]:
+            raise ValueError(f'{command_key} is read-only.')
+        self.send_message(command=command, device_id=device_id, query_only=False, payload=self.format_payload(value, command))
+        message = self.receive_message()
+        if message:
+            #FIXME check for error messages from pump
+            return self.cast(message['payload'],command)
+        else:
+            logging.warning(f'{command_key} not written sucessfully.')
+            return None
+
     def get_fromkey(self, command_key, device_id=None):
         self.send_message(command=self.commands[command_key], device_id=device_id)
         message = self.receive_message()
@@ -230,6 +286,11 @@ class TC110:
             logging.warning(f'{command_key} not received sucessfully.')
             return None
 
+    def get_many(self, command_keys, device_id=None):
+        # Reads several parameters in one pass, holding the lock so no other thread's telegrams get in between
+        with self.lock:
+            return {key: self.get_fromkey(key, device_id=device_id) for key in command_keys}
+
     def get_pressure(self, device_id=None):        
         self.send_message(command=self.commands["Pressure"], device_id=device_id)
         message = self.receive_message()
@@ -281,7 +342,26 @@ class TC110:
             logging.warning('Current not received sucessfully.')
             return None
 
+    def use_write_layer(self, **kwargs):
+        # Routes start/stop/toggle through a TC110WriteLayer (redundant starts are dropped, stops always reach the pump)
+        from TC110WriteLayer import WriteLayer
+        self.write_layer = WriteLayer(self, device_id=self.device_id, **kwargs)
+        return self.write_layer
+
+    def _through_write_layer(self, device_id):
+        return self.write_layer is not None and (device_id is None or self._format_id(device_id) == self.write_layer.device_id)
+
+    def _write_layer_result(self, timeout=2.0):
+        # Waits for the queued write and returns the pumping station state the pump confirmed (None if unknown)
+        if not self.write_layer.flush(timeout):
+            logging.warning('Reply not received sucessfully.')
+            return None
+        return self.write_layer.state('PumpgStatn')
+
     def start(self, device_id=None):
+        if self._through_write_layer(device_id):
+            self.write_layer.start_pump()
+            return self._write_layer_result()
         self.send_message(command=self.commands["PumpgStatn"], device_id=device_id, query_only=False, payload='111111')
         message = self.receive_message()
         if message:
@@ -292,6 +372,9 @@ class TC110:
             return None
     
     def stop(self, device_id=None):
+        if self._through_write_layer(device_id):
+            self.write_layer.stop_pump()
+            return self._write_layer_result()
         self.send_message(command=self.commands["PumpgStatn"], device_id=device_id, query_only=False, payload='000000')
         message = self.receive_message()
         if message:
@@ -302,6 +385,10 @@ class TC110:
             return None
 
     def toggle(self, device_id=None):
+        if self._through_write_layer(device_id):
+            if not self.write_layer.toggle_pump():
+                return None
+            return self._write_layer_result()
         self.send_message(command=self.commands["PumpgStatn"], device_id=device_id, query_only=True, payload='=?')
         message = self.receive_message()
         if message["payload"] in ['000000','111111']:
@@ -337,56 +424,15 @@ class TC110:
 
 # Removed the time-dependence of the program, so that it can be directly called from another program with time-dependence
 
-    def run_timed(self, seconds):
-        try:
-            self.timer = BoolTimer(seconds)
-            self.timer.start()
-            self.start()
-            while self.timer.state:
-                sleep(0.3)
-                status = self.get_status()
-                print(f'Frequency: {status["Speed"]} Hz')
-                if not self.timer.state:
-                    break
-                sleep(0.05)
-        finally:
-            self.stop()
+    def run_timed(self, seconds, rate_hz=3.0, callback=None):
+        # Runs the pump for the given time while a background sampler records the speed; the pump is always stopped on exit
+        from TC110Sampler import TC110Sampler
+        sampler = TC110Sampler(self, keys=('ActualSpd',), rate_hz=rate_hz)
+        if callback is not None:
+            sampler.subscribe(callback)
+        stats = sampler.run_for(seconds, start_pump=True)
+        logging.info(f'run_timed: {stats}')
+        return sampler
     
     def close(self):
         self.inst.close()
-# %%
-
-from threading import Thread, Event
-
-class BoolTimer(Thread):
-    """A boolean value that toggles after a specified number of seconds:
-
-    bt = BoolTimer(30.0, False)
-    bt.start()
-    bt.cancel() # prevent the booltimer from toggling if it is still waiting
-    """
-
-    def __init__(self, interval, initial_state=True):
-        Thread.__init__(self)
-        self.interval = interval
-        self.state = initial_state
-        self.finished = Event()
-
-    def __nonzero__(self):
-        return bool(self.state)
-
-    def cancel(self):
-        """Stop BoolTimer if it hasn't toggled yet"""
-        self.finished.set()
-
-    def run(self):
-        self.finished.wait(self.interval)
-        if not self.finished.is_set():
-            self.state = not self.state
-        self.finished.set()
-
-        
-        
-        
-        
-        
\ No newline at end of file
@@ -0,0 +1,87 @@
+# Ring Buffer
+# Preallocated NumPy ring buffer of timestamped samples (one timestamp column plus N value columns).
+# Nothing is allocated per sample, so it can take readings at a high rate for as long as the program runs.
+# One thread writes and any number of threads read: the writer fills the row first and only then advances
+# `total`, so readers never see a half-written row (as long as they keep up with less than `capacity` rows of lag).
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    rb = RingBuffer(capacity=18000, n_columns=2)
+    rb.append(time.time(), (speed, current))
+    t, values = rb.arrays()        # chronological copies, values.shape == (len(rb), 2)
+    t, values, cursor = rb.since(cursor)   # only the rows written after cursor
+    t, values = rb.after(time.time() - 60)  # only the rows of the last minute
+    """
+
+    def __init__(self, capacity, n_columns=1, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError(f'Capacity should be at least 1. {capacity} was given.')
+        self.capacity = int(capacity)
+        self.n_columns = int(n_columns)
+        self.t = np.full(self.capacity, np.nan)
+        self.values = np.full((self.capacity, self.n_columns), np.nan, dtype=dtype)
+        self.total = 0  # Number of rows ever written
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, t, values):
+        i = self.total % self.capacity
+        self.t[i] = t
+        self.values[i] = values
+        self.total += 1
+
+    def extend(self, t, values):
+        """Appends several rows at once (t has shape (n,), values has shape (n, n_columns))."""
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values).reshape(len(t), self.n_columns)
+        if len(t) > self.capacity:
+            t, values = t[-self.capacity:], values[-self.capacity:]
+        idx = (self.total + np.arange(len(t))) % self.capacity
+        self.t[idx] = t
+        self.values[idx] = values
+        self.total += len(t)
+
+    def _indices(self, start, stop):
+        start = max(start, stop - self.capacity)
+        return np.arange(start, stop) % self.capacity
+
+    def arrays(self, last=None):
+        """Chronological copies of the buffered (or the `last` n) rows."""
+        stop = self.total
+        start = 0 if last is None else stop - last
+        idx = self._indices(max(start, 0), stop)
+        return self.t[idx], self.values[idx]
+
+    def after(self, t0):
+        """Chronological copies of the rows with t >= t0 (timestamps must be appended in order).
+
+        The stored rows are two sorted runs (oldest to the end of the array, then the start of the array to the newest
+        row); each is searched for t0, so only the rows in the window are copied.
+        """
+        stop = self.total
+        oldest = stop % self.capacity if stop >= self.capacity else 0
+        newest = (stop - 1) % self.capacity + 1 if stop else 0
+        runs = [self.t[oldest:], self.t[:newest]] if oldest else [self.t[:newest]]
+        count = sum(len(run) - np.searchsorted(run, t0, side='left') for run in runs)
+        return self.arrays(last=int(count))
+
+    def since(self, cursor):
+        """Rows written after `cursor` (a previous value of total). Returns (t, values, new cursor)."""
+        stop = self.total
+        idx = self._indices(cursor, stop)
+        return self.t[idx], self.values[idx], stop
+
+    def latest(self):
+        if self.total == 0:
+            return None, None
+        i = (self.total - 1) % self.capacity
+        return self.t[i], self.values[i].copy()
+
+    def clear(self):
+        self.t[:] = np.nan
+        self.values[:] = np.nan
+        self.total = 0
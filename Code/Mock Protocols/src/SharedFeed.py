@@ -0,0 +1,264 @@
+# Shared Feed
+# The acquisition daemon publishes the latest value, status and a rolling history of every channel in one block of
+# shared memory (multiprocessing.shared_memory); GUIs and other viewers attach to it read-only. Any number of viewers
+# can read without adding device traffic, and a viewer that stalls or exits does not affect acquisition.
+#
+# Consistency uses a sequence lock: the (single) writer makes the sequence number odd, updates the block and makes it
+# even again; a reader copies what it needs and retries if the sequence number was odd or changed meanwhile. Readers
+# never block the writer. (Python has no explicit memory barriers; the stores and loads are ordered by the
+# interpreter, which is enough on x86 and in practice on ARM, and the before/after check catches a writer that
+# overlapped the copy.)
+#
+#   feed = FeedWriter('yanglab_acquisition', ['Temperature', 'Pressure'])      # daemon
+#   feed.publish('Pressure', time.time(), 2.1e-6)
+#
+#   reader = FeedReader('yanglab_acquisition')                                # viewer
+#   reader.latest()['Pressure']            # (t, value, status)
+#   t, values, cursor = reader.since('Pressure', cursor)
+#
+# Layout: MAGIC, uint64 meta (sequence, channels, capacity, writer pid), float64 heartbeat, channel names
+# (NAME_BYTES each), then per channel: uint64 total, float64 latest t and value, uint8 status, and the history rings
+# float64 t[channels, capacity] and value[channels, capacity].
+
+import os
+import time
+import threading
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+MAGIC = b'YLFEED01'
+NAME_BYTES = 32
+HEADER_BYTES = 64
+READ_RETRIES = 1000
+STALE_S = 5.0  # A writer that has not marked its feed alive for this long is taken as gone
+
+# Status codes (as in DiskLogger)
+OK = 0
+ERROR = 1
+DISCONNECTED = 2
+IDLE = 3
+STATUS_CODES = {'connected': OK, 'error': ERROR, 'disconnected': DISCONNECTED, 'idle': IDLE}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+def _align(n):
+    return (n + 7) // 8 * 8
+
+
+class _Layout:
+    """numpy views of the parts of the block (buf=None only computes the size)."""
+
+    def __init__(self, buf, n_channels, capacity):
+        offset = HEADER_BYTES
+
+        def view(shape, dtype):
+            nonlocal offset
+            array = None if buf is None else np.ndarray(shape, dtype, buf, offset=offset)
+            offset = _align(offset + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            return array
+
+        self.meta = None if buf is None else np.ndarray(4, np.uint64, buf, offset=8)  # sequence, channels, capacity, pid
+        self.heartbeat = None if buf is None else np.ndarray(1, np.float64, buf, offset=40)
+        self.names = view((n_channels, NAME_BYTES), np.uint8)
+        self.totals = view(n_channels, np.uint64)
+        self.latest_t = view(n_channels, np.float64)
+        self.latest_value = view(n_channels, np.float64)
+        self.status = view(n_channels, np.uint8)
+        self.t = view((n_channels, capacity), np.float64)
+        self.values = view((n_channels, capacity), np.float64)
+        self.size = offset
+
+
+class FeedWriter:
+    """
+    Creates the shared block and publishes readings into it. Thread-safe (publishing is serialized by a lock), so
+    it can be fed directly from the AcquisitionEngine's I/O threads.
+
+    :param name: Shared memory name the viewers attach to.
+    :param channels: Channel names (at most NAME_BYTES bytes of UTF-8 each).
+    :param capacity: Readings kept per channel.
+    """
+
+    def __init__(self, name, channels, capacity=3600 * 5):
+        self.channels = list(channels)
+        self.index = {channel: i for i, channel in enumerate(self.channels)}
+        self.capacity = int(capacity)
+        n = len(self.channels)
+        size = _Layout(None, n, self.capacity).size
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Only a block left behind by a daemon that did not shut down cleanly may be replaced
+            pid = _live_writer(name)
+            if pid is not None:
+                raise FileExistsError(f'The feed {name} is in use by process {pid}.') from None
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self._layout = _Layout(self.shm.buf, n, self.capacity)
+        self._lock = threading.Lock()
+        layout = self._layout
+        layout.meta[:] = (0, n, self.capacity, os.getpid())
+        for i, channel in enumerate(self.channels):
+            encoded = channel.encode()[:NAME_BYTES]
+            layout.names[i, :len(encoded)] = np.frombuffer(encoded, np.uint8)
+        layout.totals[:] = 0
+        layout.latest_t[:] = np.nan
+        layout.latest_value[:] = np.nan
+        layout.status[:] = IDLE
+        layout.t[:] = np.nan
+        layout.values[:] = np.nan
+        self.heartbeat()
+        self.shm.buf[:8] = MAGIC  # Written last: readers only attach to a complete block
+
+    def publish(self, channel, t, value, status=OK):
+        """Adds one reading (signature of an AcquisitionEngine on_reading callback plus a status)."""
+        i = self.index[channel]
+        layout = self._layout
+        with self._lock:
+            layout.meta[0] += 1  # Odd: writing
+            total = int(layout.totals[i])
+            k = total % self.capacity
+            layout.t[i, k] = t
+            layout.values[i, k] = value
+            layout.latest_t[i] = t
+            layout.latest_value[i] = value
+            layout.status[i] = status
+            layout.totals[i] = total + 1
+            layout.meta[0] += 1
+
+    def publish_status(self, channel, status):
+        """Updates a channel's status (signature of an AcquisitionEngine on_status callback)."""
+        i = self.index[channel]
+        with self._lock:
+            self._layout.meta[0] += 1
+            self._layout.status[i] = STATUS_CODES.get(status, ERROR)
+            self._layout.meta[0] += 1
+
+    def heartbeat(self):
+        """Marks the writer as alive (viewers can tell a running daemon from a stale block)."""
+        self._layout.heartbeat[0] = time.time()
+
+    def close(self, unlink=True):
+        self._layout = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class FeedReader:
+    """
+    Read-only view of a feed created by a FeedWriter (possibly in another process).
+
+    Raises FileNotFoundError if no feed with that name exists (the daemon is not running).
+    """
+
+    def __init__(self, name):
+        self.shm = _attach(name)
+        if bytes(self.shm.buf[:8]) != MAGIC:
+            self.shm.close()
+            raise FileNotFoundError(f'Shared memory {name} is not an acquisition feed (yet).')
+        meta = np.ndarray(4, np.uint64, self.shm.buf, offset=8)
+        n, self.capacity = int(meta[1]), int(meta[2])
+        self._layout = _Layout(self.shm.buf, n, self.capacity)
+        self.channels = [bytes(row).rstrip(b'\0').decode() for row in self._layout.names]
+        self.index = {channel: i for i, channel in enumerate(self.channels)}
+        self.retries = 0  # Reads that had to be repeated because the writer was busy
+
+    def _consistent(self, read):
+        """Runs read() until it saw no write in progress and no write happened meanwhile."""
+        sequence = self._layout.meta
+        for _ in range(READ_RETRIES):
+            before = int(sequence[0])
+            if before % 2 == 0:
+                result = read()
+                if int(sequence[0]) == before:
+                    return result
+            self.retries += 1
+            time.sleep(0)
+        raise TimeoutError('The feed writer never finished a write.')
+
+    def latest(self):
+        """channel -> (t, value, status name) of the newest reading."""
+        layout = self._layout
+        t, values, status = self._consistent(
+            lambda: (layout.latest_t.copy(), layout.latest_value.copy(), layout.status.copy()))
+        return {channel: (t[i], values[i], STATUS_NAMES.get(int(status[i]), 'error'))
+                for i, channel in enumerate(self.channels)}
+
+    def statuses(self):
+        """channel -> status name."""
+        return {channel: status for channel, (_, _, status) in self.latest().items()}
+
+    def total(self, channel):
+        return int(self._layout.totals[self.index[channel]])
+
+    def since(self, channel, cursor):
+        """Readings of a channel after `cursor` (a previous total; 0 for the whole history).
+
+        Returns (t, values, new cursor), like RingBuffer.since.
+        """
+        i = self.index[channel]
+        layout = self._layout
+
+        def read():
+            stop = int(layout.totals[i])
+            start = max(cursor, stop - self.capacity)
+            idx = np.arange(start, stop) % self.capacity
+            return layout.t[i, idx], layout.values[i, idx], stop
+
+        return self._consistent(read)
+
+    def history(self, channel, last=None):
+        """Chronological (t, values) of the buffered (or the `last` n) readings of a channel."""
+        total = self.total(channel)
+        t, values, _ = self.since(channel, 0 if last is None else max(total - last, 0))
+        return t, values
+
+    def heartbeat_age(self):
+        """Seconds since the writer last marked itself alive."""
+        return time.time() - float(self._layout.heartbeat[0])
+
+    def close(self):
+        self._layout = None
+        self.shm.close()
+
+
+def _live_writer(name):
+    """PID of the process still writing the feed `name`, or None if the block is stale."""
+    try:
+        shm = _attach(name)
+    except FileNotFoundError:
+        return None
+    try:
+        if len(shm.buf) < HEADER_BYTES or bytes(shm.buf[:8]) != MAGIC:
+            return None
+        pid = int(np.ndarray(4, np.uint64, shm.buf, offset=8)[3])
+        heartbeat = float(np.ndarray(1, np.float64, shm.buf, offset=40)[0])
+    finally:
+        shm.close()
+    if time.time() - heartbeat >= STALE_S:
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return None
+    except PermissionError:
+        pass  # Alive, owned by another user
+    return pid
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    shm = shared_memory.SharedMemory(name=name)
+    # Before 3.13 attaching registers the block with this process' resource tracker, which would unlink it (and end
+    # the feed for everyone) when the viewer exits. Only the creating process should own it.
+    if int(np.ndarray(4, np.uint64, shm.buf, offset=8)[3]) != os.getpid():
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
@@ -0,0 +1,88 @@
+# TC110 Error History
+# Watches the TC110 error code and error history (ErrHist1-ErrHist10) for the interlock.
+# Only Error_code (303) is read on every poll; the ten history slots are read in one pass, and only when the
+# error code changes. New history entries and error code changes are passed to the subscribers as timestamped events.
+
+import time
+import logging
+
+from TC110PollingPlanner import key_for_number, ERROR_NUMBER, NO_ERROR_CODES
+
+HISTORY_NUMBERS = [str(number) for number in range(360, 370)]  # ErrHist1 (most recent) ... ErrHist10
+
+
+def new_entries(old, new):
+    """
+    Entries at the front of `new` that were not in `old` (the history shifts down by one slot per new error).
+    With no old history every non-empty entry is new.
+    """
+    if old is None:
+        return [entry for entry in new if entry is not None and entry.strip() not in NO_ERROR_CODES]
+    for shift in range(len(new) + 1):
+        if list(new[shift:]) == list(old[:len(old) - shift]):
+            return [entry for entry in new[:shift] if entry is not None]
+    return [entry for entry in new if entry is not None]
+
+
+class ErrorHistoryService:
+    """
+    errors = ErrorHistoryService(pump, on_event=interlock.handle_pump_error)
+    errors.poll()   # Call every cycle: one telegram unless the error code changed
+    """
+
+    def __init__(self, pump, device_id=None, on_event=None):
+        self.pump = pump
+        self.device_id = device_id
+        self.error_key = key_for_number(pump.commands, ERROR_NUMBER)
+        self.history_keys = [key_for_number(pump.commands, number) for number in HISTORY_NUMBERS]
+        self.error_code = None
+        self.history = None  # Cached ErrHist1-ErrHist10
+        self.history_time = None
+        self.events = []
+        self._subscribers = [on_event] if on_event is not None else []
+
+    def subscribe(self, callback):
+        """callback(event) for every new error code or history entry."""
+        self._subscribers.append(callback)
+
+    def _emit(self, event):
+        self.events.append(event)
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logging.warning(f'Error history subscriber {callback!r} failed ({e}).')
+
+    @property
+    def in_error(self):
+        return self.error_code is not None and self.error_code.strip() not in NO_ERROR_CODES
+
+    def refresh_history(self):
+        """Reads all ten history slots in one pass and emits the entries that were not there on the previous read."""
+        values = self.pump.get_many(self.history_keys, device_id=self.device_id)
+        history = [values[key] for key in self.history_keys]
+        now = time.time()
+        if None in history:
+            logging.warning('Error history not received completely; keeping the cached copy.')
+            return []
+        # The first read only fills the cache: entries that were already there at startup are not new
+        added = [] if self.history is None else new_entries(self.history, history)
+        self.history, self.history_time = history, now
+        for position, code in enumerate(added):
+            self._emit({'time': now, 'kind': 'history', 'code': code, 'position': position + 1})
+        return added
+
+    def poll(self):
+        """Reads Error_code and, if it changed (or on the first poll), the history. Returns the new events."""
+        count = len(self.events)
+        code = self.pump.get_fromkey(self.error_key, device_id=self.device_id)
+        if code is None:
+            return []
+        if code != self.error_code:
+            previous, self.error_code = self.error_code, code
+            if previous is not None or self.in_error:
+                self._emit({'time': time.time(), 'kind': 'error_code', 'code': code, 'previous': previous})
+            self.refresh_history()
+        elif self.history is None:
+            self.refresh_history()
+        return self.events[count:]
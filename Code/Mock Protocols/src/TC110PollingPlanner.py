@@ -0,0 +1,131 @@
+# TC110 Polling Planner
+# Decides which TC110 parameters are worth a bus round-trip on each polling cycle.
+# Fast telemetry (speed, current, power) is read every cycle, slowly changing values every few cycles,
+# and metadata (operating hours, firmware, names, error history) is served from a cache and refreshed every few minutes.
+# During run-up (PumpAccel) or when the pump reports an error, the planner polls faster and promotes the medium tier.
+
+import time
+import logging
+
+FAST = 'fast'
+MEDIUM = 'medium'
+SLOW = 'slow'
+
+# Telemetry that changes every second and is always polled
+FAST_KEYS = ('ActualSpd', 'DrvCurrent', 'DrvPower', 'PumpAccel')
+
+# Parameter numbers of the status values that switch the planner into boost mode
+ACCEL_NUMBER = '307'
+ERROR_NUMBER = '303'
+
+# Error_code payloads that mean "no error"
+NO_ERROR_CODES = ('', '000000', 'no Err')
+
+
+def key_for_number(commands, number):
+    """Returns the command key for a TC110 parameter number (e.g. '303' -> 'Error_code ')."""
+    for key, command in commands.items():
+        if command['number'] == number:
+            return key
+    raise KeyError(f'No TC110 parameter with number {number}.')
+
+
+def assign_tiers(commands, keys=None):
+    """
+    Assigns a polling tier to every readable TC110 parameter using the metadata in the commands table.
+
+    :param commands: The TC110.commands table.
+    :param keys: Optional subset of command keys to poll. Defaults to every readable parameter.
+    :returns: dict of command key -> FAST, MEDIUM or SLOW
+    """
+    if keys is None:
+        keys = [key for key, command in commands.items() if 'R' in command['access']]
+    tiers = {}
+    for key in keys:
+        command = commands[key]
+        if 'R' not in command['access']:
+            raise ValueError(f'{key} is write-only and cannot be polled.')
+        if key in FAST_KEYS or command['number'] == ERROR_NUMBER:
+            tiers[key] = FAST
+        elif command['non-volatile'] or command['data type'] in (4, 11):
+            # Stored settings, counters, error history and identification strings
+            tiers[key] = SLOW
+        else:
+            tiers[key] = MEDIUM
+    return tiers
+
+
+class PollingPlanner:
+    """
+    Tiered polling of one TC110.
+
+    planner = PollingPlanner(pump)
+    while True:
+        values = planner.poll()
+        sleep(planner.interval)
+    """
+
+    def __init__(self, pump, keys=None, fast_interval=1.0, boost_interval=0.2, medium_every=5,
+                 slow_refresh_s=300.0, slow_per_cycle=2, device_id=None, clock=time.monotonic):
+        self.pump = pump
+        self.device_id = device_id
+        self.tiers = assign_tiers(pump.commands, keys)
+        self.fast_interval = fast_interval
+        self.boost_interval = boost_interval
+        self.medium_every = medium_every
+        self.slow_refresh_s = slow_refresh_s
+        self.slow_per_cycle = slow_per_cycle
+        self.clock = clock
+        self.cache = {}  # command key -> (value, timestamp of the reading)
+        self.boosted = False
+        self._cycle = 0
+        self._accel_key = key_for_number(pump.commands, ACCEL_NUMBER)
+        self._error_key = key_for_number(pump.commands, ERROR_NUMBER)
+
+    @property
+    def interval(self):
+        """Seconds to wait before the next cycle."""
+        return self.boost_interval if self.boosted else self.fast_interval
+
+    def keys_in_tier(self, tier):
+        return [key for key, t in self.tiers.items() if t == tier]
+
+    def due(self, now=None):
+        """Returns the command keys that should be read on this cycle."""
+        if now is None:
+            now = self.clock()
+        due = self.keys_in_tier(FAST)
+        if self.boosted or self._cycle % self.medium_every == 0:
+            due += self.keys_in_tier(MEDIUM)
+        else:
+            # Medium values that have never been read are fetched straight away
+            due += [key for key in self.keys_in_tier(MEDIUM) if key not in self.cache]
+        # Refresh the stalest slow values, a few per cycle so a refresh never stalls the fast tier
+        stale = [key for key in self.keys_in_tier(SLOW)
+                 if key not in self.cache or now - self.cache[key][1] >= self.slow_refresh_s]
+        stale.sort(key=lambda key: self.cache[key][1] if key in self.cache else float('-inf'))
+        due += stale[:self.slow_per_cycle]
+        return due
+
+    def poll(self):
+        """Reads the parameters that are due, updates the cache and returns the latest value of every parameter."""
+        now = self.clock()
+        for key in self.due(now):
+            value = self.pump.get_fromkey(key, device_id=self.device_id)
+            if value is not None:
+                self.cache[key] = (value, now)
+        self._cycle += 1
+        self._update_boost()
+        return self.values()
+
+    def values(self):
+        return {key: value for key, (value, _) in self.cache.items()}
+
+    def _update_boost(self):
+        accelerating = bool(self.cache.get(self._accel_key, (False, None))[0])
+        error = str(self.cache.get(self._error_key, ('', None))[0]).strip()
+        boosted = accelerating or error not in NO_ERROR_CODES
+        if boosted != self.boosted:
+            logging.info(f'TC110 polling {"boosted" if boosted else "back to normal rate"} '
+                         f'(accelerating={accelerating}, error={error!r}).')
+        self.boosted = boosted
@@ -0,0 +1,166 @@
+# TC110 Profiler
+# Records the speed/current trajectory of a TC110 run-up or spin-down as fast as the bus allows.
+# Each event is captured on background threads (so a GUI calling start_runup() is never blocked) into a columnar
+# NumPy buffer; time-to-speed, peak current and the acceleration curve are updated sample by sample, and the
+# finished event is written to disk as one compressed .npz file.
+
+import os
+import time
+import logging
+import datetime
+from threading import Thread, Event
+
+import numpy as np
+
+from TC110Sampler import TC110Sampler
+
+PROFILE_KEYS = ('ActualSpd', 'DrvCurrent', 'AccelDecel', 'SetSpdAtt')
+RUNUP = 'runup'
+SPINDOWN = 'spindown'
+
+
+class ProfileBuffer:
+    """Columnar buffer (one NumPy array per column) that doubles its capacity when full."""
+
+    def __init__(self, columns, capacity=1024):
+        self.columns = tuple(columns)
+        self.data = {name: np.full(capacity, np.nan) for name in self.columns}
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, **row):
+        if self.length == len(self.data[self.columns[0]]):
+            for name in self.columns:
+                grown = np.full(2 * self.length, np.nan)
+                grown[:self.length] = self.data[name]
+                self.data[name] = grown
+        for name in self.columns:
+            self.data[name][self.length] = row.get(name, np.nan)
+        self.length += 1
+
+    def __getitem__(self, name):
+        return self.data[name][:self.length]
+
+    def arrays(self):
+        return {name: self[name] for name in self.columns}
+
+
+class RunupProfiler:
+    """
+    profiler = RunupProfiler(pump, directory='ProfileLogs', on_finished=print)
+    profiler.start_runup()      # Returns immediately; the capture runs in the background
+    ...
+    profiler.start_spindown()
+    profiler.wait()
+    profiler.events[-1]         # Summary of the last event (time to speed, peak current, file name)
+    """
+
+    def __init__(self, pump, directory='.', rate_hz=None, max_duration_s=900.0, stopped_speed_hz=1.0,
+                 device_id=None, on_finished=None):
+        self.pump = pump
+        self.directory = directory
+        self.rate_hz = rate_hz  # None: back-to-back readings
+        self.max_duration_s = max_duration_s
+        self.stopped_speed_hz = stopped_speed_hz
+        self.device_id = device_id
+        self.on_finished = on_finished
+        self.events = []
+        self.buffer = None
+        self.summary = None
+        self._done = Event()
+        self._thread = None
+
+    @property
+    def capturing(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start_runup(self):
+        """Starts the pump (PumpgStatn=111111) and records the run-up until the set speed is attained."""
+        self._begin(RUNUP)
+
+    def start_spindown(self):
+        """Stops the pump (PumpgStatn=000000) and records the spin-down until the rotor has stopped."""
+        self._begin(SPINDOWN)
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def abort(self):
+        """Ends the current capture early; what was recorded so far is still saved."""
+        self._done.set()
+
+    def _begin(self, kind):
+        if self.capturing:
+            raise RuntimeError('A capture is already running.')
+        self._done.clear()
+        self._thread = Thread(target=self._capture, args=(kind,), name=f'TC110Profiler-{kind}', daemon=True)
+        self._thread.start()
+
+    def _capture(self, kind):
+        self.buffer = ProfileBuffer(('t',) + PROFILE_KEYS + ('accel_hz_s',))
+        self.summary = {'kind': kind, 'started': time.time(), 'time_to_speed_s': np.nan, 'peak_current_a': np.nan,
+                        'peak_current_t_s': np.nan, 'samples': 0, 'file': None}
+        sampler = TC110Sampler(self.pump, keys=PROFILE_KEYS, rate_hz=self.rate_hz, capacity=1, device_id=self.device_id)
+        sampler.subscribe(self._on_sample)
+        try:
+            # start()/stop() lock the pump per telegram; holding pump.lock here would stall a write layer's thread
+            if kind == RUNUP:
+                self.pump.start(device_id=self.device_id)
+            else:
+                self.pump.stop(device_id=self.device_id)
+            self._t0 = time.time()
+            sampler.start()
+            self._done.wait(self.max_duration_s)
+        except Exception as e:
+            logging.warning(f'TC110 profiler: {kind} capture failed ({e}).')
+        finally:
+            sampler.stop()
+            self.summary['sampler'] = sampler.stats()
+            self._save()
+            self.events.append(self.summary)
+        if self.on_finished is not None:
+            self.on_finished(self.summary)
+
+    def _on_sample(self, t, values):
+        speed, current, accel_decel, attained = values
+        rel_t = t - self._t0
+        buf = self.buffer
+        # Acceleration curve from consecutive speed readings (Hz/s)
+        accel = np.nan
+        if len(buf) > 0:
+            dt = rel_t - buf['t'][-1]
+            if dt > 0:
+                accel = (speed - buf['ActualSpd'][-1]) / dt
+        buf.append(t=rel_t, ActualSpd=speed, DrvCurrent=current, AccelDecel=accel_decel, SetSpdAtt=attained,
+                   accel_hz_s=accel)
+        summary = self.summary
+        summary['samples'] = len(buf)
+        peak = summary['peak_current_a']
+        if not np.isnan(current) and (np.isnan(peak) or current > peak):
+            summary['peak_current_a'] = current
+            summary['peak_current_t_s'] = rel_t
+        if summary['kind'] == RUNUP:
+            finished = attained == 1
+        else:
+            finished = speed <= self.stopped_speed_hz
+        if finished and np.isnan(summary['time_to_speed_s']):
+            summary['time_to_speed_s'] = rel_t
+            self._done.set()
+
+    def _save(self):
+        if self.buffer is None or len(self.buffer) == 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self.summary['started']).strftime("%Y-%m-%d_%H-%M-%S")
+        filename = os.path.join(self.directory, f"{self.summary['kind']}_{stamp}.npz")
+        number = 1
+        while os.path.exists(filename):  # Several events within one second
+            number += 1
+            filename = os.path.join(self.directory, f"{self.summary['kind']}_{stamp}_{number}.npz")
+        meta = {key: value for key, value in self.summary.items() if isinstance(value, (int, float, str))}
+        np.savez_compressed(filename, **self.buffer.arrays(), **{f'meta_{key}': value for key, value in meta.items()})
+        self.summary['file'] = filename
+        logging.info(f'TC110 profiler: saved {filename}')
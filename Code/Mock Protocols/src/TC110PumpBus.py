@@ -0,0 +1,110 @@
+# TC110 Pump Bus
+# Polls several TC110 pumps that share one RS-485 adapter (one VISA resource, one device_id per pump).
+# RS-485 is half-duplex, so only one telegram can be on the line at a time. The bus keeps the line busy by
+# sending pre-built telegrams back-to-back in round-robin order, and stops spending timeouts on pumps that
+# do not answer, so the cycle time is set by the bus bandwidth and not by Python overhead or dead pumps.
+
+import time
+import logging
+import numpy as np
+
+import RealPfeifferTC110 as rpt
+
+# Columns of the snapshot array
+SNAPSHOT_KEYS = ('ActualSpd', 'DrvCurrent', 'TempMotor')
+
+
+class PumpBus:
+    """
+    N TC110 pumps on one resource.
+
+    bus = PumpBus([1, 2, 3], port='ASRL/dev/ttyUSB0::INSTR')
+    t, values = bus.snapshot()   # values[i] = [speed (Hz), current (A), motor temperature (°C)] of pump i
+    """
+
+    def __init__(self, device_ids, port=None, pump=None, keys=SNAPSHOT_KEYS, max_misses=3, retry_s=10.0,
+                 latency_smoothing=0.2):
+        if len(device_ids) == 0:
+            raise ValueError('At least one device ID is needed.')
+        self.device_ids = [int(rpt.TC110._format_id(device_id)) for device_id in device_ids]
+        # One TC110 object owns the resource; every pump is addressed through its device_id
+        self.pump = pump if pump is not None else rpt.TC110(device_id=self.device_ids[0], port=port)
+        self.keys = tuple(keys)
+        self.max_misses = max_misses
+        self.retry_s = retry_s
+        self.latency_smoothing = latency_smoothing
+        self.lock = self.pump.lock
+        n = len(self.device_ids)
+        self.latency = np.full(n, np.nan)  # Smoothed round-trip time per pump (s)
+        self.last_latency = np.full(n, np.nan)
+        self.misses = np.zeros(n, dtype=int)  # Consecutive unanswered telegrams per pump
+        self._offline_until = np.zeros(n)
+        self.cycle_time = np.nan
+        # Telegrams never change, so build (and checksum) them once
+        self._frames = [[self.pump.build_message(self.pump.commands[key], device_id=device_id)
+                         for key in self.keys] for device_id in self.device_ids]
+
+    def __len__(self):
+        return len(self.device_ids)
+
+    @property
+    def online(self):
+        return self._offline_until <= time.monotonic()
+
+    def _query(self, index, column):
+        """Sends one pre-built telegram and returns the decoded value, or None."""
+        frame = self._frames[index][column]
+        start = time.perf_counter()
+        try:
+            self.pump.inst.write(frame)
+            message = self.pump.receive_message()
+        except Exception as e:
+            logging.warning(f'Pump {self.device_ids[index]}: no reply to {self.keys[column]} ({e}).')
+            message = None
+        elapsed = time.perf_counter() - start
+        if message is None or int(message['device_id']) != self.device_ids[index]:
+            self.misses[index] += 1
+            if self.misses[index] >= self.max_misses:
+                self._offline_until[index] = time.monotonic() + self.retry_s
+                logging.warning(f'Pump {self.device_ids[index]} marked offline for {self.retry_s} s.')
+            return None
+        self.misses[index] = 0
+        self.last_latency[index] = elapsed
+        if np.isnan(self.latency[index]):
+            self.latency[index] = elapsed
+        else:
+            self.latency[index] += self.latency_smoothing * (elapsed - self.latency[index])
+        try:
+            return self.pump.cast(message['payload'], self.pump.commands[self.keys[column]])
+        except ValueError:
+            logging.warning(f'Pump {self.device_ids[index]}: invalid {self.keys[column]} payload {message["payload"]!r}.')
+            return None
+
+    def snapshot(self):
+        """
+        Reads every key from every online pump.
+
+        :returns: (timestamp, array of shape (n_pumps, n_keys)); unanswered values are NaN
+        """
+        values = np.full((len(self.device_ids), len(self.keys)), np.nan)
+        start = time.perf_counter()
+        with self.lock:
+            # Parameter-major round robin: one telegram per pump in turn, so the pumps are sampled close together
+            for column in range(len(self.keys)):
+                for index in range(len(self.device_ids)):
+                    if self._offline_until[index] > time.monotonic():
+                        continue
+                    value = self._query(index, column)
+                    if value is not None:
+                        values[index, column] = value
+        self.cycle_time = time.perf_counter() - start
+        return time.time(), values
+
+    def status(self):
+        """Per-pump latency and link state."""
+        online = self.online
+        return [{'device_id': device_id, 'online': bool(online[i]), 'latency_s': float(self.latency[i]),
+                 'misses': int(self.misses[i])} for i, device_id in enumerate(self.device_ids)]
+
+    def close(self):
+        self.pump.close()
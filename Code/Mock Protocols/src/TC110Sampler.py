@@ -0,0 +1,167 @@
+# TC110 Sampler
+# Background thread that reads TC110 parameters at a fixed rate into a preallocated ring buffer.
+# Deadlines are absolute (start + k * period), so the time spent talking to the pump does not make the
+# sampling drift, and the lateness of every sample is tracked so the achieved jitter can be reported.
+
+import time
+import logging
+from threading import Thread, Event, RLock
+
+import numpy as np
+
+from RingBuffer import RingBuffer
+
+DEFAULT_KEYS = ('ActualSpd', 'DrvCurrent')
+
+
+class TC110Sampler:
+    """
+    sampler = TC110Sampler(pump, keys=('ActualSpd', 'DrvCurrent'), rate_hz=20)
+    sampler.subscribe(lambda t, values: print(t, values))
+    stats = sampler.run_for(30, start_pump=True)   # Always stops the sampler (and the pump) on exit
+    t, values = sampler.buffer.arrays()
+    """
+
+    def __init__(self, pump, keys=DEFAULT_KEYS, rate_hz=10.0, capacity=36000, device_id=None, yield_s=0.005):
+        # rate_hz=None samples back-to-back, as fast as the bus allows. The pump lock is not fair, so a loop that
+        # takes it again right after releasing it would starve every other user of the pump (write layer, GUI
+        # polls); back-to-back sampling therefore leaves the lock free for yield_s between samples.
+        if rate_hz is not None and rate_hz <= 0:
+            raise ValueError(f'Sampling rate should be positive. {rate_hz} was given.')
+        self.pump = pump
+        self.keys = tuple(keys)
+        self.rate_hz = rate_hz
+        self.device_id = device_id
+        self.yield_s = yield_s
+        self.buffer = RingBuffer(capacity, n_columns=len(self.keys))
+        self._subscribers = []
+        self._thread = None
+        self._stop = Event()
+        self._lock = getattr(pump, 'lock', None) or RLock()
+        self._reset_stats()
+
+    @property
+    def period(self):
+        return 1.0 / self.rate_hz if self.rate_hz else 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, callback):
+        """callback(t, values) is called from the sampler thread after every sample."""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def _reset_stats(self):
+        self.samples = 0
+        self.overruns = 0  # Deadlines skipped because a reading took longer than one period
+        self._lateness_mean = 0.0
+        self._lateness_m2 = 0.0
+        self._lateness_max = 0.0
+        self._started_at = None
+        self._stopped_at = None
+
+    def _record_lateness(self, lateness):
+        # Welford's running mean/variance
+        self.samples += 1
+        delta = lateness - self._lateness_mean
+        self._lateness_mean += delta / self.samples
+        self._lateness_m2 += delta * (lateness - self._lateness_mean)
+        self._lateness_max = max(self._lateness_max, lateness)
+
+    def stats(self):
+        """Achieved rate and jitter (lateness of each sample relative to its deadline, in seconds)."""
+        if self._started_at is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._stopped_at or time.monotonic()) - self._started_at
+        std = np.sqrt(self._lateness_m2 / (self.samples - 1)) if self.samples > 1 else 0.0
+        return {'samples': self.samples,
+                'rate_hz': self.samples / elapsed if elapsed > 0 else 0.0,
+                'jitter_mean_s': self._lateness_mean,
+                'jitter_std_s': float(std),
+                'jitter_max_s': self._lateness_max,
+                'overruns': self.overruns}
+
+    def read(self):
+        """One sample: the value of every key (NaN if the pump did not answer)."""
+        values = np.full(len(self.keys), np.nan)
+        with self._lock:
+            for i, key in enumerate(self.keys):
+                value = self.pump.get_fromkey(key, device_id=self.device_id)
+                if value is not None:
+                    values[i] = float(value)
+        return values
+
+    def _run(self):
+        period = self.period
+        start = time.monotonic()
+        self._started_at = start
+        k = 0
+        while not self._stop.is_set():
+            deadline = start + k * period if period else time.monotonic()
+            now = time.monotonic()
+            if deadline > now and self._stop.wait(deadline - now):
+                break
+            lateness = time.monotonic() - deadline
+            t = time.time()
+            try:
+                values = self.read()
+            except Exception as e:
+                logging.warning(f'TC110 sampler: reading failed ({e}).')
+                values = np.full(len(self.keys), np.nan)
+            self.buffer.append(t, values)
+            self._record_lateness(lateness)
+            for callback in list(self._subscribers):
+                try:
+                    callback(t, values)
+                except Exception as e:
+                    logging.warning(f'TC110 sampler: subscriber {callback!r} failed ({e}).')
+            # Skip the deadlines that have already passed instead of firing a burst of late samples
+            k += 1
+            if not period:
+                self._stop.wait(self.yield_s)
+                continue
+            behind = int((time.monotonic() - start) / period) - k
+            if behind > 0:
+                self.overruns += behind
+                k += behind
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._reset_stats()
+        self._thread = Thread(target=self._run, name='TC110Sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            self._stopped_at = time.monotonic()
+
+    def run_for(self, seconds, start_pump=False):
+        """Samples for `seconds` (optionally running the pump meanwhile) and returns stats(). Always stops on exit."""
+        try:
+            if start_pump:
+                self.pump.start(device_id=self.device_id)
+            self.start()
+            self._stop.wait(seconds)
+        finally:
+            self.stop()
+            if start_pump:
+                self.pump.stop(device_id=self.device_id)
+        return self.stats()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
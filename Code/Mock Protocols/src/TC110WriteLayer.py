@@ -0,0 +1,155 @@
+# TC110 Write Layer
+# Control commands (start/stop/toggle, set values) for a TC110 that use as little bus time as possible.
+# The layer remembers the last state the pump confirmed for every RW parameter and drops writes that would not
+# change anything. Writes to the same parameter that arrive within a short window are coalesced so only the last
+# one is sent, and a background thread sends them and checks the acknowledgements. The caller never waits on
+# the bus, and each write holds the pump lock for a single telegram, so telemetry polling keeps running in between.
+
+import time
+import logging
+from threading import Thread, Condition
+
+
+class WriteLayer:
+    """
+    writes = WriteLayer(pump)
+    writes.start_pump()            # Returns at once; dropped if the pump is already known to be running
+    writes.stop_pump()             # Never dropped: an interlock stop always goes to the pump
+    writes.write('SpdSVal', 75)
+    writes.flush()                 # Optional: wait until every pending write has been acknowledged
+    """
+
+    def __init__(self, pump, device_id=None, coalesce_s=0.05, max_age_s=30.0, on_failure=None):
+        self.pump = pump
+        self.device_id = device_id
+        self.coalesce_s = coalesce_s
+        self.max_age_s = max_age_s  # Confirmed states older than this are no longer trusted (e.g. front panel changes)
+        self.on_failure = on_failure
+        self.confirmed = {}  # command key -> (payload, time confirmed)
+        self.counters = {'sent': 0, 'dropped': 0, 'coalesced': 0, 'failed': 0}
+        self._pending = {}  # command key -> (payload, time first queued)
+        self._in_flight = 0
+        self._cond = Condition()
+        self._closed = False
+        self._thread = Thread(target=self._run, name='TC110WriteLayer', daemon=True)
+        self._thread.start()
+
+    def _known(self, key):
+        entry = self.confirmed.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.max_age_s:
+            return None
+        return entry[0]
+
+    def write(self, command_key, value, force=False):
+        """
+        Queues a write. Returns False if it was dropped because the pump is already in that state.
+        force=True always sends it, whatever the confirmed state says.
+        """
+        command = self.pump.commands[command_key]
+        if 'W' not in command['access']:
+            raise ValueError(f'{command_key} is read-only.')
+        payload = self.pump.format_payload(value, command)
+        with self._cond:
+            if command_key in self._pending:
+                # A newer value replaces the one still waiting to be sent
+                self.counters['coalesced'] += 1
+                self._pending[command_key] = (payload, self._pending[command_key][1])
+            elif not force and self._known(command_key) == payload:
+                self.counters['dropped'] += 1
+                return False
+            else:
+                self._pending[command_key] = (payload, time.monotonic())
+            self._cond.notify()
+        return True
+
+    def state(self, command_key, refresh=False):
+        """Last confirmed value of a parameter, read from the pump if unknown (or if refresh=True)."""
+        command = self.pump.commands[command_key]
+        with self._cond:
+            if command_key in self._pending:
+                return self.pump.cast(self._pending[command_key][0], command)
+        payload = None if refresh else self._known(command_key)
+        if payload is None:
+            with self.pump.lock:
+                self.pump.send_message(command=command, device_id=self.device_id)
+                message = self.pump.receive_message()
+            if not message:
+                return None
+            payload = message['payload']
+            self.confirmed[command_key] = (payload, time.monotonic())
+        return self.pump.cast(payload, command)
+
+    def start_pump(self):
+        return self.write('PumpgStatn', True)
+
+    def stop_pump(self):
+        # The confirmed state can be up to max_age_s old (front panel, remote stop, ...): a stop is never skipped
+        return self.write('PumpgStatn', False, force=True)
+
+    def toggle_pump(self):
+        running = self.state('PumpgStatn')
+        if running is None:
+            logging.warning('Pump status unknown, not toggling.')
+            return False
+        return self.stop_pump() if running else self.start_pump()
+
+    def flush(self, timeout=None):
+        """Waits until every queued write has been sent and acknowledged. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self):
+        self.flush(timeout=2.0)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(2.0)
+
+    def _next_due(self):
+        # Oldest pending write whose coalescing window has passed, and how long to wait otherwise
+        now = time.monotonic()
+        key, (payload, queued) = min(self._pending.items(), key=lambda item: item[1][1])
+        wait = queued + self.coalesce_s - now
+        return key, payload, wait
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending:
+                        key, payload, wait = self._next_due()
+                        if wait <= 0:
+                            del self._pending[key]
+                            self._in_flight += 1
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                else:
+                    return
+            try:
+                self._send(key, payload)
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+                    self._cond.notify_all()
+
+    def _send(self, key, payload):
+        command = self.pump.commands[key]
+        message = None
+        try:
+            with self.pump.lock:
+                self.pump.send_message(command=command, device_id=self.device_id, query_only=False, payload=payload)
+                message = self.pump.receive_message()
+        except Exception as e:
+            logging.warning(f'Writing {key}={payload} failed ({e}).')
+        self.counters['sent'] += 1
+        if message and message['payload'] == payload:
+            self.confirmed[key] = (payload, time.monotonic())
+            return
+        # Not acknowledged: forget what we thought the state was so the next write goes to the bus
+        self.confirmed.pop(key, None)
+        self.counters['failed'] += 1
+        logging.warning(f'Write {key}={payload} not acknowledged (reply: {message}).')
+        if self.on_failure is not None:
+            self.on_failure(key, payload, message)
@@ -29,10 +29,14 @@ if sys.version_info < (3, 8, 0):
     )
 
 import binascii
+import contextlib
 import enum
 import os
+import queue
 import struct
+import threading
 import time
+from concurrent.futures import Future
 from typing import Any, Dict, List, Optional, Type, Union
 
 import serial
@@ -60,6 +64,10 @@ _SLAVEADDRESS_BROADCAST = 0
 # Several instrument instances can share the same serialport
 _serialports: Dict[str, serial.Serial] = {}  # Key: port name, value: port instance
 _latest_read_times: Dict[str, float] = {}  # Key: port name, value: timestamp
+_port_workers: Dict[str, "_PortWorker"] = {}  # Key: port name, value: I/O worker
+_port_workers_lock = threading.Lock()
+# Key: (port name, slave address), value: round-trip statistics. Address None pools all slaves on the port.
+_adaptive_timeouts: Dict[Any, "AdaptiveTimeout"] = {}
 
 # ############### #
 # Named constants #
@@ -194,6 +202,26 @@ class Instrument:
         New in version 0.7.
         """
 
+        self.adaptive_timeout = False
+        """If this is :const:`True`, the read timeout of each request is derived from
+        the round-trip times observed for this slave address (see
+        :class:`.AdaptiveTimeout`) instead of always waiting the full
+        ``serial.timeout``. The configured ``serial.timeout`` is the conservative
+        upper bound, used until enough round trips have been seen and after a missed
+        response. Defaults to :const:`False`.
+
+        Changing this will not affect how other instruments use the same serial port.
+        """
+
+        self.use_port_worker = True
+        """If this is :const:`True`, transactions are handed to the I/O worker thread
+        of the serial port and run in submission order. If :const:`False`, they run in
+        the calling thread. Either way only one transaction at a time uses a shared
+        port. Defaults to :const:`True`.
+
+        Changing this will not affect how other instruments use the same serial port.
+        """
+
         self.serial: Optional[serial.Serial] = None
         """The serial port object as defined by the pySerial module. Created by the
         constructor.
@@ -289,6 +317,15 @@ class Instrument:
         """
         return self._latest_roundtrip_time
 
+    @property
+    def timeout_statistics(self) -> Optional["AdaptiveTimeout"]:
+        """Round-trip statistics of this slave address, if adaptive timeouts have
+        been used for it. Read only.
+        """
+        if self.serial is None:
+            return None
+        return _adaptive_timeouts.get((self.serial.port or "", self.address))
+
     def _print_debug(self, text: str) -> None:
         if self.debug:
             print("MinimalModbus debug mode. " + text)
@@ -981,6 +1018,82 @@ class Instrument:
             payloadformat=_Payloadformat.REGISTERS,
         )
 
+    def prepare_read(
+        self,
+        registeraddress: int,
+        number_of_registers: int = 1,
+        number_of_decimals: int = 0,
+        functioncode: int = 3,
+        signed: bool = False,
+    ) -> "PreparedRead":
+        """Prepare a register read that will be executed many times.
+
+        All argument checking, the request bytes (including the CRC), the expected
+        response length and the decoder are worked out once. Executing the returned
+        :class:`.PreparedRead` goes straight to :meth:`_communicate` and a fast decode.
+
+        Args:
+            * registeraddress: The slave register start address.
+            * number_of_registers: The number of registers to read, max 125 registers.
+            * number_of_decimals: The number of decimals for content conversion,
+              applied to every register.
+            * functioncode: Modbus function code. Can be 3 or 4.
+            * signed: Whether the data should be interpreted as unsigned or signed.
+
+        Returns:
+            A :class:`.PreparedRead`. Calling it returns the same value as
+            :meth:`read_register` for one register, and a list of values otherwise.
+
+        Raises:
+            TypeError, ValueError
+
+        Changes to :attr:`address` or :attr:`mode` after preparing are not picked up;
+        prepare the read again.
+        """
+        _check_functioncode(functioncode, [3, 4])
+        _check_registeraddress(registeraddress)
+        _check_int(
+            number_of_registers,
+            minvalue=1,
+            maxvalue=_MAX_NUMBER_OF_REGISTERS_TO_READ,
+            description="number of registers",
+        )
+        _check_int(
+            number_of_decimals,
+            minvalue=0,
+            maxvalue=_MAX_NUMBER_OF_DECIMALS,
+            description="number of decimals",
+        )
+        _check_bool(signed, description="signed")
+        if self.address == _SLAVEADDRESS_BROADCAST:
+            raise ValueError("Can not read from the broadcast address.")
+        return PreparedRead(
+            self,
+            registeraddress,
+            number_of_registers,
+            number_of_decimals,
+            functioncode,
+            signed,
+        )
+
+    def submit(self, function: Any, *args: Any) -> Future:
+        """Run a call on the I/O worker of this instrument's serial port.
+
+        For example ``instrument.submit(instrument.read_register, 289, 1)``. The call
+        is queued behind the transactions already submitted for the port, by any
+        instrument, and the result is delivered through the returned future.
+
+        Args:
+            * function: Callable performing transactions on this port.
+            * args: Arguments for the callable.
+
+        Returns:
+            A :class:`concurrent.futures.Future`.
+        """
+        if self.serial is None:
+            raise ModbusException("The serial port instance is None")
+        return _get_port_worker(self.serial.port or "").submit(function, *args)
+
     # ############### #
     # Generic command #
     # ############### #
@@ -1404,19 +1517,35 @@ class Instrument:
         on Linux.
         It is about 16 ms on Windows according to
         stackoverflow.com/questions/157359/accurate-timestamping-in-python-logging
+
+        Instruments sharing a serial port never interleave their transactions: each
+        transaction holds the port lock, and with :attr:`use_port_worker` it is run by
+        the I/O worker of the port in submission order.
         """
         _check_bytes(request, minlength=1, description="request")
         _check_int(number_of_bytes_to_read)
 
+        if self.serial is None:
+            raise ModbusException("The serial port instance is None")
+
+        worker = _get_port_worker(self.serial.port or "")
+        return worker.call(
+            self._transact,
+            request,
+            number_of_bytes_to_read,
+            queued=self.use_port_worker,
+        )
+
+    def _transact(self, request: bytes, number_of_bytes_to_read: int) -> bytes:
+        """Perform one transaction. Called with the port lock held, see :meth:`_communicate`."""
+        assert self.serial is not None
+
         self._print_debug(
             "Will write to instrument (expecting {} bytes back): {}".format(
                 number_of_bytes_to_read, _describe_bytes(request)
             )
         )
 
-        if self.serial is None:
-            raise ModbusException("The serial port instance is None")
-
         if not self.serial.is_open:
             self._print_debug("Opening port {}".format(self.serial.port))
             self.serial.open()
@@ -1487,7 +1616,22 @@ class Instrument:
                 raise LocalEchoError(text)
 
         # Read response
-        if number_of_bytes_to_read > 0:
+        statistics = None
+        if number_of_bytes_to_read > 0 and self.adaptive_timeout and self.precalculate_read_size:
+            statistics = _get_adaptive_timeout(portname, self.address)
+            port_statistics = _get_adaptive_timeout(portname, None)
+            transfer_time = number_of_bytes_to_read * _calculate_character_time(
+                self.serial
+            )
+            configured_timeout = self.serial.timeout
+            self.serial.timeout = statistics.timeout(
+                configured_timeout, transfer_time, fallback=port_statistics
+            )
+            try:
+                answer = self.serial.read(number_of_bytes_to_read)
+            finally:
+                self.serial.timeout = configured_timeout
+        elif number_of_bytes_to_read > 0:
             answer = self.serial.read(number_of_bytes_to_read)
         else:
             answer = b""
@@ -1498,6 +1642,13 @@ class Instrument:
         roundtrip_time = read_time - write_time
         self._latest_roundtrip_time = roundtrip_time
 
+        if statistics is not None:
+            if len(answer) == number_of_bytes_to_read:
+                statistics.record(roundtrip_time - transfer_time)
+                port_statistics.record(roundtrip_time - transfer_time)
+            else:
+                statistics.record_miss()
+
         if self.close_port_after_each_call:
             self._print_debug("Closing port {}".format(portname))
             self.serial.close()
@@ -1529,6 +1680,289 @@ class Instrument:
         return answer
 
 
+class _PortWorker:
+    """Lock-protected I/O worker of one (shared) serial port.
+
+    Calls submitted from any thread are run one at a time on the worker thread, in
+    submission order, with the port lock held. Calls made by the thread that already
+    holds the lock (the worker itself, or a thread inside :meth:`hold`) run directly.
+    """
+
+    def __init__(self, portname: str) -> None:
+        self.portname = portname
+        self.lock = threading.RLock()
+        self._owner: Optional[int] = None
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def hold(self) -> Any:
+        """Hold the port lock, so that transactions in this thread run directly."""
+        with self.lock:
+            previous_owner = self._owner
+            self._owner = threading.get_ident()
+            try:
+                yield self
+            finally:
+                self._owner = previous_owner
+
+    def submit(self, function: Any, *args: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((future, function, args))
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="minimalmodbus-{}".format(self.portname),
+                    daemon=True,
+                )
+                self._thread.start()
+        return future
+
+    def call(self, function: Any, *args: Any, queued: bool = True) -> Any:
+        if not queued or self._owner == threading.get_ident():
+            with self.hold():
+                return function(*args)
+        return self.submit(function, *args).result()
+
+    def _run(self) -> None:
+        while True:
+            future, function, args = self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.hold():
+                try:
+                    result = function(*args)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+
+
+def _get_port_worker(portname: str) -> _PortWorker:
+    """Get the I/O worker of a serial port, creating it if necessary."""
+    worker = _port_workers.get(portname)
+    if worker is None:
+        with _port_workers_lock:
+            worker = _port_workers.setdefault(portname, _PortWorker(portname))
+    return worker
+
+
+class AdaptiveTimeout:
+    """Read timeout of one slave, adapted to its observed round-trip times.
+
+    Keeps a streaming estimate (exponentially weighted once warmed up) of the mean
+    and variance of the slave's latency, that is the round-trip time minus the time
+    the response takes on the line. The timeout for a request is the latency
+    estimate plus *sigmas* standard deviations plus the transfer time of the
+    expected response, bounded below by *minimum* and above by the conservative
+    (configured) timeout.
+
+    After a missed response the conservative timeout is used, so a slave that is
+    merely slow gets the full time to answer. After *miss_limit* consecutive misses
+    the slave is considered offline, and the short estimate is used again so that an
+    absent slave costs little bus time. Until the slave has answered *warmup* times
+    the estimate pooled over all slaves on the port is used, if available.
+
+    Args:
+        * sigmas: Number of standard deviations above the mean latency.
+        * minimum: Lowest timeout in seconds.
+        * warmup: Number of round trips before the own estimate is used.
+        * miss_limit: Consecutive misses after which the slave counts as offline.
+        * smoothing: Weight of a new round trip once warmed up.
+    """
+
+    def __init__(
+        self,
+        sigmas: float = 4.0,
+        minimum: float = 0.005,
+        warmup: int = 5,
+        miss_limit: int = 3,
+        smoothing: float = 0.05,
+    ) -> None:
+        self.sigmas = sigmas
+        self.minimum = minimum
+        self.warmup = warmup
+        self.miss_limit = miss_limit
+        self.smoothing = smoothing
+        self.count = 0
+        self.misses = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def __repr__(self) -> str:
+        return "{}<count={}, misses={}, mean={:.2f} ms, std={:.2f} ms>".format(
+            self.__class__.__name__,
+            self.count,
+            self.misses,
+            self.mean * _SECONDS_TO_MILLISECONDS,
+            self.variance**0.5 * _SECONDS_TO_MILLISECONDS,
+        )
+
+    @property
+    def offline(self) -> bool:
+        """Whether the slave has missed at least *miss_limit* responses in a row."""
+        return self.misses >= self.miss_limit
+
+    def record(self, latency: float) -> None:
+        """Record the latency (in seconds) of a complete response."""
+        self.count += 1
+        self.misses = 0
+        alpha = max(1.0 / self.count, self.smoothing)
+        delta = latency - self.mean
+        self.mean += alpha * delta
+        self.variance = (1 - alpha) * (self.variance + alpha * delta * delta)
+
+    def record_miss(self) -> None:
+        """Record a missing or incomplete response."""
+        self.misses += 1
+
+    def estimate(self, transfer_time: float = 0.0) -> Optional[float]:
+        """Timeout from the latency statistics, or None if not warmed up."""
+        if self.count < self.warmup:
+            return None
+        return max(
+            self.mean + self.sigmas * self.variance**0.5 + transfer_time, self.minimum
+        )
+
+    def timeout(
+        self,
+        conservative: Optional[float],
+        transfer_time: float = 0.0,
+        fallback: Optional["AdaptiveTimeout"] = None,
+    ) -> Optional[float]:
+        """Read timeout for the next request.
+
+        Args:
+            * conservative: The configured timeout (upper bound).
+            * transfer_time: Time the expected response takes on the line.
+            * fallback: Statistics to use until this slave is warmed up.
+
+        Returns:
+            The timeout in seconds.
+        """
+        if 0 < self.misses < self.miss_limit:
+            return conservative
+        estimate = self.estimate(transfer_time)
+        if estimate is None and fallback is not None:
+            estimate = fallback.estimate(transfer_time)
+        if estimate is None:
+            return conservative
+        if conservative is None:
+            return estimate
+        return min(estimate, conservative)
+
+
+def _get_adaptive_timeout(portname: str, address: Optional[int]) -> AdaptiveTimeout:
+    """Get the round-trip statistics of a slave (or of the whole port if None)."""
+    key = (portname, address)
+    statistics = _adaptive_timeouts.get(key)
+    if statistics is None:
+        statistics = _adaptive_timeouts.setdefault(key, AdaptiveTimeout())
+    return statistics
+
+
+class PreparedRead:
+    """A register read with the request and decoder precomputed.
+
+    Created by :meth:`Instrument.prepare_read`. Call it (or :meth:`execute`) to
+    perform the read.
+
+    The response is still checked for length, CRC/LRC, slave address, function
+    code and byte count, and slave error responses raise the same exceptions as
+    :meth:`Instrument.read_register`.
+    """
+
+    def __init__(
+        self,
+        instrument: Instrument,
+        registeraddress: int,
+        number_of_registers: int,
+        number_of_decimals: int,
+        functioncode: int,
+        signed: bool,
+    ) -> None:
+        self.instrument = instrument
+        self.registeraddress = registeraddress
+        self.number_of_registers = number_of_registers
+        self.number_of_decimals = number_of_decimals
+        self.functioncode = functioncode
+        self.signed = signed
+
+        payload = _num_to_two_bytes(registeraddress) + _num_to_two_bytes(
+            number_of_registers
+        )
+        self.request = _embed_payload(
+            instrument.address, instrument.mode, functioncode, payload
+        )
+        self.response_size = _predict_response_size(
+            instrument.mode, functioncode, payload
+        )
+        self._header = bytes(
+            [
+                instrument.address,
+                functioncode,
+                number_of_registers * _NUMBER_OF_BYTES_PER_REGISTER,
+            ]
+        )
+        self._format = ">{}{}".format(number_of_registers, "h" if signed else "H")
+        self._divisor = 10**number_of_decimals
+
+    def __repr__(self) -> str:
+        return "{}<address={}, registeraddress={}, number_of_registers={}>".format(
+            self.__class__.__name__,
+            self.instrument.address,
+            self.registeraddress,
+            self.number_of_registers,
+        )
+
+    def __call__(self) -> Union[int, float, List[Union[int, float]]]:
+        return self.execute()
+
+    def execute(self) -> Union[int, float, List[Union[int, float]]]:
+        """Perform the read and return the decoded value(s).
+
+        Raises:
+            ModbusException, serial.SerialException (inherited from IOError)
+        """
+        response = self.instrument._communicate(self.request, self.response_size)
+        return self.decode(response)
+
+    def decode(self, response: bytes) -> Union[int, float, List[Union[int, float]]]:
+        """Decode a raw response to this request."""
+        if self.instrument.mode == MODE_RTU:
+            if (
+                len(response) != self.response_size
+                or response[:3] != self._header
+                or _calculate_crc(response[:-2]) != response[-2:]
+            ):
+                # Slow path for error reporting: gives the same exceptions as read_register
+                _extract_payload(
+                    response, self.instrument.address, MODE_RTU, self.functioncode
+                )
+                _check_response_bytecount(response[2:-2])
+                raise InvalidResponseError(
+                    "Wrong response length {} instead of {}. The response is: {!r}".format(
+                        len(response), self.response_size, response
+                    )
+                )
+            registerdata = response[3:-2]
+        else:
+            payload = _extract_payload(
+                response, self.instrument.address, self.instrument.mode, self.functioncode
+            )
+            _check_response_bytecount(payload)
+            registerdata = payload[_NUMBER_OF_BYTES_BEFORE_REGISTERDATA:]
+
+        values = struct.unpack(self._format, registerdata)
+        if self._divisor != 1:
+            values = tuple(value / self._divisor for value in values)
+        if self.number_of_registers == 1:
+            return values[0]
+        return list(values)
+
+
 # ########## #
 # Exceptions #
 # ########## #
@@ -2021,6 +2455,20 @@ def _predict_response_size(
     )
 
 
+def _calculate_character_time(serialport: serial.Serial) -> float:
+    """Calculate the time one character takes on the line.
+
+    Args:
+        serialport: The serial port, for baudrate, bytesize, parity and stopbits.
+
+    Returns:
+        The number of seconds per character (start bit, data bits, parity and stop bits).
+    """
+    parity_bits = 0 if serialport.parity == serial.PARITY_NONE else 1
+    bits = 1 + serialport.bytesize + parity_bits + serialport.stopbits
+    return bits / float(serialport.baudrate)
+
+
 def _calculate_minimum_silent_period(baudrate: Union[int, float]) -> float:
     """Calculate the silent period length between messages.
 
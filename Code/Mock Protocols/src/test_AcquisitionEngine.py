@@ -0,0 +1,134 @@
+import time
+import threading
+
+import pytest
+
+from AcquisitionEngine import AcquisitionEngine
+
+
+class FakeDriver:
+    """Takes read_s per read and records how many reads of its link overlap."""
+
+    def __init__(self, read_s=0.0, link_state=None, fail=False):
+        self.read_s = read_s
+        self.link_state = link_state if link_state is not None else {'active': 0, 'max_active': 0}
+        self.fail = fail
+        self.opened = self.closed = False
+        self.lock = threading.Lock()
+
+    def open(self):
+        self.opened = True
+
+    def close(self):
+        self.closed = True
+
+    def read_device_value(self):
+        state = self.link_state
+        with self.lock:
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+        time.sleep(self.read_s)
+        with self.lock:
+            state['active'] -= 1
+        if self.fail:
+            raise RuntimeError('no answer')
+        return 1.0
+
+
+def run(engine, seconds):
+    engine.start()
+    time.sleep(seconds)
+    engine.stop()
+    return engine.stats()
+
+
+class TestAcquisitionEngine:
+    def test_rates_follow_intervals(self):
+        readings = []
+        engine = AcquisitionEngine(on_reading=lambda name, t, value: readings.append(name))
+        fast, slow = FakeDriver(), FakeDriver()
+        engine.add_channel('fast', fast, 0.01)
+        engine.add_channel('slow', slow, 0.05)
+        stats = run(engine, 0.5)
+        assert stats['fast']['rate_hz'] == pytest.approx(100, rel=0.15)
+        assert stats['slow']['rate_hz'] == pytest.approx(20, rel=0.15)
+        assert stats['fast']['jitter_s'] < 0.005
+        assert readings.count('slow') == stats['slow']['reads']
+        assert fast.opened and fast.closed and stats['fast']['status'] == 'disconnected'
+
+    def test_channels_on_one_link_take_turns(self):
+        bus = {'active': 0, 'max_active': 0}
+        engine = AcquisitionEngine()
+        for i in range(3):
+            engine.add_channel(f'gauge{i}', FakeDriver(0.01, bus), 0.02, link='/dev/ttyUSB0')
+        run(engine, 0.3)
+        assert bus['max_active'] == 1
+
+    def test_links_run_side_by_side(self):
+        shared = {'active': 0, 'max_active': 0}
+        engine = AcquisitionEngine()
+        for i in range(3):
+            engine.add_channel(f'furnace{i}', FakeDriver(0.05, shared), 0.1, link=f'10.0.0.{i}')
+        stats = run(engine, 0.35)
+        assert shared['max_active'] == 3
+        assert all(channel['overruns'] == 0 for channel in stats.values())
+
+    def test_overrun_and_errors(self):
+        errors, statuses = [], []
+        engine = AcquisitionEngine(on_error=errors.append, on_status=lambda name, status: statuses.append(status))
+        engine.add_channel('slow', FakeDriver(0.05), 0.01)
+        engine.add_channel('dead', FakeDriver(fail=True), 0.05)
+        stats = run(engine, 0.3)
+        assert stats['slow']['overruns'] > 10
+        assert stats['slow']['rate_hz'] == pytest.approx(20, rel=0.2)  # Limited by the read time
+        assert stats['dead']['errors'] == len(errors) > 0
+        assert 'error' in statuses
+
+    def test_history_batches(self):
+        engine = AcquisitionEngine(history=100)
+        engine.add_channel('gauge', FakeDriver(), 0.01)
+        buffer = engine.channels['gauge'].buffer
+        engine.start()
+        time.sleep(0.1)
+        t, values, cursor = buffer.since(0)
+        time.sleep(0.1)
+        engine.stop()
+        t2, values2, cursor2 = buffer.since(cursor)
+        assert len(t) > 5 and len(t2) > 5  # Each batch holds every reading since the previous one
+        assert cursor2 == engine.channels['gauge'].reads
+        assert t2[0] > t[-1] and (values2 == 1.0).all()
+
+    def test_reading_has_one_timestamp(self):
+        readings = []
+        engine = AcquisitionEngine(history=100, on_reading=lambda name, t, value: readings.append(t))
+        engine.add_channel('gauge', FakeDriver(), 0.01)
+        run(engine, 0.1)
+        t, _, _ = engine.channels['gauge'].buffer.since(0)
+        assert len(readings) > 5 and readings == t.tolist()
+
+    def test_no_restart_while_a_read_hangs(self):
+        release = threading.Event()
+
+        class HangingDriver:
+            def read_device_value(self):
+                release.wait()
+                return 1.0
+
+        engine = AcquisitionEngine()
+        engine.add_channel('gauge', HangingDriver(), 0.01, link='COM1')
+        engine.start()
+        time.sleep(0.05)
+        engine.stop(timeout=0.05)  # The read is still in progress
+        with pytest.raises(RuntimeError):
+            engine.start()
+        assert not engine.running
+        release.set()
+        engine._links['COM1'].thread.join(1.0)
+        engine.start()  # The link is free again
+        engine.stop()
+
+    def test_duplicate_channel(self):
+        engine = AcquisitionEngine()
+        engine.add_channel('a', FakeDriver(), 0.1)
+        with pytest.raises(ValueError):
+            engine.add_channel('a', FakeDriver(), 0.1)
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave
+
+
+def timed_read(instrument):
+    start = time.monotonic()
+    try:
+        instrument.read_register(289, 1)
+    except minimalmodbus.NoResponseError:
+        pass
+    return time.monotonic() - start
+
+
+class TestAdaptiveTimeout:
+    def test_estimate(self):
+        statistics = minimalmodbus.AdaptiveTimeout(sigmas=2.0, minimum=0.001, warmup=3)
+        for latency in (0.010, 0.012, 0.014):
+            assert statistics.timeout(1.0) == 1.0  # Not warmed up yet
+            statistics.record(latency)
+        assert statistics.mean == pytest.approx(0.012)
+        assert statistics.timeout(1.0, transfer_time=0.002) == pytest.approx(0.014 + 2 * (8e-6 / 3) ** 0.5)
+        assert statistics.timeout(0.005) == 0.005  # Never above the configured timeout
+
+    def test_misses(self):
+        statistics = minimalmodbus.AdaptiveTimeout(warmup=1, miss_limit=2)
+        statistics.record(0.01)
+        statistics.record_miss()
+        assert statistics.timeout(1.0) == 1.0  # Maybe just slow: full time
+        statistics.record_miss()
+        assert statistics.offline
+        assert statistics.timeout(1.0) < 0.1  # Offline: costs little
+        statistics.record(0.01)
+        assert not statistics.offline
+
+    def test_absent_slave_costs_little(self):
+        with MockModbusSlave() as slave:
+            live = minimalmodbus.Instrument(slave.port, 1)
+            absent = minimalmodbus.Instrument(slave.port, 7)
+            live.serial.timeout = 0.3
+            for instrument in (live, absent):
+                instrument.adaptive_timeout = True
+            for _ in range(5):
+                live.read_register(289, 1)
+            assert live.timeout_statistics.count == 5
+            # Pooled statistics of the port give an unknown address a short timeout
+            assert timed_read(absent) < 0.1
+            assert timed_read(absent) >= 0.3  # After a miss: the configured timeout
+            timed_read(absent)
+            assert absent.timeout_statistics.offline
+            assert timed_read(absent) < 0.1
+            assert live.serial.timeout == 0.3
+            live.serial.close()
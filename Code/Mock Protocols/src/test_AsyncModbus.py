@@ -0,0 +1,64 @@
+import time
+import asyncio
+
+import pytest
+
+import minimalmodbus
+from AsyncModbus import AsyncInstrument, close_ports
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+
+
+@pytest.fixture
+def slaves():
+    registers = {address: {**EUROTHERM_REGISTERS, 289: 250 + address} for address in (1, 2)}
+    with MockModbusSlave(slaves=registers) as slave:
+        yield slave
+        close_ports()
+
+
+class TestAsyncInstrument:
+    def test_same_results_as_instrument(self, slaves):
+        async def main():
+            instrument = AsyncInstrument(slaves.port, 1)
+            return await instrument.read_register(289, 1), await instrument.read_registers(289, 1)
+
+        assert asyncio.run(main()) == (25.1, [251])
+        with pytest.raises(minimalmodbus.IllegalRequestError):
+            asyncio.run(AsyncInstrument(slaves.port, 1).read_register(9999))
+
+    def test_write(self, slaves):
+        async def main():
+            instrument = AsyncInstrument(slaves.port, 2)
+            await instrument.write_register(35, 2.5, 1)
+            await instrument.write_registers(2, [310])
+            return await instrument.read_register(35, 1)
+
+        assert asyncio.run(main()) == 2.5
+        assert slaves.writes == [(2, 35, 25), (2, 2, 310)]
+
+    def test_no_answer(self, slaves):
+        with pytest.raises(minimalmodbus.NoResponseError):
+            asyncio.run(AsyncInstrument(slaves.port, 9, timeout=0.02).read_register(289, 1))
+
+    def test_gather_on_one_port(self, slaves):
+        async def main():
+            instruments = [AsyncInstrument(slaves.port, address) for address in (1, 2)]
+            return await asyncio.gather(*[instrument.read_register(289, 1)
+                                          for instrument in instruments for _ in range(5)])
+
+        assert asyncio.run(main()) == [25.1] * 5 + [25.2] * 5
+
+    def test_ports_run_concurrently(self):
+        # Two ports whose slaves each take 50 ms to answer: together about 50 ms, not 100 ms
+        with MockModbusSlave(response_delay_s=0.05) as first, MockModbusSlave(response_delay_s=0.05) as second:
+            async def main():
+                instruments = [AsyncInstrument(first.port, 1, timeout=0.2), AsyncInstrument(second.port, 1, timeout=0.2)]
+                await asyncio.gather(*[instrument.read_register(289, 1) for instrument in instruments])
+                start = time.monotonic()
+                values = await asyncio.gather(*[instrument.read_register(289, 1) for instrument in instruments])
+                return values, time.monotonic() - start
+
+            values, elapsed = asyncio.run(main())
+            close_ports()
+        assert values == [25.0, 25.0]
+        assert elapsed < 0.09
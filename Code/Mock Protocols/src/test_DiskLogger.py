@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+import DiskLogger as dl
+from DiskLogger import DiskLogger, read_log, OK, ERROR
+
+
+class TestDiskLogger:
+    def test_round_trip(self, tmp_path):
+        logger = DiskLogger(tmp_path, chunk_s=0.01)
+        logger.start()
+        for i in range(1000):
+            logger.log('TempWorker', 1000.0 + i, 20.0 + i / 10)
+            logger.log('PressureWorker', 1000.0 + i, 1e-6 * i)
+        logger.log_status('PressureWorker', 'error')
+        logger.close()
+        data = read_log(logger.files[0])
+        assert data['names'] == {0: 'TempWorker', 1: 'PressureWorker'}
+        temp = data['channel'] == 0
+        assert np.array_equal(data['t'][temp], 1000.0 + np.arange(1000))
+        assert np.allclose(data['value'][temp], 20.0 + np.arange(1000) / 10)
+        assert data['status'][-1] == ERROR and np.isnan(data['value'][-1])
+        assert (data['status'][:-1] == OK).all()
+        assert logger.stats()['written'] == 2001
+
+    def test_rotation_by_size(self, tmp_path):
+        logger = DiskLogger(tmp_path, max_bytes=2000, chunk_rows=50, chunk_s=0.01)
+        logger.start()
+        for i in range(500):
+            logger.log('gauge', float(i), float(i))
+        logger.close()
+        assert len(logger.files) > 1
+        parts = [read_log(path) for path in logger.files]
+        assert all(part['names'] == {0: 'gauge'} for part in parts)  # Every file stands on its own
+        assert np.array_equal(np.concatenate([part['t'] for part in parts]), np.arange(500.0))
+
+    def test_full_queue_drops_without_blocking(self, tmp_path):
+        logger = DiskLogger(tmp_path, queue_size=10)  # Not started: nothing empties the queue
+        start = time.perf_counter()
+        accepted = [logger.log('gauge', float(i), 1.0) for i in range(100)]
+        assert time.perf_counter() - start < 0.1
+        assert sum(accepted) == 10
+        assert logger.stats()['dropped'] == 90 and logger.stats()['queue_depth'] == 10
+
+    def test_drops_are_counted_from_many_threads(self, tmp_path):
+        logger = DiskLogger(tmp_path, queue_size=1)
+        threads = [threading.Thread(target=lambda: [logger.log('gauge', 1.0, 1.0) for _ in range(20000)])
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert logger.dropped == 8 * 20000 - 1
+
+    def test_close_after_writer_died(self, tmp_path):
+        logger = DiskLogger(tmp_path, queue_size=5)
+        logger._thread = threading.Thread(target=lambda: None)  # A writer that is already gone
+        logger._thread.start()
+        logger._thread.join()
+        for i in range(5):
+            logger.log('gauge', float(i), 1.0)
+        start = time.perf_counter()
+        logger.close(timeout=5.0)  # The queue is full and nothing empties it
+        assert time.perf_counter() - start < 1.0
+
+    def test_writer_survives_failed_chunks_and_syncs(self, tmp_path, monkeypatch):
+        failures = {'write': 1, 'sync': 1}
+        real_write_rows, real_fsync = DiskLogger._write_rows, os.fsync
+
+        def write_rows(self, rows):
+            if failures['write']:
+                failures['write'] -= 1
+                raise ValueError('bad chunk')
+            real_write_rows(self, rows)
+
+        def fsync(fd):
+            if failures['sync']:
+                failures['sync'] -= 1
+                raise OSError('disk gone')
+            real_fsync(fd)
+
+        monkeypatch.setattr(DiskLogger, '_write_rows', write_rows)
+        monkeypatch.setattr(dl.os, 'fsync', fsync)
+        logger = DiskLogger(tmp_path, chunk_s=0.01, fsync_s=0.0)
+        logger.start()
+        for i in range(3):
+            logger.log('gauge', float(i), 1.0)
+            time.sleep(0.1)
+        logger.close()
+        assert not failures['write'] and not failures['sync']
+        assert logger.dropped == 1 and logger.written == 2
+        values = np.concatenate([read_log(path)['t'] for path in logger.files])
+        assert 2.0 in values
+
+    def test_periodic_fsync(self, tmp_path, monkeypatch):
+        synced = []
+        real_fsync = os.fsync
+        monkeypatch.setattr(dl.os, 'fsync', lambda fd: (synced.append(fd), real_fsync(fd)))
+        logger = DiskLogger(tmp_path, chunk_s=0.01, fsync_s=0.05)
+        logger.start()
+        for i in range(30):
+            logger.log('gauge', float(i), 1.0)
+            time.sleep(0.01)
+        logger.close()
+        assert 3 <= len(synced) <= 15
+
+    def test_truncated_chunk_ignored(self, tmp_path):
+        logger = DiskLogger(tmp_path)
+        logger.start()
+        logger.log('gauge', 1.0, 2.0)
+        logger.close()
+        with open(logger.files[0], 'ab') as f:
+            f.write(b'D\xff\x00\x00\x00partial')  # A crash in the middle of a chunk
+        assert read_log(logger.files[0])['value'].tolist() == [2.0]
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from EurothermDriver import Eurotherm3500
+from EurothermPool import EurothermPool, POOL_FIELDS
+from MockModbusSlave import MockModbusSlave, MockModbusTcpServer, EUROTHERM_REGISTERS
+
+
+def furnace(pv):
+    return {**EUROTHERM_REGISTERS, 289: pv}
+
+
+@pytest.fixture
+def servers():
+    servers = [MockModbusTcpServer({1: furnace(250 + 10 * i)}, response_delay_s=0.05, undefined_value=0)
+               for i in range(3)]
+    for server in servers:
+        server.start()
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+class TestEurothermPool:
+    def test_snapshot_array(self, servers):
+        with MockModbusSlave({1: furnace(400), 2: furnace(410)}, undefined_value=0) as slave:
+            pool = EurothermPool.from_addresses(tcp=[('127.0.0.1', 1, server.tcp_port) for server in servers],
+                                                rtu=[(slave.port, 1), (slave.port, 2)])
+            with pool:
+                t, values = pool.snapshot()
+        assert values.shape == (5, len(POOL_FIELDS))
+        assert values[:, 0].tolist() == [25.0, 26.0, 27.0, 40.0, 41.0]
+        assert values[:, 1].tolist() == [30.0] * 5  # sp_loop1
+        assert values[:, 5].tolist() == [0.0] * 5   # op_loop2
+        assert t > 0
+
+    def test_cycle_time_set_by_slowest_controller(self, servers):
+        pool = EurothermPool.from_addresses(tcp=[('127.0.0.1', 1, server.tcp_port) for server in servers])
+        with pool:
+            pool.snapshot()  # Connects
+            pool.snapshot()
+            status = pool.status()
+        # Every controller takes ~50 ms; read one after the other the cycle would take ~150 ms
+        assert np.all(pool.latency > 0.045)
+        assert pool.cycle_time < 0.1
+        assert status['online'] == 3
+
+    def test_failed_controller_is_nan(self, servers):
+        dead = Eurotherm3500.tcp('127.0.0.1', port=servers[0].tcp_port, timeout=0.2)
+        servers[0].stop()
+        live = Eurotherm3500.tcp('127.0.0.1', port=servers[1].tcp_port)
+        with EurothermPool([dead, live], names=['dead', 'live']) as pool:
+            _, values = pool.snapshot()
+        assert np.all(np.isnan(values[0]))
+        assert values[1, 0] == 26.0
+        assert pool.misses.tolist() == [1, 0]
@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from EurothermDriver import Eurotherm3500
+from EurothermProgram import SetpointProgram, Segment, RUNNING, PAUSED, FINISHED, ABORTED, FAILED, DWELL
+from MockModbusSlave import MockModbusSlave
+
+
+class RampingSlave(MockModbusSlave):
+    """Moves the working setpoint (5) toward the target (2) by `step` raw counts per request."""
+
+    def __init__(self, step=1000, **kwargs):
+        super().__init__(undefined_value=0, **kwargs)
+        self.step = step
+        self.ignore_writes = False
+
+    def respond_pdu(self, address, pdu):
+        registers = self.slaves[address]
+        if self.ignore_writes and pdu[0] in (6, 16):
+            return pdu[:5]  # Acknowledges but does not store
+        response = super().respond_pdu(address, pdu)
+        delta = registers[2] - registers[5]
+        registers[5] += max(-self.step, min(self.step, delta))
+        return response
+
+
+@pytest.fixture
+def controller():
+    with RampingSlave() as slave:
+        controller = Eurotherm3500(slave.port, 1)
+        yield controller, slave
+        controller.close()
+
+
+class TestSetpointProgram:
+    def test_runs_segments(self, controller):
+        controller, slave = controller
+        program = SetpointProgram(controller, [Segment(40.0, 5.0, 0.05), Segment(20.0)], tick_s=0.01)
+        program.start()
+        program.wait(5)
+        assert program.state == FINISHED
+        assert slave.slaves[1][2] == 200
+        assert slave.slaves[1][78] == 1  # The last segment steps (rate limit off)
+        assert (1, 35, 50) in slave.writes
+        assert [event['event'] for event in program.events].count('dwell') == 2
+
+    def test_pause_holds_setpoint(self, controller):
+        controller, slave = controller
+        slave.step = 1  # 0.1 degree per request
+        program = SetpointProgram(controller, [Segment(100.0, 1.0, 0)], tick_s=0.01)
+        program.start()
+        time.sleep(0.1)
+        program.pause()
+        time.sleep(0.05)
+        held = slave.slaves[1][5]
+        assert program.state == PAUSED
+        assert slave.slaves[1][2] == held  # Target moved to the working setpoint
+        time.sleep(0.05)
+        assert slave.slaves[1][5] == held
+        program.resume()
+        time.sleep(0.05)
+        assert slave.slaves[1][2] == 1000
+        program.abort(setpoint=25.0)
+        program.wait(1)
+        assert program.state == ABORTED
+        assert slave.slaves[1][2] == 250
+
+    def test_dwell_waits(self, controller):
+        controller, slave = controller
+        program = SetpointProgram(controller, [Segment(30.0, None, 0.3)], tick_s=0.01)
+        program.start()
+        time.sleep(0.1)
+        assert program.state == RUNNING and program.phase == DWELL
+        program.wait(2)
+        assert program.state == FINISHED
+
+    def test_unverified_writes_fail(self, controller):
+        controller, slave = controller
+        slave.ignore_writes = True
+        program = SetpointProgram(controller, [Segment(80.0)], tick_s=0.01, max_write_retries=2)
+        program.start()
+        program.wait(2)
+        assert program.state == FAILED
+
+    def test_abort_after_failed_batch(self, controller):
+        controller, slave = controller
+        slave.ignore_writes = True  # Comms hiccup: the first segment batch does not verify
+        program = SetpointProgram(controller, [Segment(80.0, 5.0, 0)], tick_s=0.01, max_write_retries=5)
+        batch = program._batch
+
+        def abort_during_first_batch(writes):
+            if program.state != ABORTED:
+                # The interlock aborts while the segment writes are on the bus
+                program.abort(setpoint=25.0)
+            try:
+                return batch(writes)
+            finally:
+                slave.ignore_writes = False
+
+        program._batch = abort_during_first_batch
+        program.start()
+        program.wait(2)
+        # The failed segment writes (rate limit on) must not be merged into the abort's (rate limit off)
+        assert program.state == ABORTED
+        assert slave.slaves[1][2] == 250 and slave.slaves[1][78] == 1
+
+    def test_batches_share_bus_scheduler(self, controller):
+        controller, slave = controller
+        program = SetpointProgram(controller, [Segment(30.0)], tick_s=0.01)
+        assert program.scheduler is not None
+        program.start()
+        program.wait(2)
+        assert program.scheduler.stats()['requests'] >= 1
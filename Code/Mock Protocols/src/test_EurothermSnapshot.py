@@ -0,0 +1,219 @@
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from EurothermDriver import (Eurotherm3500, REGISTERS, RegisterCache, TTL_S, SLOW, plan_blocks, decode, decode_block,
+                             encode)
+from MockModbusSlave import MockModbusSlave, MockModbusTcpServer, EUROTHERM_REGISTERS
+
+
+@pytest.fixture
+def slave():
+    with MockModbusSlave(undefined_value=0) as slave:
+        yield slave
+
+
+def make_controller(slave):
+    return Eurotherm3500(slave.port, 1)
+
+
+class TestPlanBlocks:
+    def test_gap_threshold(self):
+        assert plan_blocks([2, 5, 35], max_gap=1) == [(2, 1), (5, 1), (35, 1)]
+        assert plan_blocks([2, 5, 35], max_gap=2) == [(2, 4), (35, 1)]
+        assert plan_blocks([35, 2, 5], max_gap=40) == [(2, 34)]
+
+    def test_block_size_limit(self):
+        assert plan_blocks([1029, 1109, 1313]) == [(1029, 81), (1313, 1)]
+
+
+class TestSnapshot:
+    def test_matches_getters(self, slave):
+        controller = make_controller(slave)
+        snap = controller.snapshot()
+        assert snap.pv_loop1 == controller.get_pv_loop1() == 25.0
+        assert snap.sp_loop1 == controller.get_sp_loop1()
+        assert snap.op_loop1 == controller.get_op_loop1()
+        assert snap.threshold_alarm1 == 100.0
+        assert snap.manual_loop1 is False
+        controller.serial.close()
+
+    def test_fewer_transactions(self, slave):
+        controller = make_controller(slave)
+        snap = controller.snapshot(['pv_loop1', 'sp_loop1', 'sptarget_loop1', 'sprate_loop1', 'op_loop1'])
+        assert snap.transactions == slave.requests == 2
+        assert snap.pv_loop2 is None
+        full = controller.snapshot()
+        assert full.transactions < len(REGISTERS) / 2
+        controller.serial.close()
+
+    def test_refused_block_falls_back(self):
+        with MockModbusSlave() as slave:  # Strict: unmapped registers can not be read
+            controller = Eurotherm3500(slave.port, 1, cache=None)
+            snap = controller.snapshot(['sptarget_loop1', 'sp_loop1'])
+            assert (snap.sptarget_loop1, snap.sp_loop1) == (30.0, 30.0)
+            assert snap.transactions == 3  # The refused block and two single reads
+            # The split plan is kept, so the refused block is not retried
+            slave.requests = 0
+            controller.snapshot(['sptarget_loop1', 'sp_loop1'])
+            assert slave.requests == 2
+            controller.serial.close()
+
+    def test_unknown_field(self, slave):
+        with pytest.raises(ValueError):
+            make_controller(slave).snapshot(['pv_loop9'])
+
+
+class TestTcpTransport:
+    def test_same_readout_as_rtu(self, slave):
+        with MockModbusTcpServer(undefined_value=0) as server:
+            controller = Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+            rtu = make_controller(slave)
+            tcp_snap, rtu_snap = controller.snapshot(), rtu.snapshot()
+            assert {**vars(tcp_snap), 'time': 0} == {**vars(rtu_snap), 'time': 0}
+            assert controller.get_pv_loop1() == 25.0
+            controller.close()
+            rtu.close()
+
+    def test_persistent_pipelined_connection(self):
+        with MockModbusTcpServer(undefined_value=0, response_delay_s=0.02) as server:
+            controller = Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+            controller.snapshot()
+            start = time.monotonic()
+            snap = controller.snapshot()
+            # Five blocks in flight at once: about one response delay, not five
+            assert time.monotonic() - start < 4 * 0.02
+            assert snap.transactions == 5
+            assert server.connections == 1
+            controller.close()
+
+    def test_refused_block_over_tcp(self):
+        with MockModbusTcpServer() as server:
+            controller = Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+            snap = controller.snapshot(['sptarget_loop1', 'sp_loop1', 'pv_loop1'])
+            assert (snap.sptarget_loop1, snap.sp_loop1, snap.pv_loop1) == (30.0, 30.0, 25.0)
+            controller.close()
+
+    def test_write_register(self):
+        with MockModbusTcpServer() as server:
+            controller = Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+            controller.write_register(35, 2.5, 1)
+            assert server.writes == [(1, 35, 25)]
+            assert controller.get_sprate_loop1() == 2.5
+            controller.close()
+
+    def test_same_write_function_code_on_both_links(self):
+        for server_class in (MockModbusSlave, MockModbusTcpServer):
+            class Recording(server_class):
+                functioncodes = []
+
+                def respond_pdu(self, address, pdu):
+                    self.functioncodes.append(pdu[0])
+                    return super().respond_pdu(address, pdu)
+
+            with Recording(undefined_value=0) as server:
+                if server_class is MockModbusTcpServer:
+                    controller = Eurotherm3500.tcp('127.0.0.1', port=server.tcp_port)
+                else:
+                    controller = Eurotherm3500(server.port, 1)
+                controller.write_register(35, 2.5, 1)
+                controller.close()
+                assert server.writes == [(1, 35, 25)] and Recording.functioncodes == [16]
+
+
+class TestRegisterCache:
+    def test_static_registers_read_once(self, slave):
+        controller = make_controller(slave)
+        assert controller.get_threshold_alarm1() == controller.get_threshold_alarm1() == 100.0
+        assert slave.requests == 1
+        controller.get_pv_loop1()
+        controller.get_pv_loop1()
+        assert slave.requests == 3  # Live: always read
+        assert controller.cache.stats()['hits'] == 1
+        controller.close()
+
+    def test_write_invalidates(self, slave):
+        controller = make_controller(slave)
+        assert controller.get_sprate_loop1() == 5.0
+        controller.write_register(35, 2.5, 1)
+        assert controller.get_sprate_loop1() == 2.5
+        controller.close()
+
+    def test_read_during_write_is_not_cached(self, slave):
+        controller = make_controller(slave)
+        assert controller.get_sprate_loop1() == 5.0
+        write = controller.transport.write_register
+
+        def write_with_concurrent_read(address, value):
+            # Another thread reads (and caches) the register while the write is on its way
+            reader = threading.Thread(target=controller.get_sprate_loop1)
+            reader.start()
+            reader.join()
+            write(address, value)
+
+        controller.transport.write_register = write_with_concurrent_read
+        controller.write_register(35, 2.5, 1)
+        assert controller.get_sprate_loop1() == 2.5
+        controller.close()
+
+    def test_read_older_than_write_is_not_cached(self):
+        now = [0.0]
+        cache = RegisterCache(clock=lambda: now[0])
+        now[0] = 1.0
+        cache.invalidate(35, written=True)
+        cache.put(35, 50, read_started=0.5)  # Sent before the write completed, answered after it
+        assert cache.get(35) is None
+        cache.put(35, 25, read_started=1.5)
+        assert cache.get(35) == 25
+
+    def test_ttl_expires(self):
+        now = [0.0]
+        cache = RegisterCache(clock=lambda: now[0])
+        cache.put(273, 1)
+        cache.put(289, 250)
+        assert cache.get(273) == 1
+        assert cache.get(289) is None  # Live registers are never cached
+        now[0] = TTL_S[SLOW] + 0.1
+        assert cache.get(273) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_snapshot_reads_only_stale_fields(self, slave):
+        controller = make_controller(slave)
+        controller.snapshot()
+        slave.requests = 0
+        snap = controller.snapshot(['pv_loop1', 'threshold_alarm1', 'sprate_loop1'])
+        assert (snap.threshold_alarm1, snap.sprate_loop1) == (100.0, 5.0)
+        assert snap.transactions == slave.requests == 1  # Only the PV block
+        controller.close()
+
+
+class TestDecode:
+    def test_scale_and_sign(self):
+        values = decode(('pv_loop1', 'op_loop1', 'sprate_loop1'), [[250, 0xFF9C, 50], [0xFFF6, 1000, 0xFFFF]])
+        assert values.tolist() == [[25.0, -10.0, 5.0], [-1.0, 100.0, 6553.5]]
+
+    def test_block(self):
+        raw = np.zeros((3, 20), dtype=np.uint16)
+        raw[:, 289 - 280] = [250, 251, 0xFFF6]
+        values = decode_block(280, raw)
+        assert list(values) == ['pv_loop1']  # The only mapped register in 280-299
+        assert values['pv_loop1'].tolist() == [25.0, 25.1, -1.0]
+        with pytest.raises(ValueError):
+            decode_block(280, raw, ['pv_loop2'])
+
+    def test_encode(self):
+        assert encode('sptarget_loop1', -12.5) == 0x10000 - 125
+        assert encode('sprate_loop1', 5.0) == 50
+        with pytest.raises(ValueError):
+            encode('sprate_loop1', -1.0)
+
+    def test_negative_temperature_round_trip(self):
+        with MockModbusSlave({1: {**EUROTHERM_REGISTERS, 289: 0xFF9C}}, undefined_value=0) as slave:
+            controller = make_controller(slave)
+            assert controller.get_pv_loop1() == -10.0
+            assert controller.snapshot(['pv_loop1']).pv_loop1 == -10.0
+            controller.set_sptarget_loop1(-5.0)
+            assert controller.get_sptarget_loop1() == -5.0
+            controller.close()
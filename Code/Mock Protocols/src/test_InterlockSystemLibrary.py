@@ -0,0 +1,10 @@
+from InterlockSystemLibrary import decode_temperature
+
+
+class TestDecodeTemperature:
+    def test_mapped_address(self):
+        assert decode_temperature(289, [250]) == (25.0, '°C')
+        assert decode_temperature(289, [0xFFF6]) == (-1.0, '°C')  # Signed, below 0 °C
+
+    def test_unmapped_address_is_read_raw(self):
+        assert decode_temperature(1, [250]) == (250.0, '')
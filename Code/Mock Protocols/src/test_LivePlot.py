@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtGui import QImage
+from PySide6.QtWidgets import QApplication
+
+from LivePlot import LivePlot, minmax_decimate
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+class TestMinmaxDecimate:
+    def test_two_points_per_column(self):
+        t = np.arange(1000.0)
+        values = np.sin(t)
+        x, y = minmax_decimate(t, values, 0.0, 1000.0, 100)
+        assert len(x) == 200
+        assert x[0] == x[1] == 0 and x[-1] == 99
+        columns = values.reshape(100, 10)  # Ten samples per pixel column
+        assert np.allclose(y[0::2], columns.min(axis=1)) and np.allclose(y[1::2], columns.max(axis=1))
+
+    def test_window_and_nan(self):
+        t = np.arange(10.0)
+        values = np.array([5, 1, np.nan, 2, 3, 4, 9, 9, 9, 9], dtype=float)
+        x, y = minmax_decimate(t, values, 1.0, 5.0, 1000)
+        assert y[0::2].tolist() == [1, 2, 3, 4]  # Only 1 <= t <= 5, NaN skipped
+        assert minmax_decimate(t, values, 20.0, 30.0, 100)[0].size == 0
+
+
+class TestLivePlot:
+    def test_one_hour_is_width_bound(self, app):
+        plot = LivePlot('Pressure', 'mTorr', log_scale=True, window_s=3600)
+        plot.resize(600, 200)
+        t = np.arange(3600 * 5) / 5.0
+        plot.append_batch(t, 10 ** -np.linspace(1, 6, len(t)))
+        x, y = plot.visible_points(500)
+        assert len(x) <= 1000
+        assert y.min() == pytest.approx(-6) and y.max() == pytest.approx(-1)  # log10 of the values
+        image = QImage(600, 200, QImage.Format_ARGB32)
+        plot.render(image)  # Paints without errors
+
+    def test_log_scale_skips_non_positive(self, app):
+        plot = LivePlot('Pressure', 'mTorr', log_scale=True)
+        plot.append_batch(np.arange(4.0), np.array([1e-3, 0.0, -1.0, 1e-2]))
+        x, y = plot.visible_points(100)
+        assert sorted(set(y.round(6))) == [-3.0, -2.0]
+
+    def test_window_of_wrapped_buffer(self, app):
+        plot = LivePlot('Pressure', 'mTorr', log_scale=True, window_s=100, capacity=1000)
+        t = np.arange(2050.0)
+        values = 10 ** -(1 + t % 7)
+        plot.append_batch(t, values)  # Wrapped: the window spans the end and the start of the array
+        x, y = plot.visible_points(50)
+        expected = minmax_decimate(t, np.log10(values), t[-1] - 100, t[-1], 50)
+        assert np.array_equal(x, expected[0]) and np.allclose(y, expected[1])
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+from ModbusBusScheduler import get_scheduler
+
+
+@pytest.fixture
+def instruments():
+    registers = {address: {**EUROTHERM_REGISTERS, 289: 250 + address} for address in (1, 2, 3)}
+    with MockModbusSlave(slaves=registers, baudrate=19200) as slave:
+        instruments = [minimalmodbus.Instrument(slave.port, address) for address in (1, 2, 3)]
+        scheduler = get_scheduler(instruments[0])
+        yield instruments, scheduler
+        scheduler.close()
+        instruments[0].serial.close()
+
+
+class TestBusScheduler:
+    def test_shared_per_port(self, instruments):
+        instruments, scheduler = instruments
+        assert all(get_scheduler(instrument) is scheduler for instrument in instruments)
+
+    def test_gather_across_slaves(self, instruments):
+        instruments, scheduler = instruments
+        reads = [instrument.prepare_read(289, number_of_decimals=1) for instrument in instruments]
+        assert scheduler.gather(reads) == [25.1, 25.2, 25.3]
+        stats = scheduler.stats()
+        assert stats['requests'] == 3
+        assert 0 < stats['wire_utilization'] <= stats['utilization'] <= 1
+
+    def test_earliest_due_first(self, instruments):
+        instruments, scheduler = instruments
+        order = []
+        now = time.monotonic()
+        futures = [scheduler.submit(lambda name=name: order.append(name), due=now + delay)
+                   for name, delay in (('late', 0.05), ('early', 0.02), ('now', 0.0))]
+        for future in futures:
+            future.result(1.0)
+        assert order == ['now', 'early', 'late']
+
+    def test_errors_go_to_future(self, instruments):
+        instruments, scheduler = instruments
+        future = scheduler.submit(instruments[0].prepare_read(9999))
+        with pytest.raises(minimalmodbus.IllegalRequestError):
+            future.result(1.0)
+        assert scheduler.gather([instruments[1].prepare_read(289)]) == [252]
+
+    def test_close_cancels_future_requests(self, instruments):
+        instruments, scheduler = instruments
+        future = scheduler.submit(instruments[0].prepare_read(289), due=time.monotonic() + 60)
+        scheduler.close()
+        assert future.cancelled()
+        assert get_scheduler(instruments[0]) is not scheduler
@@ -0,0 +1,71 @@
+import numpy as np
+
+import minimalmodbus
+from ModbusCapture import crc16, frame_offsets, verify_frames, decode_read_responses
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+
+
+def capture(frames):
+    return np.frombuffer(b''.join(frames), dtype=np.uint8), np.array([len(frame) for frame in frames])
+
+
+def read_exchange(slave, address, start, count):
+    request = minimalmodbus._embed_payload(address, minimalmodbus.MODE_RTU, 3,
+                                           minimalmodbus._num_to_two_bytes(start) + minimalmodbus._num_to_two_bytes(count))
+    return [request, slave.respond(request)]
+
+
+class TestModbusCapture:
+    def setup_method(self):
+        self.slave = MockModbusSlave(slaves={1: dict(EUROTHERM_REGISTERS), 2: {289: 0xFFF6, 290: 7}}, undefined_value=0)
+
+    def teardown_method(self):
+        self.slave.stop()
+
+    def test_crc_matches_minimalmodbus(self):
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, size, dtype=np.uint8).tobytes() for size in (1, 7, 3, 40, 7, 256)]
+        buffer, lengths = capture(frames)
+        crcs = crc16(buffer, frame_offsets(lengths), lengths)
+        for frame, crc in zip(frames, crcs):
+            assert int(crc).to_bytes(2, 'little') == minimalmodbus._calculate_crc(frame)
+
+    def test_validity_mask(self):
+        frames = read_exchange(self.slave, 1, 289, 1) + read_exchange(self.slave, 2, 289, 2)
+        corrupted = bytearray(frames[1])
+        corrupted[3] ^= 0x01
+        frames[1] = bytes(corrupted)
+        buffer, lengths = capture(frames + [b'\x01\x02'])
+        assert verify_frames(buffer, lengths).tolist() == [True, False, True, True, False]
+
+    def test_decode_read_responses(self):
+        frames = (read_exchange(self.slave, 1, 289, 1) + read_exchange(self.slave, 2, 289, 2)
+                  + read_exchange(self.slave, 1, 2, 4)[1:])  # Response without its request
+        buffer, lengths = capture(frames)
+        reads = decode_read_responses(buffer, lengths)
+        assert reads.index.tolist() == [1, 3, 4]
+        assert reads.start.tolist() == [289, 289, -1]
+        assert reads.registers[1].tolist() == [0xFFF6, 7, 0, 0]  # Padded to the longest response
+        assert reads.registers[2].tolist() == [300, 0, 0, 300]
+        pv = reads.register(289, decimals=1, signed=True)
+        assert pv[:2].tolist() == [25.0, -1.0]
+        assert np.isnan(pv[2])
+        assert np.isnan(reads.register(289, slave=1)[1])
+
+    def test_chunks_give_the_same_result(self):
+        frames = (read_exchange(self.slave, 1, 289, 1) + read_exchange(self.slave, 2, 289, 2) + [b'\x01\x02']
+                  + read_exchange(self.slave, 1, 2, 4) + read_exchange(self.slave, 1, 289, 1))
+        buffer, lengths = capture(frames)
+        whole = decode_read_responses(buffer, lengths)
+        for chunk_frames in (1, 2, 3):
+            # Requests and their responses end up in different chunks
+            assert np.array_equal(verify_frames(buffer, lengths, chunk_frames), verify_frames(buffer, lengths))
+            assert np.array_equal(crc16(buffer, frame_offsets(lengths), lengths, chunk_frames),
+                                  crc16(buffer, frame_offsets(lengths), lengths))
+            reads = decode_read_responses(buffer, lengths, chunk_frames=chunk_frames)
+            for field in ('index', 'address', 'functioncode', 'start', 'count', 'registers'):
+                assert np.array_equal(getattr(reads, field), getattr(whole, field)), field
+        assert whole.start.tolist() == [289, 289, 2, 289]
+
+    def test_empty_capture(self):
+        assert len(decode_read_responses(np.zeros(0, np.uint8), np.zeros(0, np.int64))) == 0
@@ -2,6 +2,11 @@ import sys
 sys.path.append('C:\\Users\\vLab\\Documents\\Python Scripts\\Pfeiffer TC110\\src')
 
 from RealPfeifferTC110 import TC110
+import RealPfeifferTC110 as rpt
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+import os
+import json
+import subprocess
 import pytest
 
 
@@ -32,4 +37,57 @@ class TestTC110:
         assert TC110._received_ok('1231030906000633037') == True
         assert TC110._received_ok('0421001006111111020') == True
 
-        
\ No newline at end of file
+
+class FakeResourceManager:
+    def __init__(self):
+        self.opened = []
+
+    def list_resources(self):
+        raise AssertionError('Devices should not be enumerated when the port is known.')
+
+    def open_resource(self, port, **kwargs):
+        self.opened.append(port)
+        return VisaResource(MockTC110())
+
+
+class TestStartup:
+    def test_known_port_opens_directly(self, monkeypatch):
+        fake_rm = FakeResourceManager()
+        monkeypatch.setattr(rpt, '_resource_manager', fake_rm)
+        monkeypatch.setattr(rpt, '_resources', None)
+        pump = TC110(port='ASRL/dev/ttyUSB0::INSTR')
+        assert fake_rm.opened == ['ASRL/dev/ttyUSB0::INSTR']
+        assert pump.get_speed() == 0
+
+    def test_resources_are_cached(self, monkeypatch):
+        calls = []
+        class CountingResourceManager(FakeResourceManager):
+            def list_resources(self):
+                calls.append(1)
+                return ('ASRL/dev/ttyUSB0::INSTR',)
+        monkeypatch.setattr(rpt, '_resource_manager', CountingResourceManager())
+        monkeypatch.setattr(rpt, '_resources', None)
+        TC110(autoconnect=False)
+        TC110(autoconnect=False)
+        assert len(calls) == 1
+
+    def test_time_to_first_reading(self, tmp_path):
+        # Fresh interpreter, so the import cost is part of the measurement
+        script = (
+            "import time, sys, json\n"
+            "start = time.perf_counter()\n"
+            "from RealPfeifferTC110 import TC110\n"
+            "from MockPfiefferProtocol import TC110 as MockTC110, VisaResource\n"
+            "pump = TC110(port='ASRL/dev/ttyUSB0::INSTR', autoconnect=False)\n"
+            "pump.inst = VisaResource(MockTC110())\n"
+            "speed = pump.get_speed()\n"
+            "print(json.dumps({'seconds': time.perf_counter() - start, 'speed': speed, 'pyvisa': 'pyvisa' in sys.modules}))\n"
+        )
+        here = os.path.dirname(os.path.abspath(__file__))
+        env = dict(os.environ, PYTHONPATH=here)
+        out = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"Time to first reading: {result['seconds'] * 1000:.1f} ms")
+        assert result['speed'] == 0
+        assert result['pyvisa'] is False
+        assert result['seconds'] < 1.0
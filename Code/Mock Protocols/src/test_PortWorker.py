@@ -0,0 +1,43 @@
+import threading
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+
+
+class TestPortWorker:
+    def test_threads_share_port_safely(self):
+        slaves = {address: {**EUROTHERM_REGISTERS, 289: 250 + address} for address in (1, 2, 3)}
+        results = {address: [] for address in slaves}
+        with MockModbusSlave(slaves=slaves) as slave:
+            def poll(address):
+                instrument = minimalmodbus.Instrument(slave.port, address)
+                for _ in range(30):
+                    results[address].append(instrument.read_register(289, 1))
+
+            threads = [threading.Thread(target=poll, args=(address,)) for address in slaves]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+            minimalmodbus._serialports[slave.port].close()
+        for address, values in results.items():
+            assert values == [25 + address / 10] * 30
+
+    def test_submit_returns_future(self):
+        with MockModbusSlave() as slave:
+            instrument = minimalmodbus.Instrument(slave.port, 1)
+            future = instrument.submit(instrument.read_register, 289, 1)
+            assert future.result(1.0) == 25.0
+            # Transactions inside a submitted call run on the worker directly
+            prepared = instrument.prepare_read(289, number_of_decimals=1)
+            assert instrument.submit(lambda: [prepared(), prepared()]).result(1.0) == [25.0, 25.0]
+            instrument.serial.close()
+
+    def test_direct_mode_holds_lock(self):
+        with MockModbusSlave() as slave:
+            instrument = minimalmodbus.Instrument(slave.port, 1)
+            instrument.use_port_worker = False
+            worker = minimalmodbus._get_port_worker(slave.port)
+            with worker.hold():
+                assert instrument.read_register(289, 1) == 25.0
+            instrument.serial.close()
@@ -0,0 +1,40 @@
+import pytest
+
+import minimalmodbus
+from MockModbusSlave import MockModbusSlave, EUROTHERM_REGISTERS
+
+
+@pytest.fixture
+def instrument():
+    registers = dict(EUROTHERM_REGISTERS)
+    registers[290] = 0xFFF6  # -10 as a signed register, right after the loop 1 PV
+    with MockModbusSlave(slaves={1: registers}) as slave:
+        inst = minimalmodbus.Instrument(slave.port, 1)
+        yield inst
+        inst.serial.close()
+
+
+class TestPreparedRead:
+    def test_matches_read_register(self, instrument):
+        prepared = instrument.prepare_read(289, number_of_decimals=1)
+        assert prepared() == instrument.read_register(289, 1) == 25.0
+
+    def test_block_signed(self, instrument):
+        prepared = instrument.prepare_read(289, number_of_registers=2, signed=True)
+        assert prepared.execute() == instrument.read_registers(289, 2)[:1] + [-10]
+
+    def test_request_precomputed(self, instrument):
+        prepared = instrument.prepare_read(289)
+        assert prepared.request == minimalmodbus._embed_payload(1, minimalmodbus.MODE_RTU, 3, b'\x01\x21\x00\x01')
+        assert prepared.response_size == 7
+
+    def test_validated_once(self, instrument):
+        with pytest.raises(ValueError):
+            instrument.prepare_read(289, number_of_registers=200)
+        with pytest.raises(ValueError):
+            instrument.prepare_read(289, functioncode=6)
+
+    def test_slave_error(self, instrument):
+        prepared = instrument.prepare_read(9999)
+        with pytest.raises(minimalmodbus.IllegalRequestError):
+            prepared()
@@ -0,0 +1,67 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+from PySide6.QtWidgets import QApplication
+
+import PyQtPfeifferSystem as gui
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def process_for(app, seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        app.processEvents()
+        time.sleep(0.002)
+
+
+def count_set_text(label):
+    calls = []
+    set_text = label.setText
+    label.setText = lambda text: (calls.append(text), set_text(text))
+    return calls
+
+
+class TestSensorCard:
+    def test_readings_coalesced_to_display_rate(self, app):
+        card = gui.SensorCard('Pressure', 'mTorr', scientific=True)
+        calls = count_set_text(card._value)
+        for i in range(100):
+            card.set_value(float(i))
+        assert calls == []  # Nothing is drawn before the display tick
+        process_for(app, 2.5 / gui.DISPLAY_RATE_HZ)
+        assert calls == ['9.90e+01']
+
+    def test_identical_text_not_set(self, app):
+        card = gui.SensorCard('Temperature', '°C')
+        values, stamps = count_set_text(card._value), count_set_text(card._last_update)
+        t = time.time()
+        for value in (25.001, 25.002, 25.003):
+            card.set_value(value, t=t)
+            process_for(app, 2.0 / gui.DISPLAY_RATE_HZ)
+        assert values == ['25.00'] and len(stamps) == 1
+
+    def test_display_rate(self, app):
+        card = gui.SensorCard('Pressure', 'mTorr')
+        calls = count_set_text(card._value)
+        gui.SensorCard.set_display_rate(2)
+        try:
+            assert gui.card_refresher()._timer.interval() == 500
+            card.set_value(1.0)
+            process_for(app, 0.25)
+            assert calls == []  # Not yet at 2 Hz
+            process_for(app, 0.4)
+            assert calls == ['1.00']
+            with pytest.raises(ValueError):
+                gui.SensorCard.set_display_rate(0)
+        finally:
+            gui.SensorCard.set_display_rate(gui.DISPLAY_RATE_HZ)
+
+    def test_clock_text_once_per_second(self):
+        assert gui.clock_text(1000.2) is gui.clock_text(1000.9)
@@ -0,0 +1,145 @@
+import os
+import time
+import zlib
+import threading
+
+import numpy as np
+import pytest
+
+from SharedFeed import FeedWriter, FeedReader, ERROR
+from AcquisitionDaemon import MockAcquisitionDaemon, TEMPERATURE, PRESSURE, PUMP_SPEED, PUMP_CURRENT
+
+
+def feed_name(test):
+    # Short: macOS limits shared memory names to 31 characters
+    return f'ylt_{zlib.crc32(test.encode()):08x}_{os.getpid()}'
+
+
+@pytest.fixture
+def writer(request):
+    writer = FeedWriter(feed_name(request.node.name), ['Temperature', 'Pressure'], capacity=100)
+    yield writer
+    writer.close()
+
+
+class TestSharedFeed:
+    def test_round_trip(self, writer):
+        for i in range(250):
+            writer.publish('Pressure', 1000.0 + i, 1e-6 * i)
+        writer.publish('Temperature', 2000.0, 25.0)
+        writer.publish_status('Temperature', 'error')
+        reader = FeedReader(writer.name)
+        assert reader.channels == ['Temperature', 'Pressure']
+        latest = reader.latest()
+        assert latest['Pressure'] == (1249.0, 1e-6 * 249, 'connected')
+        assert latest['Temperature'] == (2000.0, 25.0, 'error')
+        # Only the last `capacity` readings are kept, in order
+        t, values = reader.history('Pressure')
+        assert np.array_equal(t, 1150.0 + np.arange(100))
+        assert reader.history('Pressure', last=3)[0].tolist() == [1247.0, 1248.0, 1249.0]
+        reader.close()
+
+    def test_since_cursor(self, writer):
+        reader = FeedReader(writer.name)
+        writer.publish('Pressure', 1.0, 1.0)
+        writer.publish('Pressure', 2.0, 2.0)
+        t, values, cursor = reader.since('Pressure', 0)
+        assert t.tolist() == [1.0, 2.0] and cursor == 2
+        writer.publish('Pressure', 3.0, 3.0)
+        t, values, cursor = reader.since('Pressure', cursor)
+        assert values.tolist() == [3.0] and cursor == 3
+        assert len(reader.since('Pressure', cursor)[0]) == 0
+        reader.close()
+
+    def test_many_readers(self, writer):
+        readers = [FeedReader(writer.name) for _ in range(5)]
+        writer.publish('Temperature', 1.0, 30.0, status=ERROR)
+        assert all(reader.latest()['Temperature'] == (1.0, 30.0, 'error') for reader in readers)
+        for reader in readers:
+            reader.close()
+        # Readers going away leave the feed in place
+        reader = FeedReader(writer.name)
+        assert reader.total('Temperature') == 1
+        reader.close()
+
+    def test_live_feed_is_not_taken_over(self, writer):
+        writer.publish('Pressure', 1.0, 2.0)
+        with pytest.raises(FileExistsError):
+            FeedWriter(writer.name, ['Pressure'])
+        reader = FeedReader(writer.name)  # Still the first writer's feed
+        assert reader.total('Pressure') == 1
+        reader.close()
+
+    def test_stale_feed_is_replaced(self, request):
+        name = feed_name(request.node.name)
+        crashed = FeedWriter(name, ['Pressure'])
+        crashed.publish('Pressure', 1.0, 2.0)
+        crashed._layout.heartbeat[0] = time.time() - 60  # Stopped marking itself alive
+        crashed.shm.close()
+        replacement = FeedWriter(name, ['Temperature', 'Pressure'])
+        reader = FeedReader(name)
+        assert reader.channels == ['Temperature', 'Pressure'] and reader.total('Pressure') == 0
+        reader.close()
+        replacement.close()
+
+    def test_no_feed(self):
+        with pytest.raises(FileNotFoundError):
+            FeedReader(feed_name('missing'))
+
+    def test_reads_are_consistent_while_writing(self, writer):
+        # Every publish writes the same number to t and value; a torn read would mix two publishes
+        stop = threading.Event()
+
+        def publish():
+            i = 0
+            while not stop.is_set():
+                i += 1
+                writer.publish('Pressure', float(i), float(i))
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        reader = FeedReader(writer.name)
+        try:
+            for _ in range(2000):
+                t, value, _ = reader.latest()['Pressure']
+                assert t == value or np.isnan(t)
+                t, values = reader.history('Pressure', last=10)
+                assert np.array_equal(t, values) and np.all(np.diff(t) == 1)
+        finally:
+            stop.set()
+            thread.join()
+            reader.close()
+
+
+class TestAcquisitionDaemon:
+    def test_mock_daemon_feeds_viewers(self):
+        name = feed_name('daemon')
+        with MockAcquisitionDaemon(feed_name=name, interval_s=0.02) as daemon:
+            time.sleep(0.5)
+            reader = FeedReader(name)
+            assert reader.channels == [TEMPERATURE, PRESSURE, PUMP_SPEED, PUMP_CURRENT]
+            latest = reader.latest()
+            assert latest[TEMPERATURE][1:] == (25.0, 'connected')
+            assert latest[PRESSURE][1:] == (1.0, 'connected')
+            # The viewers label the pump speed in rpm
+            assert daemon.engine.channels[PUMP_SPEED].driver.key == 'ActualSpd_rpm'
+            assert all(reader.total(channel) > 5 for channel in reader.channels)
+            assert reader.heartbeat_age() < 2.0
+
+            # More viewers read the feed, not the instruments: the Eurotherm sees the same request rate
+            before, start = daemon.server.requests, time.monotonic()
+            viewers = [FeedReader(name) for _ in range(4)]
+            for _ in range(50):
+                for viewer in viewers:
+                    viewer.latest()
+                    viewer.since(TEMPERATURE, 0)
+                time.sleep(0.005)
+            rate = (daemon.server.requests - before) / (time.monotonic() - start)
+            assert rate == pytest.approx(50, rel=0.3)
+            for viewer in viewers:
+                viewer.close()
+        # Stopping closes the devices and tells the viewers before removing the feed
+        assert set(reader.statuses().values()) == {'disconnected'}
+        reader.close()
+        with pytest.raises(FileNotFoundError):
+            FeedReader(name)
@@ -0,0 +1,31 @@
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from TC110ErrorHistory import ErrorHistoryService, new_entries
+
+
+class TestErrorHistory:
+    def test_new_entries(self):
+        old = ['Err002', 'Err001', '000000']
+        assert new_entries(old, old) == []
+        assert new_entries(old, ['Err007', 'Err002', 'Err001']) == ['Err007']
+        assert new_entries(None, ['Err002', '000000', '000000']) == ['Err002']
+
+    def test_history_only_refetched_on_change(self):
+        pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+        mock = MockTC110()
+        pump.inst = VisaResource(mock)
+        events = []
+        errors = ErrorHistoryService(pump, on_event=events.append)
+        errors.poll()
+        assert mock.requests == 11  # Error code plus the history, once
+        assert events == []
+        errors.poll()
+        errors.poll()
+        assert mock.requests == 13  # Just the error code
+        mock.error_code = 'Err006'
+        mock.error_history = ['Err006'] + mock.error_history[:-1]
+        new = errors.poll()
+        assert [event['kind'] for event in new] == ['error_code', 'history']
+        assert new[1]['code'] == 'Err006' and new[1]['position'] == 1
+        assert errors.in_error
+        assert mock.requests == 24
@@ -0,0 +1,45 @@
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from TC110PollingPlanner import PollingPlanner, assign_tiers, FAST, MEDIUM, SLOW
+import pytest
+
+
+@pytest.fixture
+def pump():
+    pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+    pump.mock = MockTC110(spinup_s=60)
+    pump.inst = VisaResource(pump.mock)
+    return pump
+
+
+class TestPollingPlanner:
+    def test_assign_tiers(self, pump):
+        tiers = assign_tiers(pump.commands)
+        assert tiers['ActualSpd'] == FAST
+        assert tiers['DrvCurrent'] == FAST
+        assert tiers['Error_code '] == FAST
+        assert tiers['TempMotor'] == MEDIUM
+        assert tiers['OpHrsPump'] == SLOW
+        assert tiers['Fw_version'] == SLOW
+        assert tiers['ErrHist3'] == SLOW
+        assert 'ErrorAckn' not in tiers
+
+    def test_slow_values_come_from_cache(self, pump):
+        now = [0.0]
+        planner = PollingPlanner(pump, keys=['ActualSpd', 'TempMotor', 'OpHrsPump', 'Fw_version'],
+                                 medium_every=5, slow_refresh_s=300, clock=lambda: now[0])
+        planner.poll()
+        assert set(planner.values()) == {'ActualSpd', 'TempMotor', 'OpHrsPump', 'Fw_version'}
+        assert planner.due(now[0]) == ['ActualSpd']
+        now[0] = 301.0
+        assert planner.due(now[0]) == ['ActualSpd', 'OpHrsPump', 'Fw_version']
+
+    def test_boost_during_runup(self, pump):
+        planner = PollingPlanner(pump, keys=['ActualSpd', 'PumpAccel', 'TempMotor'],
+                                 fast_interval=1.0, boost_interval=0.1)
+        planner.poll()
+        assert not planner.boosted and planner.interval == 1.0
+        pump.start()
+        planner.poll()
+        assert planner.boosted and planner.interval == 0.1
+        assert 'TempMotor' in planner.due()
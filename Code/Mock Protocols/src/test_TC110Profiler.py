@@ -0,0 +1,70 @@
+import time
+import logging
+
+import numpy as np
+import pytest
+
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from TC110Profiler import RunupProfiler, ProfileBuffer
+
+
+@pytest.fixture
+def pump():
+    pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+    pump.mock = MockTC110(spinup_s=1.0)
+    pump.inst = VisaResource(pump.mock)
+    return pump
+
+
+class TestRunupProfiler:
+    def test_runup_and_spindown(self, pump, tmp_path):
+        pump.mock.spinup_s = 0.3
+        finished = []
+        profiler = RunupProfiler(pump, directory=str(tmp_path), max_duration_s=5, on_finished=finished.append)
+        profiler.start_runup()
+        assert profiler.capturing  # start_runup() returned while the capture is still running
+        profiler.wait(5)
+        runup = profiler.events[-1]
+        assert 0.25 < runup['time_to_speed_s'] < 1.0
+        assert runup['peak_current_a'] == 1.5  # Fixed comma: the mock's 000150 is 1.50 A
+        data = np.load(runup['file'])
+        # Speed and SetSpdAtt are separate telegrams, so the last speed can be read just before the ramp ends
+        assert data['ActualSpd'][-1] == pytest.approx(pump.mock.nominal_speed, rel=0.01)
+        assert np.nanmax(data['accel_hz_s']) > 0
+        profiler.start_spindown()
+        profiler.wait(5)
+        assert profiler.events[-1]['kind'] == 'spindown'
+        assert not np.isnan(profiler.events[-1]['time_to_speed_s'])
+        assert len(finished) == 2
+
+    def test_events_in_one_second_keep_their_files(self, pump, tmp_path):
+        profiler = RunupProfiler(pump, directory=str(tmp_path))
+        files = []
+        for speed in (10.0, 20.0):
+            profiler.buffer = ProfileBuffer(('t', 'ActualSpd'))
+            profiler.buffer.append(t=0.0, ActualSpd=speed)
+            profiler.summary = {'kind': 'runup', 'started': 1700000000.0, 'file': None}
+            profiler._save()
+            files.append(profiler.summary['file'])
+        assert files[0] != files[1]
+        assert [np.load(f)['ActualSpd'][0] for f in files] == [10.0, 20.0]
+
+    def test_with_write_layer(self, pump, tmp_path, caplog):
+        pump.mock.spinup_s = 0.3
+        writes = pump.use_write_layer(coalesce_s=0)
+        profiler = RunupProfiler(pump, directory=str(tmp_path), max_duration_s=5)
+        try:
+            start = time.monotonic()
+            with caplog.at_level(logging.WARNING):
+                profiler.start_runup()
+                profiler.wait(5)
+            assert time.monotonic() - start < 1.5  # The start command does not wait for the layer's timeout
+            assert 0.25 < profiler.events[-1]['time_to_speed_s'] < 1.0
+            assert pump.mock.running and writes.counters['sent'] >= 1
+            profiler.start_spindown()
+            profiler.wait(5)
+            assert not pump.mock.running
+            assert 'Reply not received' not in caplog.text
+        finally:
+            writes.close()
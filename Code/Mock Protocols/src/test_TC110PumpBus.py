@@ -0,0 +1,36 @@
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from TC110PumpBus import PumpBus
+import numpy as np
+
+
+def make_bus(device_ids, *mocks, **kwargs):
+    pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+    pump.inst = VisaResource(*mocks)
+    return PumpBus(device_ids, pump=pump, **kwargs)
+
+
+class TestPumpBus:
+    def test_snapshot_shape_and_values(self):
+        mocks = [MockTC110(address=1), MockTC110(address=2)]
+        bus = make_bus([1, 2], *mocks)
+        t, values = bus.snapshot()
+        assert values.shape == (2, 3)
+        assert np.all(values[:, 0] == 0)  # Pumps are not running
+        assert np.all(values[:, 2] == 38)
+        assert all(mock.requests == 3 for mock in mocks)
+        assert not np.isnan(bus.latency).any()
+
+    def test_missing_pump_goes_offline(self):
+        bus = make_bus([1, 7], MockTC110(address=1), max_misses=2, retry_s=60)
+        t, values = bus.snapshot()
+        assert not np.isnan(values[0]).any()
+        assert np.isnan(values[1]).all()
+        assert bus.status()[1]['online'] is False
+        # An offline pump costs no bus time on the next cycle
+        sent = []
+        write = bus.pump.inst.write
+        bus.pump.inst.write = lambda frame: sent.append(frame) or write(frame)
+        bus.snapshot()
+        assert len(sent) == 3
+        assert all(frame.startswith('001') for frame in sent)
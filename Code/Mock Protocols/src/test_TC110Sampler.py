@@ -0,0 +1,87 @@
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from RingBuffer import RingBuffer
+from TC110Sampler import TC110Sampler
+import time
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def pump():
+    pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+    pump.mock = MockTC110(spinup_s=1.0)
+    pump.inst = VisaResource(pump.mock)
+    return pump
+
+
+class TestRingBuffer:
+    def test_wraps_around(self):
+        rb = RingBuffer(4, n_columns=2)
+        for i in range(6):
+            rb.append(i, (i, 10 * i))
+        t, values = rb.arrays()
+        assert list(t) == [2, 3, 4, 5]
+        assert list(values[:, 1]) == [20, 30, 40, 50]
+
+    def test_since_cursor(self):
+        rb = RingBuffer(8)
+        rb.extend([0, 1, 2], [[0], [1], [2]])
+        t, values, cursor = rb.since(0)
+        assert list(t) == [0, 1, 2] and cursor == 3
+        rb.append(3, 3)
+        t, values, cursor = rb.since(cursor)
+        assert list(t) == [3] and cursor == 4
+
+    def test_after_time(self):
+        rb = RingBuffer(8)
+        assert len(rb.after(0)[0]) == 0
+        rb.extend(np.arange(5.0), np.arange(5.0))
+        assert list(rb.after(2.5)[0]) == [3, 4]
+        rb.extend(np.arange(5.0, 11.0), np.arange(5.0, 11.0))  # Wrapped: rows 3..10 in two runs
+        for t0 in (-1.0, 3.0, 5.5, 7.0, 10.0, 11.0):
+            t, values = rb.after(t0)
+            assert list(t) == [x for x in range(3, 11) if x >= t0]
+            assert np.array_equal(values[:, 0], t)
+
+
+class TestTC110Sampler:
+    def test_run_for_samples_and_stops_pump(self, pump):
+        received = []
+        sampler = TC110Sampler(pump, rate_hz=50)
+        sampler.subscribe(lambda t, values: received.append(values))
+        stats = sampler.run_for(0.4, start_pump=True)
+        assert not sampler.running
+        assert not pump.mock.running
+        assert 15 <= stats['samples'] <= 21
+        assert len(received) == stats['samples'] == len(sampler.buffer)
+        t, values = sampler.buffer.arrays()
+        assert np.all(np.diff(t) > 0)
+        assert values[-1, 0] > 0  # The rotor was spinning up
+        assert stats['jitter_max_s'] < 0.05
+
+    def test_stop_on_exception(self, pump):
+        sampler = TC110Sampler(pump, rate_hz=20)
+        with pytest.raises(RuntimeError):
+            with sampler:
+                raise RuntimeError
+        assert not sampler.running
+
+    def test_back_to_back_leaves_pump_lock_free(self, pump):
+        pump.inst.latency_s = 0.002  # Bus time: the sampler holds the lock while it waits for the answer
+        with TC110Sampler(pump, rate_hz=None) as sampler:
+            waits = []
+            for _ in range(20):
+                start = time.perf_counter()
+                with pump.lock:
+                    waits.append(time.perf_counter() - start)
+                    pump.get_fromkey('ActualSpd')
+                time.sleep(0.01)
+        assert max(waits) < 0.05
+        assert len(sampler.buffer) > 20
+
+    def test_run_timed(self, pump):
+        sampler = pump.run_timed(0.2, rate_hz=20)
+        assert len(sampler.buffer) >= 3
+        assert not pump.mock.running
+
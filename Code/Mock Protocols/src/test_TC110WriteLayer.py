@@ -0,0 +1,107 @@
+from RealPfeifferTC110 import TC110
+from MockPfiefferProtocol import TC110 as MockTC110, VisaResource
+from TC110WriteLayer import WriteLayer
+import pytest
+
+
+@pytest.fixture
+def pump():
+    pump = TC110(port='ASRL/dev/null::INSTR', autoconnect=False)
+    pump.mock = MockTC110()
+    pump.inst = VisaResource(pump.mock)
+    return pump
+
+
+class TestWriteLayer:
+    def test_format_payload(self, pump):
+        assert pump.format_payload(True, pump.commands['PumpgStatn']) == '111111'
+        assert pump.format_payload(8, pump.commands['RUTimeSVal']) == '000008'
+        assert pump.format_payload(15.71, pump.commands['SpdSVal']) == '001571'
+        assert pump.format_payload(50, pump.commands['VentSpd']) == '050'
+
+    def test_cast_inverts_format_payload(self, pump):
+        commands = dict(pump.commands)
+        commands['Name'] = {'data type': 11}  # No type 11 parameter is writable; only the payload format matters
+        for key, value in (('Heating', True), ('Heating', False), ('RUTimeSVal', 8), ('SpdSVal', 75),
+                           ('SpdSVal', 15.71), ('VentSpd', 50), ('Gaugetype', 'PKR'), ('Name', 'BrezelBier')):
+            command = commands[key]
+            assert pump.cast(pump.format_payload(value, command), command) == value
+
+    def test_write_read_round_trip(self, pump):
+        for key, value in (('Heating', True), ('RUTimeSVal', 12), ('SpdSVal', 75), ('SpdSVal', 15.71),
+                           ('VentSpd', 60)):
+            assert pump.set_fromkey(key, value) == value
+            assert pump.get_fromkey(key) == value
+        writes = WriteLayer(pump, coalesce_s=0)
+        writes.write('SpdSVal', 80)
+        assert writes.flush(2)
+        requests = pump.mock.requests
+        assert writes.state('SpdSVal') == 80
+        assert not writes.write('SpdSVal', 80)  # Same value as confirmed: dropped
+        assert pump.mock.requests == requests
+        writes.close()
+
+    def test_redundant_writes_are_dropped(self, pump):
+        writes = WriteLayer(pump, coalesce_s=0)
+        assert writes.start_pump()
+        assert writes.flush(2)
+        assert pump.mock.running
+        sent = pump.mock.requests
+        assert not writes.start_pump()
+        assert writes.flush(2)
+        assert pump.mock.requests == sent
+        assert writes.counters['dropped'] == 1
+        writes.close()
+
+    def test_stop_always_reaches_the_pump(self, pump):
+        writes = WriteLayer(pump, coalesce_s=0)
+        writes.stop_pump()
+        writes.flush(2)
+        pump.mock._switch(True)  # Started behind the layer's back (e.g. front panel); the cache still says off
+        assert writes.stop_pump()
+        assert writes.flush(2)
+        assert not pump.mock.running
+        writes.close()
+
+    def test_pump_commands_go_through_write_layer(self, pump):
+        writes = pump.use_write_layer(coalesce_s=0)
+        assert pump.start() is True and pump.mock.running
+        requests = pump.mock.requests
+        assert pump.start() is True
+        assert pump.mock.requests == requests and writes.counters['dropped'] == 1
+        assert pump.stop() is False and not pump.mock.running
+        assert pump.stop() is False
+        assert pump.mock.requests == requests + 2  # Both stops were sent
+        assert pump.toggle() is True and pump.mock.running
+        writes.close()
+
+    def test_rapid_writes_are_coalesced(self, pump):
+        writes = WriteLayer(pump, coalesce_s=0.2)
+        for value in (60, 70, 80, 90):
+            writes.write('SpdSVal', value)
+        assert writes.flush(2)
+        assert pump.mock.requests == 1
+        assert pump.mock.stored[707] == '009000'
+        assert writes.counters['coalesced'] == 3
+        writes.close()
+
+    def test_toggle_uses_cached_state(self, pump):
+        writes = WriteLayer(pump, coalesce_s=0)
+        writes.toggle_pump()  # Reads the state once, then writes
+        writes.flush(2)
+        assert pump.mock.running
+        requests = pump.mock.requests
+        writes.toggle_pump()
+        writes.flush(2)
+        assert not pump.mock.running
+        assert pump.mock.requests == requests + 1
+        writes.close()
+
+    def test_unacknowledged_write_fails(self, pump):
+        failures = []
+        writes = WriteLayer(pump, coalesce_s=0, on_failure=lambda *args: failures.append(args))
+        writes.write('Gaugetype', 'PKR')  # Not simulated: the mock answers NO_DEF
+        writes.flush(2)
+        assert writes.counters['failed'] == 1 and len(failures) == 1
+        assert 'Gaugetype' not in writes.confirmed
+        writes.close()